@@ -0,0 +1,125 @@
+"""
+Synthetic invoice corpus for the benchmarks.
+
+Generates invoices deterministically from a seed, in three kinds: PDFs with a text layer,
+"scanned" PDFs (pages rasterised, no text layer) and PNG images. Page counts vary, and so
+does the language mix (English, Arabic, or both).
+
+    python -m benchmarks.corpus --out /tmp/corpus --docs 24
+"""
+import argparse
+import json
+import os
+import random
+import fitz
+
+KINDS = ("text", "scanned", "image")
+LANGS = ("en", "ar", "mixed")
+PAGE_COUNTS = (1, 1, 2, 3, 5)
+
+# Fonts with Arabic glyphs; the first that exists is used. PyMuPDF's built-in Helvetica has none.
+ARABIC_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    r"C:\Windows\Fonts\arial.ttf",
+)
+
+VENDORS_EN = ["Acme Supplies LLC", "Northwind Traders", "Blue Harbor Logistics", "Summit Office Co."]
+VENDORS_AR = ["مؤسسة النور للتجارة", "شركة الأفق للخدمات", "مكتبة المعرفة", "مطعم الواحة"]
+ITEMS_EN = ["Printer paper", "Toner cartridge", "Maintenance service", "Delivery fee", "Desk chair", "Coffee beans"]
+ITEMS_AR = ["ورق طباعة", "خدمات صيانة", "رسوم توصيل", "أدوات مكتبية", "قهوة عربية", "كرسي مكتب"]
+
+def find_arabic_font() -> str:
+    for path in ARABIC_FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return ""
+
+def invoice_lines(rng: random.Random, lang: str, page: int, pages: int) -> list:
+    """Text lines for one page of an invoice. Totals reconcile so the local rules can pass."""
+    arabic = lang == "ar" or (lang == "mixed" and page % 2 == 1)
+    vendor = rng.choice(VENDORS_AR if arabic else VENDORS_EN)
+    items = ITEMS_AR if arabic else ITEMS_EN
+    lines = [
+        "فاتورة ضريبية" if arabic else "INVOICE",
+        f"{'المورد' if arabic else 'Vendor'}: {vendor}",
+        f"{'رقم الفاتورة' if arabic else 'Invoice No'}: INV-{rng.randint(1000, 9999)}",
+        f"{'التاريخ' if arabic else 'Date'}: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "",
+    ]
+    subtotal = 0.0
+    for _ in range(rng.randint(3, 12)):
+        quantity, unit_price = rng.randint(1, 9), round(rng.uniform(2, 250), 2)
+        subtotal += quantity * unit_price
+        lines.append(f"{rng.choice(items)}  {quantity} x {unit_price:.2f} = {quantity * unit_price:.2f}")
+    if page == pages - 1:
+        tax = round(subtotal * 0.15, 2)
+        lines += [
+            "",
+            f"{'المجموع الفرعي' if arabic else 'Subtotal'}: {subtotal:.2f}",
+            f"{'ضريبة القيمة المضافة' if arabic else 'VAT 15%'}: {tax:.2f}",
+            f"{'الإجمالي' if arabic else 'Total'}: {subtotal + tax:.2f} {'SAR' if arabic else 'USD'}",
+        ]
+    else:
+        lines.append(f"--- {page + 1}/{pages} ---")
+    return lines
+
+def _text_pdf(rng: random.Random, lang: str, pages: int, font_path: str) -> fitz.Document:
+    doc = fitz.open()
+    for page_index in range(pages):
+        page = doc.new_page()
+        if font_path:
+            page.insert_font(fontname="body", fontfile=font_path)
+        y = 72
+        for line in invoice_lines(rng, lang, page_index, pages):
+            page.insert_text((60, y), line, fontsize=11, fontname="body" if font_path else "helv")
+            y += 16
+    return doc
+
+def _rasterise(doc: fitz.Document, dpi: int) -> fitz.Document:
+    scanned = fitz.open()
+    for page in doc:
+        pix = page.get_pixmap(dpi=dpi)
+        new_page = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        new_page.insert_image(new_page.rect, pixmap=pix)
+    return scanned
+
+def generate(out_dir: str, docs: int, seed: int = 0, dpi: int = 200) -> list:
+    """
+    Writes `docs` files into `out_dir` and returns their specs:
+    [{"path", "kind", "lang", "pages"}], cycling through every kind/language pair.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    font_path = find_arabic_font()
+    combos = [(kind, lang) for kind in KINDS for lang in LANGS]
+    specs = []
+    for index in range(docs):
+        kind, lang = combos[index % len(combos)]
+        pages = 1 if kind == "image" else rng.choice(PAGE_COUNTS)
+        doc = _text_pdf(rng, lang, pages, font_path)
+        name = f"{index:04d}_{kind}_{lang}_{pages}p"
+        if kind == "text":
+            path = os.path.join(out_dir, name + ".pdf")
+            doc.save(path)
+        elif kind == "scanned":
+            path = os.path.join(out_dir, name + ".pdf")
+            scanned = _rasterise(doc, dpi)
+            scanned.save(path)
+            scanned.close()
+        else:
+            path = os.path.join(out_dir, name + ".png")
+            doc[0].get_pixmap(dpi=dpi).save(path)
+        doc.close()
+        specs.append({"path": path, "kind": kind, "lang": lang, "pages": pages})
+    return specs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.out, args.docs, args.seed, args.dpi), indent=2, ensure_ascii=False))
@@ -0,0 +1,75 @@
+"""
+Throughput benchmark for GET /api/v1/dashboard/invoices at several concurrency levels.
+
+Runs a closed loop of `concurrency` clients for `--seconds` at each level and prints
+requests/sec and latency percentiles as JSON. Give each run a --label (e.g. "sync-session"
+vs "async-session") and pass a previous report with --compare to get per-level speedups.
+
+    python -m benchmarks.dashboard_rps --url http://localhost:8000 --levels 1 8 32 64 --label async
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from benchmarks.upload_load import summarize
+
+async def client_loop(client: httpx.AsyncClient, path: str, deadline: float, samples: list, errors: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+            samples.append(time.perf_counter() - start)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+
+async def run_level(url: str, path: str, concurrency: int, seconds: float) -> dict:
+    samples, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + seconds
+        await asyncio.gather(*(client_loop(client, path, deadline, samples, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests_per_sec": round(len(samples) / elapsed, 2),
+        "errors": len(errors),
+        "latency": summarize(samples),
+    }
+
+async def run(url: str, path: str, levels: list, seconds: float, label: str) -> dict:
+    results = []
+    for concurrency in levels:
+        results.append(await run_level(url, path, concurrency, seconds))
+    return {"label": label, "path": path, "seconds_per_level": seconds, "levels": results}
+
+def compare(report: dict, previous: dict) -> list:
+    before = {level["concurrency"]: level["requests_per_sec"] for level in previous["levels"]}
+    return [
+        {
+            "concurrency": level["concurrency"],
+            "baseline_label": previous.get("label"),
+            "speedup": round(level["requests_per_sec"] / before[level["concurrency"]], 2)
+            if before.get(level["concurrency"]) else None,
+        }
+        for level in report["levels"]
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/dashboard/invoices")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--compare", help="Path to a previous JSON report from this script")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.path, args.levels, args.seconds, args.label))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=2))
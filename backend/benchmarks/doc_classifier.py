@@ -0,0 +1,116 @@
+"""
+Document classifier benchmark (services/doc_classifier.py): accuracy of the keyword fallback
+versus a trained model on synthetic invoices, receipts and general documents (letters,
+contracts, statements) in English and Arabic with OCR-style noise, plus classification
+latency and how many documents would skip extraction.
+
+    python -m benchmarks.doc_classifier --train 3000 --test 1000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+INVOICE_EN = ["Invoice", "Bill To", "Due Date", "Invoice No", "Subtotal", "VAT 15%", "Amount Due", "Payment terms 30 days", "Qty Unit Price Amount"]
+INVOICE_AR = ["فاتورة ضريبية", "رقم الفاتورة", "تاريخ الاستحقاق", "الرقم الضريبي", "المجموع الفرعي", "ضريبة القيمة المضافة", "المبلغ المستحق"]
+RECEIPT_EN = ["Receipt", "Cashier", "Total Cash", "Change Due", "Thank you for your purchase", "Card ****1234", "Store #12"]
+RECEIPT_AR = ["إيصال", "الكاشير", "المبلغ المدفوع نقدا", "الباقي", "شكرا لزيارتكم", "رقم العملية"]
+GENERAL_EN = [
+    "Dear Sir or Madam, we are writing to confirm the renewal of our service agreement",
+    "This agreement is entered into by and between the parties named below",
+    "Meeting minutes: attendees discussed the quarterly plan and next steps",
+    "Account statement for the period, opening balance and closing balance",
+    "Please find attached the delivery schedule for next month",
+    "Terms and conditions apply. This document is confidential",
+]
+GENERAL_AR = [
+    "السادة المحترمين، نود إعلامكم بتجديد اتفاقية الخدمة",
+    "تم إبرام هذا العقد بين الطرفين المذكورين أدناه",
+    "محضر اجتماع: ناقش الحضور خطة الربع القادم",
+    "كشف حساب للفترة مع الرصيد الافتتاحي والرصيد الختامي",
+    "مرفق جدول التسليم للشهر القادم",
+]
+ITEMS = ["Printer paper", "Toner", "Maintenance service", "Delivery fee", "ورق طباعة", "خدمات صيانة", "رسوم توصيل", "Coffee"]
+
+def _noise(rng: random.Random, text: str, rate: float) -> str:
+    return "".join(rng.choice("il1o0") if c.isalpha() and rng.random() < rate else c for c in text)
+
+def make_document(rng: random.Random, label: str, noise: float) -> str:
+    arabic = rng.random() < 0.5
+    lines = [f"{rng.choice(['Acme Supplies', 'Northwind', 'مؤسسة النور', 'شركة الأفق'])}"]
+    if label == "general_document":
+        phrases = GENERAL_AR if arabic else GENERAL_EN
+        lines += rng.sample(phrases, k=min(len(phrases), rng.randint(2, 4)))
+        # Letters and statements mention dates and amounts too
+        lines.append(f"{rng.randint(1, 28)}/{rng.randint(1, 12)}/2024 {rng.randint(100, 9999)}.00")
+    else:
+        phrases = {"invoice": INVOICE_AR if arabic else INVOICE_EN, "receipt": RECEIPT_AR if arabic else RECEIPT_EN}[label]
+        # Headers are often lost or garbled by OCR, so not every keyword shows up
+        lines += rng.sample(phrases, k=rng.randint(1, 3))
+        for _ in range(rng.randint(1, 6)):
+            lines.append(f"{rng.choice(ITEMS)} {rng.randint(1, 9)} x {rng.randint(1, 500)}.00")
+        lines.append(f"Total {rng.randint(10, 5000)}.00")
+    rng.shuffle(lines)
+    return _noise(rng, "\n".join(lines), noise)
+
+def make_corpus(rng: random.Random, count: int, noise: float) -> list:
+    # Mostly invoices, like a real upload stream
+    labels = rng.choices(["invoice", "receipt", "general_document"], weights=[6, 3, 1], k=count)
+    return [(make_document(rng, label, noise), label) for label in labels]
+
+def score(predict, corpus: list, min_confidence: float) -> dict:
+    latencies, correct, skipped, skipped_wrong = [], 0, 0, 0
+    for text, label in corpus:
+        t0 = time.perf_counter()
+        predicted, confidence = predict(text)
+        latencies.append(time.perf_counter() - t0)
+        correct += predicted == label
+        if predicted == "general_document" and confidence >= min_confidence:
+            skipped += 1
+            skipped_wrong += label != "general_document"
+    from benchmarks.upload_load import summarize
+    general = sum(label == "general_document" for _, label in corpus)
+    return {
+        "accuracy": round(correct / len(corpus), 4),
+        "general_documents": general,
+        "skipped_extraction": skipped,
+        "skipped_but_financial": skipped_wrong,
+        "latency": summarize(latencies),
+    }
+
+def main(args) -> dict:
+    from services import doc_classifier
+    rng = random.Random(args.seed)
+    train = make_corpus(rng, args.train, args.noise)
+    test = make_corpus(rng, args.test, args.noise)
+
+    t0 = time.perf_counter()
+    model = doc_classifier.train([t for t, _ in train], [l for _, l in train], seed=args.seed)
+    train_seconds = time.perf_counter() - t0
+
+    return {
+        "label": args.label,
+        "config": {"train": args.train, "test": args.test, "noise": args.noise, "min_confidence": args.min_confidence},
+        "train_seconds": round(train_seconds, 2),
+        "keywords": score(doc_classifier.keyword_doc_type, test, args.min_confidence),
+        "model": score(model.predict, test, args.min_confidence),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", type=int, default=3000, help="Training documents")
+    parser.add_argument("--test", type=int, default=1000, help="Evaluation documents")
+    parser.add_argument("--noise", type=float, default=0.03, help="Share of letters garbled by OCR")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="DOC_CLASSIFIER_MIN_CONFIDENCE")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="current")
+    args = parser.parse_args()
+
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        report = main(args)
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,107 @@
+"""
+OCR engine benchmark: pages/sec with the pytesseract subprocess versus the persistent
+tesserocr engine (OCR_ENGINE in services/ocr.py), on the synthetic pages of
+benchmarks/ocr_preprocess.py.
+
+Pages are decoded once and passed as in-memory images, so only the OCR call is timed.
+Engine start-up and the first page per thread are reported separately from the timed run.
+An engine that can't run here (binary or traineddata missing) is reported as unavailable.
+
+    python -m benchmarks.ocr_engine --pages 12 --threads 1 > engines.json
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ENGINES = ("pytesseract", "tesserocr")
+
+def load_images(pages: int, seed: int, dpi: int) -> list:
+    from PIL import Image
+    from benchmarks.ocr_preprocess import build_samples
+    workdir = tempfile.mkdtemp(prefix="bdf-ocr-engine-")
+    try:
+        images = []
+        for sample in build_samples(workdir, pages, seed, dpi):
+            if sample["kind"] == "image":
+                with Image.open(sample["path"]) as image:
+                    image.load()
+                    images.append((image.copy(), sample))
+        return images
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def bench_engine(engine: str, images: list, threads: int, dpi: int) -> dict:
+    from benchmarks.ocr_preprocess import char_accuracy
+    from benchmarks.upload_load import summarize
+    from core.config import settings
+    from services import ocr
+
+    settings.OCR_ENGINE = engine
+    t0 = time.perf_counter()
+    if ocr.engine_name() != engine:
+        return {"available": False}
+    init_seconds = time.perf_counter() - t0
+    if engine == "pytesseract":
+        from benchmarks.pipeline import tesseract_available
+        if not tesseract_available():
+            return {"available": False}
+
+    def run(item):
+        image, sample = item
+        t0 = time.perf_counter()
+        text = ocr.extract_text_from_image_object(image, dpi=dpi)
+        return time.perf_counter() - t0, char_accuracy(sample["truth"], text)
+
+    with ThreadPoolExecutor(max_workers=threads, initializer=ocr.engine_name) as pool:
+        # One page per thread first, so every thread's engine is loaded before timing starts
+        first_seconds = [s for s, _ in pool.map(run, images[:threads])]
+        start = time.perf_counter()
+        results = list(pool.map(run, images))
+        elapsed = time.perf_counter() - start
+
+    seconds = [s for s, _ in results]
+    return {
+        "available": True,
+        "threads": threads,
+        # tesserocr: loading the traineddata; pytesseract pays its start-up on every page instead
+        "engine_init_ms": round(init_seconds * 1000, 1),
+        "first_page_ms": round(max(first_seconds) * 1000, 1),
+        "pages": len(results),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(seconds),
+        "mean_char_accuracy": round(sum(a for _, a in results) / len(results), 4),
+    }
+
+def main(args) -> dict:
+    images = load_images(args.pages, args.seed, args.dpi)
+    report = {
+        "label": args.label,
+        "config": {"pages": len(images), "seed": args.seed, "dpi": args.dpi, "threads": args.threads},
+        "engines": {engine: bench_engine(engine, images, args.threads, args.dpi) for engine in ENGINES},
+    }
+    subprocess, engine = report["engines"]["pytesseract"], report["engines"]["tesserocr"]
+    if subprocess["available"] and engine["available"]:
+        report["speedup"] = round(engine["pages_per_sec"] / subprocess["pages_per_sec"], 2)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=12, help="Synthetic pages, each clean and degraded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1, help="Pages OCRed at once (one engine per thread)")
+    parser.add_argument("--label", default="current")
+    args = parser.parse_args()
+
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        report = main(args)
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(report, indent=2, ensure_ascii=False))
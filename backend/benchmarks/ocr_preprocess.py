@@ -0,0 +1,195 @@
+"""
+OCR preprocessing benchmark: Tesseract time and character accuracy with and without
+services/image_preprocess.py, on synthetic invoice pages with a known ground truth.
+
+Pages come from the corpus generator (benchmarks/corpus.py) and are written both as scanned
+PDFs and as PNGs, clean and "degraded" (skewed, speckled, with a dark scanner border).
+Each file goes through the real OCR entry points twice, with OCR_PREPROCESS off (the old
+path: 72 DPI PDF renders, raw images) and on. Prints JSON; --compare works like pipeline.py.
+
+    python -m benchmarks.ocr_preprocess --pages 12 --dpi 200 > ocr.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def char_accuracy(reference: str, hypothesis: str) -> float:
+    """1 - character error rate, on whitespace-collapsed text; 0 for empty or garbage output."""
+    reference, hypothesis = " ".join(reference.split()), " ".join(hypothesis.split())
+    if not reference:
+        return 1.0 if not hypothesis else 0.0
+    return max(0.0, 1 - levenshtein(reference, hypothesis) / len(reference))
+
+def degrade(image, rng: random.Random):
+    """Simulates a poor scan: a small rotation, salt-and-pepper noise and a dark left border."""
+    import numpy as np
+    from PIL import Image
+    image = image.convert("L").rotate(rng.uniform(-3, 3), resample=Image.BICUBIC, expand=True, fillcolor=255)
+    pixels = np.array(image)
+    noise = np.random.default_rng(rng.randint(0, 2**31)).random(pixels.shape)
+    pixels[noise < 0.01] = 0
+    pixels[noise > 0.99] = 255
+    pixels[:, : max(4, pixels.shape[1] // 40)] = 30
+    return Image.fromarray(pixels)
+
+def build_samples(out_dir: str, pages: int, seed: int, dpi: int) -> list:
+    """Writes each page as a scanned PDF and a PNG, clean and degraded. Returns their specs."""
+    import fitz
+    from PIL import Image
+    from benchmarks import corpus
+
+    rng = random.Random(seed)
+    font_path = corpus.find_arabic_font()
+    samples = []
+    for index in range(pages):
+        lang = corpus.LANGS[index % len(corpus.LANGS)]
+        doc = corpus._text_pdf(rng, lang, 1, font_path)
+        truth = doc[0].get_text("text")
+        pix = doc[0].get_pixmap(dpi=dpi)
+        clean = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        width, height = doc[0].rect.width, doc[0].rect.height
+        doc.close()
+        for condition, image in (("clean", clean), ("degraded", degrade(clean, rng))):
+            name = os.path.join(out_dir, f"{index:04d}_{lang}_{condition}")
+            image.save(name + ".png", dpi=(dpi, dpi))
+            scanned = fitz.open()
+            page = scanned.new_page(width=width, height=height)
+            page.insert_image(page.rect, filename=name + ".png")
+            scanned.save(name + ".pdf")
+            scanned.close()
+            for kind, path in (("pdf", name + ".pdf"), ("image", name + ".png")):
+                samples.append({"path": path, "kind": kind, "lang": lang, "condition": condition, "truth": truth})
+    return samples
+
+def ocr_file(path: str) -> str:
+    from services.ocr import extract_text_from_image
+    from services.pdf_reader import extract_text_from_pdf
+    if path.endswith(".pdf"):
+        # Strip the "--- Page N ---" header so only OCR output is scored
+        return extract_text_from_pdf(path, parallel=False).split("\n", 1)[-1]
+    return extract_text_from_image(path)
+
+def bench_ocr(samples: list, preprocess: bool) -> dict:
+    from benchmarks.upload_load import summarize
+    from core.config import settings
+    settings.OCR_PREPROCESS = preprocess
+
+    groups, samples_seconds = {}, []
+    start = time.perf_counter()
+    for sample in samples:
+        t0 = time.perf_counter()
+        text = ocr_file(sample["path"])
+        seconds = time.perf_counter() - t0
+        samples_seconds.append(seconds)
+        group = groups.setdefault(f"{sample['kind']}/{sample['condition']}", {"seconds": [], "accuracy": []})
+        group["seconds"].append(seconds)
+        group["accuracy"].append(char_accuracy(sample["truth"], text))
+    elapsed = time.perf_counter() - start
+
+    accuracy = [a for g in groups.values() for a in g["accuracy"]]
+    return {
+        "seconds": round(elapsed, 3),
+        "latency": summarize(samples_seconds),
+        "mean_char_accuracy": round(sum(accuracy) / len(accuracy), 4),
+        "by_group": {
+            name: {
+                "mean_ms": round(sum(g["seconds"]) / len(g["seconds"]) * 1000, 1),
+                "mean_char_accuracy": round(sum(g["accuracy"]) / len(g["accuracy"]), 4),
+            }
+            for name, g in sorted(groups.items())
+        },
+    }
+
+def bench_preprocess(samples: list) -> dict:
+    """Preprocessing cost alone (no Tesseract), with input and output sizes."""
+    from PIL import Image
+    from benchmarks.upload_load import summarize
+    from services.image_preprocess import preprocess_for_ocr
+
+    seconds, pixels_in, pixels_out = [], 0, 0
+    for sample in samples:
+        if sample["kind"] != "image":
+            continue
+        with Image.open(sample["path"]) as image:
+            image.load()
+            t0 = time.perf_counter()
+            out = preprocess_for_ocr(image, image.info.get("dpi", (None,))[0])
+            seconds.append(time.perf_counter() - t0)
+            pixels_in += image.width * image.height
+            pixels_out += out.width * out.height
+    return {
+        "images": len(seconds),
+        "latency": summarize(seconds),
+        "megapixels_in": round(pixels_in / 1e6, 2),
+        "megapixels_out": round(pixels_out / 1e6, 2),
+    }
+
+def compare(report: dict, previous: dict) -> dict:
+    changes = {}
+    for mode in ("baseline", "preprocessed"):
+        before, now = previous.get("ocr", {}).get(mode), report.get("ocr", {}).get(mode)
+        if before and now and now["seconds"]:
+            changes[mode] = {
+                "speedup": round(before["seconds"] / now["seconds"], 2),
+                "accuracy_delta": round(now["mean_char_accuracy"] - before["mean_char_accuracy"], 4),
+            }
+    return {"baseline_label": previous.get("label"), "changes": changes}
+
+def main(args) -> dict:
+    from benchmarks.pipeline import tesseract_available
+    workdir = tempfile.mkdtemp(prefix="bdf-ocr-bench-")
+    try:
+        samples = build_samples(workdir, args.pages, args.seed, args.dpi)
+        report = {
+            "label": args.label,
+            "config": {"pages": args.pages, "seed": args.seed, "dpi": args.dpi, "tesseract": tesseract_available()},
+            "preprocess_only": bench_preprocess(samples),
+        }
+        if report["config"]["tesseract"]:
+            baseline = bench_ocr(samples, preprocess=False)
+            preprocessed = bench_ocr(samples, preprocess=True)
+            report["ocr"] = {
+                "baseline": baseline,
+                "preprocessed": preprocessed,
+                "speedup": round(baseline["seconds"] / preprocessed["seconds"], 2) if preprocessed["seconds"] else None,
+                "accuracy_delta": round(preprocessed["mean_char_accuracy"] - baseline["mean_char_accuracy"], 4),
+            }
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=200, help="Resolution of the scanned pages")
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--compare", help="Path to a previous JSON report from this script")
+    args = parser.parse_args()
+
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        report = main(args)
+    finally:
+        sys.stdout = stdout
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
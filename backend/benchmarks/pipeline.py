@@ -0,0 +1,277 @@
+"""
+End-to-end pipeline benchmark on a synthetic corpus, fully offline.
+
+Generates invoices (benchmarks/corpus.py), then measures each stage in-process:
+  pdf_text   extract_text_from_pdf / extract_text_from_image per document
+  prompt     PromptManager doc-type detection and prompt building
+  task       process_invoice_task run eagerly, split into ocr / extract / review / db time
+  api        dashboard endpoints through the ASGI app
+
+The LLM is the fake provider (LLM_PROVIDER=fake) and the database a throwaway SQLite file,
+unless --database-url is given. Prints per-stage timings, throughput and peak RSS as JSON;
+pass a previous report with --compare to get per-stage speedups.
+
+    python -m benchmarks.pipeline --docs 24 --llm-latency-ms 300 --label baseline > before.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (OCR pool) children, in MB."""
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+def configure_environment(args, workdir: str):
+    """Must run before anything imports core.config, since settings are read at import time."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_FAKE_JITTER_MS"] = str(args.llm_jitter_ms)
+    os.environ["LLM_FAKE_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["LLM_FAKE_SEED"] = str(args.seed)
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = "0"
+    os.environ["LLM_RETRY_BASE_SECONDS"] = "0.01"
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ["OCR_PARALLEL"] = "true" if args.ocr_parallel else "false"
+
+def stage_report(samples: list, elapsed: float) -> dict:
+    from benchmarks.upload_load import summarize
+    return {
+        "docs": len(samples),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(samples),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def bench_pdf_text(specs: list) -> dict:
+    from services.pdf_reader import extract_text_from_pdf
+    from services.ocr import extract_text_from_image
+
+    by_kind, samples, empty = {}, [], 0
+    start = time.perf_counter()
+    for spec in specs:
+        t0 = time.perf_counter()
+        if spec["path"].endswith(".pdf"):
+            text = extract_text_from_pdf(spec["path"])
+        else:
+            text = extract_text_from_image(spec["path"])
+        seconds = time.perf_counter() - t0
+        samples.append(seconds)
+        by_kind.setdefault(spec["kind"], []).append(seconds)
+        empty += int(not text.strip())
+    report = stage_report(samples, time.perf_counter() - start)
+    report["empty_results"] = empty
+    report["by_kind_mean_ms"] = {kind: round(sum(s) / len(s) * 1000, 2) for kind, s in by_kind.items()}
+    return report
+
+def bench_prompt(texts: list, repeat: int) -> dict:
+    from services.prompt_loader import get_prompt_manager
+    manager = get_prompt_manager()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            t0 = time.perf_counter()
+            doc_type = manager.determine_doc_type(text)
+            manager.get_structured_prompt(text)
+            manager.prompt_version(doc_type)
+            samples.append(time.perf_counter() - t0)
+    return stage_report(samples, time.perf_counter() - start)
+
+class StageTimer:
+    """Wraps pipeline functions by module attribute and accumulates their wall time."""
+    def __init__(self):
+        self.totals = {}
+
+    def wrap(self, module, attr: str, stage: str):
+        original = getattr(module, attr)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.totals[stage] = self.totals.get(stage, 0.0) + time.perf_counter() - t0
+
+        setattr(module, attr, timed)
+
+def bench_task(specs: list, concurrency: int) -> dict:
+    from celery_app import celery_app
+    from core.database import SessionLocal
+    from models.invoice import Document
+    from services import ai_reviewer, llm_client
+    from tasks import process_file
+
+    # Bind tasks up front; Celery does it lazily on first use, which races across threads
+    celery_app.finalize(auto=True)
+
+    timer = StageTimer()
+    timer.wrap(process_file, "_run_ocr", "ocr")
+    timer.wrap(process_file, "extract_invoice_data", "extract")
+    timer.wrap(ai_reviewer, "validate_invoice_data", "review")
+
+    db = SessionLocal()
+    try:
+        documents = [Document(filename=os.path.basename(s["path"]), file_path=s["path"]) for s in specs]
+        db.add_all(documents)
+        db.commit()
+        jobs = [(s["path"], d.id) for s, d in zip(specs, documents)]
+    finally:
+        db.close()
+
+    samples, failures = [], 0
+
+    def run(job):
+        t0 = time.perf_counter()
+        result = process_file.process_invoice_task.apply(args=list(job))
+        return time.perf_counter() - t0, result.successful()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seconds, ok in pool.map(run, jobs):
+            samples.append(seconds)
+            failures += int(not ok)
+    elapsed = time.perf_counter() - start
+
+    report = stage_report(samples, elapsed)
+    total = sum(samples)
+    breakdown = {stage: round(seconds, 3) for stage, seconds in timer.totals.items()}
+    # Whatever the wrapped stages don't account for is DB writes and task overhead
+    breakdown["db_and_overhead"] = round(max(0.0, total - sum(timer.totals.values())), 3)
+    report.update({"concurrency": concurrency, "failures": failures, "stage_seconds": breakdown, "llm": llm_client.call_stats()})
+    return report
+
+async def _bench_api(requests_per_endpoint: int) -> dict:
+    import httpx
+    from benchmarks.upload_load import summarize
+    from main import app
+
+    endpoints = ["/stats", "/invoices", "/chart", "/status-distribution", "/export?format=csv"]
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for endpoint in endpoints:
+            samples, errors = [], 0
+            start = time.perf_counter()
+            for _ in range(requests_per_endpoint):
+                t0 = time.perf_counter()
+                response = await client.get("/api/v1/dashboard" + endpoint)
+                if response.status_code == 200:
+                    samples.append(time.perf_counter() - t0)
+                else:
+                    errors += 1
+            elapsed = time.perf_counter() - start
+            results[endpoint] = {
+                "requests_per_sec": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "errors": errors,
+                "latency": summarize(samples),
+            }
+    return {"endpoints": results, "peak_rss_mb": peak_rss_mb()}
+
+def bench_api(requests_per_endpoint: int) -> dict:
+    import asyncio
+    return asyncio.run(_bench_api(requests_per_endpoint))
+
+def tesseract_available() -> bool:
+    try:
+        import pytesseract
+        from services import ocr  # sets tesseract_cmd from settings
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def compare(report: dict, previous: dict) -> dict:
+    """Speedup per stage as previous seconds / current seconds (>1 is faster)."""
+    speedups = {}
+    for stage in ("pdf_text", "prompt", "task"):
+        before, now = previous.get("stages", {}).get(stage), report["stages"].get(stage)
+        if before and now and now["seconds"]:
+            speedups[stage] = round(before["seconds"] / now["seconds"], 2)
+    return {"baseline_label": previous.get("label"), "speedup": speedups}
+
+def main(args) -> dict:
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="bdf-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(args, workdir)
+    # Upload/cache directories are created relative to the working directory
+    os.chdir(workdir)
+
+    from benchmarks import corpus
+    from core.database import engine
+    from models.invoice import Base
+    Base.metadata.create_all(bind=engine)
+
+    t0 = time.perf_counter()
+    specs = corpus.generate(os.path.join(workdir, "corpus"), args.docs, args.seed, args.dpi)
+    corpus_seconds = time.perf_counter() - t0
+
+    report = {
+        "label": args.label,
+        "config": {
+            "docs": args.docs, "seed": args.seed, "dpi": args.dpi,
+            "llm_latency_ms": args.llm_latency_ms, "llm_error_rate": args.llm_error_rate,
+            "ocr_parallel": args.ocr_parallel, "task_concurrency": args.task_concurrency,
+            "tesseract": tesseract_available(), "arabic_font": bool(corpus.find_arabic_font()),
+        },
+        "corpus_seconds": round(corpus_seconds, 3),
+        "stages": {},
+    }
+
+    from services.pdf_reader import extract_text_from_pdf
+    report["stages"]["pdf_text"] = bench_pdf_text(specs)
+    texts = [extract_text_from_pdf(s["path"]) for s in specs if s["kind"] == "text"]
+    report["stages"]["prompt"] = bench_prompt(texts, args.prompt_repeat)
+    report["stages"]["task"] = bench_task(specs, args.task_concurrency)
+    if not args.skip_api:
+        report["stages"]["api"] = bench_api(args.api_requests)
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    if not args.workdir and not args.keep:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=200, help="Resolution of scanned pages and images")
+    parser.add_argument("--llm-latency-ms", type=int, default=0)
+    parser.add_argument("--llm-jitter-ms", type=int, default=0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--task-concurrency", type=int, default=1, help="Tasks run at once, like LLM worker threads")
+    parser.add_argument("--ocr-parallel", action="store_true")
+    parser.add_argument("--prompt-repeat", type=int, default=50)
+    parser.add_argument("--api-requests", type=int, default=50, help="Requests per dashboard endpoint")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--workdir", help="Keep corpus and database here instead of a temp dir")
+    parser.add_argument("--keep", action="store_true", help="Don't delete the temp dir")
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--compare", help="Path to a previous JSON report from this script")
+    args = parser.parse_args()
+
+    # Reports go to stdout; keep library prints out of the JSON
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        report = main(args)
+    finally:
+        sys.stdout = stdout
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,92 @@
+"""
+Load test: latency of a light endpoint while large uploads are in flight.
+
+Run against a live API (uvicorn main:app) with a worker or without one; the task only has
+to be queued. Prints machine-readable JSON with p50/p99 probe latency for an idle baseline
+and for the period where N uploads are running concurrently.
+
+    python -m benchmarks.upload_load --url http://localhost:8000 --uploads 8 --size-mb 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import httpx
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(samples: list) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+        "mean_ms": round(statistics.mean(samples) * 1000, 2) if samples else 0.0,
+    }
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float) -> list:
+    """Hits `path` repeatedly until `stop` is set and returns the latencies in seconds."""
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples
+
+async def upload(client: httpx.AsyncClient, payload: bytes, index: int) -> float:
+    start = time.perf_counter()
+    files = {"file": (f"load_test_{index}.pdf", payload, "application/pdf")}
+    response = await client.post("/api/v1/upload", files=files)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def run(url: str, probe_path: str, uploads: int, size_mb: int, baseline_seconds: float, interval: float) -> dict:
+    # Random bytes keep the payload incompressible; the task will fail fast on it, which is fine here
+    payload = b"%PDF-1.4\n" + os.urandom(size_mb * 1024 * 1024)
+
+    async with httpx.AsyncClient(base_url=url, timeout=600) as client:
+        stop = asyncio.Event()
+        baseline_task = asyncio.create_task(probe(client, probe_path, stop, interval))
+        await asyncio.sleep(baseline_seconds)
+        stop.set()
+        baseline = await baseline_task
+
+        stop = asyncio.Event()
+        loaded_task = asyncio.create_task(probe(client, probe_path, stop, interval))
+        start = time.perf_counter()
+        upload_times = await asyncio.gather(*(upload(client, payload, i) for i in range(uploads)))
+        wall = time.perf_counter() - start
+        stop.set()
+        loaded = await loaded_task
+
+    return {
+        "probe_path": probe_path,
+        "uploads": uploads,
+        "upload_size_mb": size_mb,
+        "baseline": summarize(baseline),
+        "under_upload_load": summarize(loaded),
+        "uploads_wall_seconds": round(wall, 3),
+        "upload_latency": summarize(list(upload_times)),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--probe-path", default="/api/v1/dashboard/stats")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.probe_path, args.uploads, args.size_mb, args.baseline_seconds, args.interval))
+    print(json.dumps(report, indent=2))
@@ -1,9 +1,12 @@
+import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from core.config import settings
 
 celery_app = Celery(
     "bdf_worker",
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/0",
+    broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
     include=["tasks.process_file"]
 )
 
@@ -13,4 +16,36 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Results live in the database; the backend copy is only for in-flight chaining
+    result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
+    # At-least-once when enabled: results are written idempotently per document, so redelivery is safe
+    task_acks_late=settings.CELERY_ACKS_LATE,
+    task_reject_on_worker_lost=settings.CELERY_ACKS_LATE and settings.CELERY_REJECT_ON_WORKER_LOST,
 )
+if settings.CELERY_ACKS_LATE:
+    # Unacknowledged long OCR tasks must not be handed to a second worker while the first still runs
+    celery_app.conf.broker_transport_options = {"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT_SECONDS}
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Sets up per-process clients once in each forked worker instead of once per task."""
+    from core.database import engine
+    from services import llm_client
+    from services.prompt_loader import get_prompt_manager
+    # Pooled connections inherited from the parent must not be shared across forks
+    engine.dispose(close=False)
+    llm_client.reset_client()
+    llm_client.init_client()
+    get_prompt_manager()
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    """Serves Prometheus metrics from the worker's main process."""
+    if settings.METRICS_WORKER_PORT:
+        from services import metrics
+        metrics.start_exporter(settings.METRICS_WORKER_PORT)
+
+@worker_process_shutdown.connect
+def cleanup_process_metrics(pid=None, **kwargs):
+    from services import metrics
+    metrics.mark_process_dead(pid or os.getpid())
@@ -1,14 +1,35 @@
+from typing import Callable, Optional, Union
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from core.config import settings
 
 # Use PostgreSQL from settings
 DATABASE_URL = settings.DATABASE_URL
 
+def _async_database_url(url: str) -> str:
+    """Maps the configured URL onto an async driver (psycopg 3 for Postgres, aiosqlite for SQLite)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+psycopg://" + url.split("://", 1)[1]
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+psycopg://", 1)
+    return url
+
+ASYNC_DATABASE_URL = _async_database_url(DATABASE_URL)
+
 # Set engine arguments
-engine_kwargs = {"echo": False}
+engine_kwargs = {"echo": False, "pool_pre_ping": settings.DB_POOL_PRE_PING}
 if DATABASE_URL.startswith("sqlite"):
     engine_kwargs["connect_args"] = {"check_same_thread": False}
+else:
+    engine_kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
 
 engine = create_engine(
     DATABASE_URL,
@@ -17,6 +38,16 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API routers, so queries don't block the event loop.
+# Celery tasks and maintenance scripts keep using the sync engine above.
+async_engine_kwargs = {k: v for k, v in engine_kwargs.items() if k != "connect_args"}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **async_engine_kwargs
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
 
@@ -26,3 +57,28 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def on_conflict_upsert(dialect: str, table, rows: Union[list, dict], index_elements: list,
+                       set_: Union[dict, Callable], where=None) -> Optional[object]:
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE for Postgres and SQLite. `set_` is the
+    update's column values, or a function of the statement's `excluded` row returning them.
+    With `where`, only existing rows matching it are updated; the others are left alone (and
+    not RETURNed). Returns None for other dialects, where callers run their own fallback.
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_=set_(stmt.excluded) if callable(set_) else set_,
+        where=where
+    )
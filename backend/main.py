@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers import upload, result, invoice, dashboard
+from routers import upload, result, invoice, dashboard, events, search
 from core.database import engine, Base
+from services import metrics
 
 # Create tables
 # Note: In production you should use Alembic migrations
@@ -16,6 +18,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count-Estimate"],
 )
 
 # Include Routers
@@ -23,6 +26,23 @@ app.include_router(upload.router, prefix="/api/v1", tags=["Upload"])
 app.include_router(result.router, prefix="/api/v1", tags=["Result"])
 app.include_router(invoice.router, prefix="/api/v1/invoice", tags=["Invoice"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
+app.include_router(events.router, prefix="/api/v1", tags=["Events"])
+app.include_router(search.router, prefix="/api/v1", tags=["Search"])
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by endpoint name, not raw path, so ids don't blow up the series count
+    route = request.scope.get("route")
+    metrics.HTTP_SECONDS.labels(
+        request.method, route.name if route else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 @app.get("/")
 def read_root():
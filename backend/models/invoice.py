@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, DateTime, Enum as SqlEnum, Text, JSON, Boolean
+from sqlalchemy import DDL, event, Column, Integer, BigInteger, String, Date, Numeric, Float, ForeignKey, DateTime, Enum as SqlEnum, Text, JSON, Boolean, Index, LargeBinary
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from core.database import Base
 from models.task_status import ProcessingStatus
 
+# The trigram index on invoices.vendor needs pg_trgm
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -13,6 +19,18 @@ class Document(Base):
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     batch_id = Column(String, index=True, nullable=True)
     status = Column(SqlEnum(ProcessingStatus), default=ProcessingStatus.PENDING)
+    task_id = Column(String, unique=True, index=True, nullable=True) # Celery task id, assigned at upload
+
+    # Stage timestamps, set by the worker
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    ocr_completed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True) # COMPLETED or FAILED
+    error = Column(Text, nullable=True)
+
+    # Near-duplicate of an earlier document (services/dedup.py): its id and the text similarity
+    # (None when matched on vendor, number and total after extraction)
+    duplicate_of = Column(Integer, ForeignKey("documents.id"), index=True, nullable=True)
+    duplicate_score = Column(Float, nullable=True)
 
 class Invoice(Base):
     __tablename__ = "invoices"
@@ -29,6 +47,7 @@ class Invoice(Base):
     doc_type = Column(String, nullable=True) # "invoice", "receipt", "general_document", "error_fallback"
     summary = Column(Text, nullable=True) 
     raw_content = Column(Text, nullable=True)
+    validation = Column(JSON, nullable=True) # Structured verdict from services/validator (+ LLM reviewer)
     
     # Audit & Verification
     verified = Column(Boolean, default=False)
@@ -37,6 +56,20 @@ class Invoice(Base):
     document = relationship("Document")
     line_items = relationship("LineItem", back_populates="invoice", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Dashboard filters are "verified" plus a date range
+        Index("ix_invoices_verified_date", "verified", "date"),
+        # Keyset pagination order for the dashboard list
+        Index("ix_invoices_date_id", "date", "id"),
+        # Duplicate lookup on (invoice_number, total) after extraction
+        Index("ix_invoices_number_total", "invoice_number", "total"),
+        # Lets vendor ILIKE '%...%' searches use an index on Postgres
+        Index(
+            "ix_invoices_vendor_trgm", "vendor",
+            postgresql_using="gin", postgresql_ops={"vendor": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class LineItem(Base):
     __tablename__ = "line_items"
 
@@ -50,4 +83,70 @@ class LineItem(Base):
 
     invoice = relationship("Invoice", back_populates="line_items")
 
+class MonthlySpend(Base):
+    """
+    Running totals of verified invoice spend per calendar month, maintained by
+    services/rollups.py whenever an invoice is approved. Undated invoices go to year=0, month=0.
+    """
+    __tablename__ = "monthly_spend"
+
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+class DocumentFingerprint(Base):
+    """
+    MinHash signature of a document's OCR text plus the numbers in it, for near-duplicate
+    checks (services/dedup.py). Only documents that aren't duplicates themselves are registered.
+    """
+    __tablename__ = "document_fingerprints"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+    numbers = Column(Text, nullable=False, default="") # space-separated, sorted
+    identifiers = Column(Text, nullable=True) # dates and reference numbers, same format
+
+class FingerprintBand(Base):
+    """LSH buckets of a fingerprint, one row per band. Documents sharing a bucket are duplicate candidates."""
+    __tablename__ = "fingerprint_bands"
+
+    # Primary key order makes lookups by bucket an index range scan
+    bucket = Column(BigInteger, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+
+class SearchDocument(Base):
+    """
+    One row per invoice with its searchable text (vendor, number, OCR text, line items), already
+    tokenized and normalized by services/search.py. Postgres indexes it through a generated
+    tsvector column with a GIN index; SQLite through an FTS5 table kept in sync by triggers.
+    """
+    __tablename__ = "search_documents"
+
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), primary_key=True)
+    content = Column(Text, nullable=False, default="")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Postgres: tokens are normalized before they're stored, so the 'simple' config (no stemming, no stop words) fits
+for statement in (
+    "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING gin (tsv)",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
 
+# SQLite: an external-content FTS5 index over search_documents.content
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "content, content='search_documents', content_rowid='invoice_id', tokenize='unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, content) VALUES (new.invoice_id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, content) VALUES ('delete', old.invoice_id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, content) VALUES ('delete', old.invoice_id, old.content); "
+    "INSERT INTO search_fts(rowid, content) VALUES (new.invoice_id, new.content); END",
+    # Indexed terms with document counts, for spelling correction
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_vocab USING fts5vocab(search_fts, 'row')",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -1,42 +1,51 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, and_, or_, text
 from typing import List, Optional
 from datetime import datetime, timedelta
-from core.database import get_db
-from models.invoice import Invoice
+from core.database import get_async_db, AsyncSessionLocal
+from models.invoice import Invoice, LineItem, MonthlySpend
+from services.rollups import period_index, UNDATED
 from models.task_status import ProcessingStatus
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import base64
+import csv
 import io
+import json
+import tempfile
 from openpyxl import Workbook
-import pandas as pd
 
 router = APIRouter()
 
 @router.get("/stats")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
-    # Total Spend (Only verified/approved)
-    total_spend = db.query(func.sum(Invoice.total)).filter(Invoice.verified == True).scalar() or 0
-    
-    # Pending Reviews (Created but not verified)
-    pending_reviews = db.query(func.count(Invoice.id)).filter(Invoice.verified == False).scalar() or 0
-    
+async def get_dashboard_stats(db: AsyncSession = Depends(get_async_db)):
     # Monthly Growth
     now = datetime.now()
     first_day_of_current_month = now.replace(day=1)
     last_day_of_last_month = first_day_of_current_month - timedelta(days=1)
-    first_day_of_last_month = last_day_of_last_month.replace(day=1)
-    
-    current_month_spend = db.query(func.sum(Invoice.total)).filter(
-        Invoice.verified == True,
-        Invoice.date >= first_day_of_current_month
-    ).scalar() or 0
+    current_period = period_index(now.year, now.month)
+    last_period = period_index(last_day_of_last_month.year, last_day_of_last_month.month)
+
+    # One pass over the monthly rollup (only verified/approved spend), plus the
+    # pending count from the (verified, date) index, in a single round trip
+    period = period_index(MonthlySpend.year, MonthlySpend.month)
+    pending_subquery = select(func.count(Invoice.id)).where(Invoice.verified == False).scalar_subquery()
+    row = (await db.execute(select(
+        func.coalesce(func.sum(MonthlySpend.total), 0).label("total_spend"),
+        func.coalesce(func.sum(case((period >= current_period, MonthlySpend.total), else_=0)), 0).label("current_month_spend"),
+        func.coalesce(func.sum(case((period == last_period, MonthlySpend.total), else_=0)), 0).label("last_month_spend"),
+        pending_subquery.label("pending_reviews")
+    ))).one()
+
+    # Total Spend (Only verified/approved)
+    total_spend = row.total_spend or 0
     
-    last_month_spend = db.query(func.sum(Invoice.total)).filter(
-        Invoice.verified == True,
-        Invoice.date >= first_day_of_last_month,
-        Invoice.date <= last_day_of_last_month
-    ).scalar() or 0
+    # Pending Reviews (Created but not verified)
+    pending_reviews = row.pending_reviews or 0
+
+    current_month_spend = row.current_month_spend or 0
+    last_month_spend = row.last_month_spend or 0
     
     growth = 0
     if last_month_spend > 0:
@@ -50,25 +59,87 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
         "monthlyGrowth": round(float(growth), 2)
     }
 
+def _encode_cursor(invoice_date, invoice_id: int) -> str:
+    payload = json.dumps({"date": invoice_date.isoformat() if invoice_date else None, "id": invoice_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        cursor_date = datetime.strptime(payload["date"], "%Y-%m-%d").date() if payload["date"] else None
+        return cursor_date, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _estimate_count(db: AsyncSession, query) -> int:
+    """
+    Row count estimate for a filtered invoice query. Postgres answers from the planner
+    (EXPLAIN) instead of running an exact COUNT; other databases fall back to COUNT.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        compiled = query.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+        plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return (await db.execute(select(func.count()).select_from(query.subquery()))).scalar() or 0
+
 @router.get("/invoices")
 async def get_invoices(
+    response: Response,
     vendor: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Invoice)
+    """
+    Returns one page of invoices ordered newest first by (date, id).
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    `include_total` adds an X-Total-Count-Estimate header.
+    """
+    # Only the columns the list shows, instead of hydrating full Invoice objects
+    query = select(
+        Invoice.id, Invoice.vendor, Invoice.date, Invoice.total, Invoice.currency, Invoice.verified
+    )
     
     if vendor:
-        query = query.filter(Invoice.vendor.ilike(f"%{vendor}%"))
+        # Backed by the pg_trgm GIN index on Postgres
+        query = query.where(Invoice.vendor.ilike(f"%{vendor}%"))
     
     if start_date:
-        query = query.filter(Invoice.date >= datetime.strptime(start_date, "%Y-%m-%d").date())
+        query = query.where(Invoice.date >= datetime.strptime(start_date, "%Y-%m-%d").date())
         
     if end_date:
-        query = query.filter(Invoice.date <= datetime.strptime(end_date, "%Y-%m-%d").date())
-        
-    invoices = query.order_by(Invoice.date.desc()).all()
+        query = query.where(Invoice.date <= datetime.strptime(end_date, "%Y-%m-%d").date())
+
+    if include_total:
+        response.headers["X-Total-Count-Estimate"] = str(await _estimate_count(db, query))
+
+    # Keyset pagination. Undated invoices sort first (Postgres' default for DESC),
+    # which keeps the order a plain backward scan of the (date, id) index.
+    if cursor:
+        cursor_date, cursor_id = _decode_cursor(cursor)
+        if cursor_date is None:
+            query = query.where(or_(
+                and_(Invoice.date.is_(None), Invoice.id < cursor_id),
+                Invoice.date.is_not(None)
+            ))
+        else:
+            query = query.where(or_(
+                Invoice.date < cursor_date,
+                and_(Invoice.date == cursor_date, Invoice.id < cursor_id)
+            ))
+
+    query = query.order_by(Invoice.date.desc().nulls_first(), Invoice.id.desc()).limit(limit + 1)
+    invoices = (await db.execute(query)).all()
+
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        last = invoices[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.date, last.id)
     
     return [
         {
@@ -83,23 +154,19 @@ async def get_invoices(
     ]
 
 @router.get("/chart")
-async def get_chart_data(db: Session = Depends(get_db)):
-    # Spend over the last 6 months
+async def get_chart_data(db: AsyncSession = Depends(get_async_db)):
+    # Spend over the last 6 months, read from the monthly rollup instead of
+    # grouping the invoices table on every request
     today = datetime.now()
     six_months_ago = today - timedelta(days=180)
     
-    # SQLite friendly query using func.strftime or just manual aggregation if volume is low?
-    # Let's try to do it as a query.
-    # Note: SQLite date extraction is tricky in SQLAlchemy
-    
-    results = db.query(
-        extract('year', Invoice.date).label('year'),
-        extract('month', Invoice.date).label('month'),
-        func.sum(Invoice.total).label('total')
-    ).filter(
-        Invoice.verified == True,
-        Invoice.date >= six_months_ago.date()
-    ).group_by('year', 'month').order_by('year', 'month').all()
+    results = (await db.execute(select(
+        MonthlySpend.year, MonthlySpend.month, MonthlySpend.total
+    ).where(
+        MonthlySpend.year != UNDATED[0],
+        period_index(MonthlySpend.year, MonthlySpend.month) >= period_index(six_months_ago.year, six_months_ago.month),
+        MonthlySpend.invoice_count > 0
+    ).order_by(MonthlySpend.year, MonthlySpend.month))).all()
     
     chart_data = []
     for r in results:
@@ -112,51 +179,119 @@ async def get_chart_data(db: Session = Depends(get_db)):
     return chart_data
 
 @router.get("/status-distribution")
-async def get_status_distribution(db: Session = Depends(get_db)):
-    # Counts of Approved vs Pending Review
-    approved = db.query(func.count(Invoice.id)).filter(Invoice.verified == True).scalar() or 0
-    pending = db.query(func.count(Invoice.id)).filter(Invoice.verified == False).scalar() or 0
+async def get_status_distribution(db: AsyncSession = Depends(get_async_db)):
+    # Counts of Approved vs Pending Review in one pass
+    row = (await db.execute(select(
+        func.count(case((Invoice.verified == True, 1))).label("approved"),
+        func.count(case((Invoice.verified == False, 1))).label("pending")
+    ))).one()
+    approved = row.approved or 0
+    pending = row.pending or 0
     
     return [
         {"name": "Approved", "value": approved, "color": "#10b981"}, # emerald-500
         {"name": "Pending", "value": pending, "color": "#f59e0b"}   # amber-500
     ]
 
+EXPORT_COLUMNS = ["Vendor", "Invoice #", "Date", "Amount", "Currency", "Status"]
+LINE_ITEM_COLUMNS = ["Item Description", "Quantity", "Unit Price", "Line Total"]
+EXPORT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _export_row(row, include_line_items: bool) -> list:
+    values = [
+        row.vendor,
+        row.invoice_number,
+        row.date.isoformat() if row.date else "",
+        float(row.total) if row.total else 0,
+        row.currency,
+        "Approved" if row.verified else "Pending Review"
+    ]
+    if include_line_items:
+        values += [
+            row.description,
+            float(row.quantity) if row.quantity is not None else None,
+            float(row.unit_price) if row.unit_price is not None else None,
+            float(row.total_price) if row.total_price is not None else None
+        ]
+    return values
+
+async def _export_batches(query):
+    """
+    Yields lists of rows read through a server-side cursor, EXPORT_BATCH_SIZE at a time.
+    Uses its own session because the response body is produced after the endpoint returns.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+async def _stream_csv(query, include_line_items: bool):
+    # BOM so Excel opens Arabic vendor names as UTF-8
+    yield "\ufeff".encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS + (LINE_ITEM_COLUMNS if include_line_items else []))
+    async for rows in _export_batches(query):
+        for row in rows:
+            writer.writerow(_export_row(row, include_line_items))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def _stream_xlsx(query, include_line_items: bool):
+    # Write-only mode streams rows into temporary XML parts instead of keeping cells in memory.
+    # The zip container can only be finalised at the end, so it is spooled to disk and then sent in chunks.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Invoices")
+    sheet.append(EXPORT_COLUMNS + (LINE_ITEM_COLUMNS if include_line_items else []))
+    async for rows in _export_batches(query):
+        for row in rows:
+            sheet.append(_export_row(row, include_line_items))
+
+    with tempfile.TemporaryFile() as output:
+        await run_in_threadpool(workbook.save, output)
+        output.seek(0)
+        while chunk := await run_in_threadpool(output.read, EXPORT_CHUNK_SIZE):
+            yield chunk
+
 @router.get("/export")
 async def export_invoices(
     vendor: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    export_format: str = Query("xlsx", alias="format", pattern="^(xlsx|csv)$"),
+    include_line_items: bool = False
 ):
-    query = db.query(Invoice)
-    if vendor: query = query.filter(Invoice.vendor.ilike(f"%{vendor}%"))
-    if start_date: query = query.filter(Invoice.date >= datetime.strptime(start_date, "%Y-%m-%d").date())
-    if end_date: query = query.filter(Invoice.date <= datetime.strptime(end_date, "%Y-%m-%d").date())
-    
-    invoices = query.all()
-    
-    data = []
-    for inv in invoices:
-        data.append({
-            "Vendor": inv.vendor,
-            "Invoice #": inv.invoice_number,
-            "Date": inv.date.isoformat() if inv.date else "",
-            "Amount": float(inv.total) if inv.total else 0,
-            "Currency": inv.currency,
-            "Status": "Approved" if inv.verified else "Pending Review"
-        })
-    
-    df = pd.DataFrame(data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Invoices')
-    
-    output.seek(0)
+    """
+    Streams the filtered invoices as xlsx (default) or csv with constant memory.
+    With include_line_items each line item becomes its own row, joined in the same query.
+    """
+    query = select(
+        Invoice.id, Invoice.vendor, Invoice.invoice_number, Invoice.date,
+        Invoice.total, Invoice.currency, Invoice.verified
+    )
+    if vendor: query = query.where(Invoice.vendor.ilike(f"%{vendor}%"))
+    if start_date: query = query.where(Invoice.date >= datetime.strptime(start_date, "%Y-%m-%d").date())
+    if end_date: query = query.where(Invoice.date <= datetime.strptime(end_date, "%Y-%m-%d").date())
+
+    if include_line_items:
+        query = query.add_columns(
+            LineItem.description, LineItem.quantity, LineItem.unit_price, LineItem.total_price
+        ).outerjoin(LineItem, LineItem.invoice_id == Invoice.id).order_by(Invoice.id, LineItem.id)
+    else:
+        query = query.order_by(Invoice.id)
+
+    stream = _stream_csv if export_format == "csv" else _stream_xlsx
     
     headers = {
-        'Content-Disposition': 'attachment; filename="invoices_export.xlsx"'
+        'Content-Disposition': f'attachment; filename="invoices_export.{export_format}"'
     }
     
-    return StreamingResponse(output, headers=headers, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return StreamingResponse(stream(query, include_line_items), headers=headers, media_type=EXPORT_MEDIA_TYPES[export_format])
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from celery.result import AsyncResult
+from celery_app import celery_app
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.invoice import Document
+from services.events import TERMINAL_STATUSES, batch_channel, get_event_hub, task_channel
+from services.results import celery_payload, load_task_result
+
+router = APIRouter()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
+
+async def _subscribe(channel: str):
+    try:
+        return await get_event_hub().subscribe(channel)
+    except (asyncio.TimeoutError, OSError):
+        raise HTTPException(status_code=503, detail="Event stream unavailable, poll /result instead")
+
+async def _next_event(request: Request, queue: asyncio.Queue):
+    """Waits for the next event; yields None on each heartbeat. Stops when the client disconnects."""
+    while True:
+        try:
+            yield await asyncio.wait_for(queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            if await request.is_disconnected():
+                return
+            yield None
+
+async def _task_snapshot(task_id: str) -> dict:
+    """
+    The task's latest event; if none was recorded (it expired, or predates events), the stored
+    result from the database, and failing that its Celery state.
+    """
+    event = await get_event_hub().last_event(task_id)
+    if event:
+        return event
+    async with AsyncSessionLocal() as db:
+        result = await load_task_result(db, task_id)
+    if result is not None:
+        status = {"completed": "COMPLETED", "failed": "FAILED"}.get(result["status"], "PROCESSING")
+        return {"type": "status", "task_id": task_id, **result, "status": status}
+    return await run_in_threadpool(_celery_snapshot, task_id)
+
+def _celery_snapshot(task_id: str) -> dict:
+    try:
+        task_result = AsyncResult(task_id, app=celery_app)
+        if task_result.ready():
+            if task_result.successful():
+                return {"type": "status", "task_id": task_id, "status": "COMPLETED", "data": celery_payload(task_result.result)}
+            return {"type": "status", "task_id": task_id, "status": "FAILED", "error": str(task_result.result)}
+    except Exception as e:
+        print(f"Could not read Celery state for task {task_id}: {e}")
+    return {"type": "status", "task_id": task_id, "status": "PENDING"}
+
+@router.get("/events/task/{task_id}")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Server-Sent Events for one task: the current state first, then each transition
+    (PROCESSING per stage, then COMPLETED with the result or FAILED). Closes after the terminal event.
+    """
+    channel = task_channel(task_id)
+    queue = await _subscribe(channel)
+
+    async def stream():
+        try:
+            snapshot = await _task_snapshot(task_id)
+            yield _sse(snapshot)
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+            async for event in _next_event(request, queue):
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                yield _sse(event)
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            get_event_hub().unsubscribe(channel, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/events/batch/{batch_id}")
+async def stream_batch_events(batch_id: str, request: Request):
+    """
+    Server-Sent Events for a batch: a snapshot of per-status counts, then every document's
+    transitions, then a final summary once all documents are COMPLETED or FAILED.
+    """
+    channel = batch_channel(batch_id)
+    queue = await _subscribe(channel)
+
+    # Short-lived session: the stream may stay open for minutes and shouldn't hold a connection
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Document.id, Document.status).where(Document.batch_id == batch_id)
+        )).all()
+    if not rows:
+        get_event_hub().unsubscribe(channel, queue)
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    statuses = {doc_id: status.value for doc_id, status in rows}
+
+    def summary(kind: str) -> dict:
+        counts = {}
+        for status in statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        finished = all(status in TERMINAL_STATUSES for status in statuses.values())
+        return {"type": kind, "batch_id": batch_id, "total": len(statuses), "counts": counts, "finished": finished}
+
+    async def stream():
+        try:
+            snapshot = summary("snapshot")
+            yield _sse(snapshot)
+            if snapshot["finished"]:
+                return
+            async for event in _next_event(request, queue):
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                if event.get("document_id") in statuses:
+                    statuses[event["document_id"]] = event["status"]
+                yield _sse(event)
+                done = summary("summary")
+                if done["finished"]:
+                    yield _sse(done)
+                    return
+        finally:
+            get_event_hub().unsubscribe(channel, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
-from core.database import get_db
+from core.database import get_async_db
 from models.invoice import Invoice
+from services.rollups import record_invoice_change
+from services.results import result_cache
+from services import search
+from core.config import settings
 from datetime import datetime
 
 router = APIRouter()
@@ -42,7 +47,7 @@ class ApproveRequest(BaseModel):
     auditLog: AuditLog
 
 @router.post("/approve")
-async def approve_invoice(request: ApproveRequest, db: Session = Depends(get_db)):
+async def approve_invoice(request: ApproveRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Approve an invoice after manual review.
     Updates the invoice record with the reviewed data.
@@ -51,7 +56,9 @@ async def approve_invoice(request: ApproveRequest, db: Session = Depends(get_db)
     
     # Try to resolve invoice_id from document_id if missing
     if not invoice_id and request.data.document_id:
-        inv = db.query(Invoice).filter(Invoice.document_id == request.data.document_id).first()
+        inv = (await db.execute(
+            select(Invoice).where(Invoice.document_id == request.data.document_id)
+        )).scalars().first()
         if inv:
             invoice_id = inv.id
             
@@ -61,9 +68,18 @@ async def approve_invoice(request: ApproveRequest, db: Session = Depends(get_db)
          # For robustness given previous "mock" state of app, let's return 404.
          raise HTTPException(status_code=404, detail="Invoice ID not found in request")
 
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    # Row lock until commit: a second approval of the same invoice waits and then sees it verified,
+    # so the monthly spend rollup is adjusted once. populate_existing refreshes an invoice the
+    # document_id lookup above already loaded without the lock.
+    invoice = (await db.execute(
+        select(Invoice).where(Invoice.id == invoice_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )).scalars().first()
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
+
+    # Remember the previous state so the monthly spend rollup can be adjusted
+    was_verified, old_date, old_total = bool(invoice.verified), invoice.date, invoice.total
         
     # Update fields from the 'value' of the reviewed data
     invoice.vendor = str(request.data.vendor_name.value)
@@ -89,8 +105,17 @@ async def approve_invoice(request: ApproveRequest, db: Session = Depends(get_db)
     invoice.verified = True
     # Convert AuditLog pydantic model to dict for JSON column
     invoice.audit_log = request.auditLog.model_dump() if request.auditLog else None
+
+    await record_invoice_change(db, was_verified, old_date, old_total, invoice)
+    document_id = invoice.document_id
+    if settings.SEARCH_INDEX_ENABLED:
+        # Vendor and number may have been corrected; reindex in the same transaction
+        await db.flush()
+        await search.reindex_invoices(db, [invoice_id])
     
     # Save changes
-    db.commit()
+    await db.commit()
+    # This process's cached /result payload is stale now; other processes catch up within RESULT_CACHE_TTL_SECONDS
+    result_cache.invalidate_document(document_id)
     
     return {"status": "approved", "id": invoice_id}
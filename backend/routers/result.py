@@ -1,52 +1,56 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from celery.result import AsyncResult
 from celery_app import celery_app
-from core.database import get_db
+from core.database import get_async_db
 from models.invoice import Document, Invoice, ProcessingStatus
+from services.results import celery_payload, load_task_result
 
 router = APIRouter()
 
 @router.get("/result/{task_id}")
-async def get_result(task_id: str, db: Session = Depends(get_db)):
+async def get_result(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
-    Check the status of the Celery task and return the result.
-    It checks Redis (via Celery) and fallbacks to PostgreSQL for persistent data.
+    Returns a task's status and, once finished, its stored result.
+    Read from the database by the document's task_id, so results outlive the Celery backend's
+    CELERY_RESULT_EXPIRES_SECONDS. Prefer GET /events/task/{task_id}, which pushes the result instead of being polled.
     """
+    result = await load_task_result(db, task_id)
+    if result is not None:
+        return result
+
+    # Tasks enqueued before task ids were stored on documents: only Celery knows them
+    return await run_in_threadpool(_celery_result, task_id)
+
+def _celery_result(task_id: str) -> dict:
     task_result = AsyncResult(task_id, app=celery_app)
-    
-    # 1. Check if task is finished in Celery
     if task_result.ready():
         if task_result.successful():
             return {
                 "status": "completed",
-                "data": task_result.result
+                "data": celery_payload(task_result.result)
             }
         else:
             return {
                 "status": "failed",
                 "error": str(task_result.result)
             }
-    
-    # 2. If not ready in Celery, check Database status (optional cross-check)
-    # We can find the document associated with this task if we stored task_id in DB.
-    # Currently we don't store task_id in Document model. 
-    # But we can query by document_id if the frontend knows it.
-    
     return {
         "status": "processing"
     }
 
 @router.get("/document/{doc_id}")
-async def get_document_result(doc_id: int, db: Session = Depends(get_db)):
+async def get_document_result(doc_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Fetch extraction result directly from PostgreSQL using the document ID.
     """
-    doc = db.query(Document).filter(Document.id == doc_id).first()
+    doc = (await db.execute(select(Document).where(Document.id == doc_id))).scalars().first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    invoice = db.query(Invoice).filter(Invoice.document_id == doc_id).first()
+    invoice = (await db.execute(select(Invoice).where(Invoice.document_id == doc_id))).scalars().first()
     
     return {
         "status": doc.status,
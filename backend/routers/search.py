@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from core.config import settings
+from core.database import get_async_db
+from models.invoice import Invoice
+from services import search
+
+router = APIRouter()
+
+@router.get("/search")
+async def search_invoices(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    fuzzy: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ranked full-text search over vendor, invoice number, OCR text and line items, in English and Arabic.
+    All query words must match; the last one also matches as a prefix.
+    With `fuzzy`, a query with no full-text hits is retried typo-tolerantly (first page only): as a
+    trigram vendor match on Postgres, with spelling-corrected words on SQLite.
+    Pass `next_offset` back as `offset` for the next page.
+    """
+    terms = search.query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+
+    dialect = db.get_bind().dialect.name
+    mode = "fulltext"
+    hits = (await db.execute(
+        search.ranked_ids_query(dialect, terms, limit + 1, offset, settings.SEARCH_MAX_CANDIDATES)
+    )).all()
+    if not hits and fuzzy and offset == 0:
+        mode = "fuzzy"
+        if dialect == "sqlite":
+            corrected = await search.corrected_terms(db, terms)
+            if corrected != terms:
+                hits = (await db.execute(
+                    search.ranked_ids_query(dialect, corrected, limit + 1, 0, settings.SEARCH_MAX_CANDIDATES)
+                )).all()
+        else:
+            hits = (await db.execute(search.fuzzy_vendor_query(dialect, q, limit + 1))).all()
+
+    next_offset = offset + limit if len(hits) > limit else None
+    hits = hits[:limit]
+
+    # Only the columns the result list shows, fetched by primary key for this page
+    rows = {
+        row.id: row for row in (await db.execute(select(
+            Invoice.id, Invoice.document_id, Invoice.vendor, Invoice.invoice_number,
+            Invoice.date, Invoice.total, Invoice.currency, Invoice.doc_type, Invoice.verified
+        ).where(Invoice.id.in_([hit.invoice_id for hit in hits])))).all()
+    }
+
+    results = []
+    for hit in hits:
+        row = rows.get(hit.invoice_id)
+        if row is None:
+            continue
+        results.append({
+            "invoice_id": row.id,
+            "document_id": row.document_id,
+            "vendor": row.vendor,
+            "invoice_number": row.invoice_number,
+            "date": row.date.isoformat() if row.date else None,
+            "total": float(row.total) if row.total is not None else None,
+            "currency": row.currency,
+            "doc_type": row.doc_type,
+            "status": "Approved" if row.verified else "Pending Review",
+            "score": round(float(hit.score or 0), 4),
+        })
+
+    return {"query": q, "mode": mode, "results": results, "next_offset": next_offset}
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, File, UploadFile, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, File, UploadFile, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func
+from celery import group
+from typing import List
+import anyio
 import os
 import shutil
-from core.database import get_db
+import time
+import uuid
+import zipfile
+import zlib
+from core.config import settings
+from core.database import get_async_db
 from models.invoice import Document, ProcessingStatus
 from tasks.process_file import process_invoice_task
 
@@ -11,34 +21,198 @@ router = APIRouter()
 TEMP_STORAGE = "temp_storage"
 os.makedirs(TEMP_STORAGE, exist_ok=True)
 
+# File types the OCR pipeline can read
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+
+def _is_supported(filename: str) -> bool:
+    return not filename.startswith(".") and os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS
+
+def _too_large(filename: str) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{filename} exceeds the upload limit of {settings.MAX_UPLOAD_BYTES} bytes"
+    )
+
+async def _save_upload(upload: UploadFile, dest_path: str):
+    """
+    Streams an upload to disk in UPLOAD_CHUNK_SIZE chunks without blocking the event loop.
+    Raises 413 (and removes the partial file) once MAX_UPLOAD_BYTES is exceeded.
+    """
+    if upload.size is not None and upload.size > settings.MAX_UPLOAD_BYTES:
+        raise _too_large(upload.filename)
+
+    written = 0
+    try:
+        async with await anyio.open_file(dest_path, "wb") as buffer:
+            while chunk := await upload.read(settings.UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > settings.MAX_UPLOAD_BYTES:
+                    raise _too_large(upload.filename)
+                await buffer.write(chunk)
+    except HTTPException:
+        await anyio.Path(dest_path).unlink(missing_ok=True)
+        raise
+
+def _extract_archive(archive_file, archive_name: str, batch_dir: str, start_index: int) -> list:
+    """
+    Streams supported zip members to disk one at a time. Blocking, so callers run it in a thread.
+    Member sizes are counted while copying rather than trusted from the zip header.
+    """
+    saved = []
+    try:
+        with zipfile.ZipFile(archive_file) as archive:
+            for member in archive.infolist():
+                # basename() also guards against "../" paths in the archive
+                member_name = os.path.basename(member.filename)
+                if member.is_dir() or not _is_supported(member_name):
+                    continue
+                file_path = os.path.join(batch_dir, f"{start_index + len(saved):05d}_{member_name}")
+                written = 0
+                with archive.open(member) as source, open(file_path, "wb") as buffer:
+                    while chunk := source.read(settings.UPLOAD_CHUNK_SIZE):
+                        written += len(chunk)
+                        if written > settings.MAX_UPLOAD_BYTES:
+                            raise _too_large(member_name)
+                        buffer.write(chunk)
+                saved.append((member_name, file_path))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {archive_name}")
+    except (RuntimeError, NotImplementedError, zlib.error, EOFError) as e:
+        # Encrypted members, unsupported compression methods, truncated or corrupt data
+        raise HTTPException(status_code=400, detail=f"Could not extract {archive_name}: {e}")
+    return saved
+
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_file(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     """
     Uploads a file, saves it, creates a DB record, and triggers the Celery processing task.
+    The broker publish is blocking, so it runs in the threadpool to keep other requests flowing.
     """
+    # basename() drops any client-supplied directories such as "../"
+    filename = os.path.basename(file.filename or "")
+    if not _is_supported(filename):
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {filename or 'unnamed file'}")
+
+    # The task id is chosen here so /result can find the document by it once the Celery result
+    # has expired. It also prefixes the stored name, so uploads with the same name don't overwrite each other.
+    task_id = str(uuid.uuid4())
+
     # 1. Save file locally
-    file_path = f"{TEMP_STORAGE}/{file.filename}"
-    
-    # Use shutil for efficient large file saving
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path = os.path.join(TEMP_STORAGE, f"{task_id}_{filename}")
+    await _save_upload(file, file_path)
 
     # 2. Create Document record in DB
     new_doc = Document(
-        filename=file.filename,
+        filename=filename,
         file_path=file_path,
-        status=ProcessingStatus.PENDING
+        status=ProcessingStatus.PENDING,
+        task_id=task_id
     )
     db.add(new_doc)
-    db.commit()
-    db.refresh(new_doc)
+    await db.commit()
+    doc_id = new_doc.id
 
     # 3. Trigger Celery Task
-    task = process_invoice_task.delay(file_path, new_doc.id)
+    await run_in_threadpool(
+        process_invoice_task.apply_async,
+        args=(file_path, doc_id), kwargs={"enqueued_at": time.time()}, task_id=task_id
+    )
 
     return {
         "status": "processing",
-        "task_id": task.id,
-        "document_id": new_doc.id,
-        "filename": file.filename
+        "task_id": task_id,
+        "document_id": doc_id,
+        "filename": filename
+    }
+
+@router.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_async_db)):
+    """
+    Uploads several files and/or zip archives as one batch.
+    Archive members are streamed to disk one at a time, all Document rows are created
+    with a single bulk insert under a shared batch_id, and the tasks are dispatched as one Celery group.
+    """
+    batch_id = uuid.uuid4().hex
+    batch_dir = os.path.join(TEMP_STORAGE, batch_id)
+    await run_in_threadpool(os.makedirs, batch_dir, exist_ok=True)
+
+    # 1. Save files locally. Names are prefixed with their position so members
+    # with the same name from different archive folders don't overwrite each other.
+    saved = []
+    try:
+        for upload in files:
+            upload_name = os.path.basename(upload.filename or "")
+            if upload_name.lower().endswith(".zip"):
+                saved += await run_in_threadpool(_extract_archive, upload.file, upload_name, batch_dir, len(saved))
+            elif _is_supported(upload_name):
+                file_path = os.path.join(batch_dir, f"{len(saved):05d}_{upload_name}")
+                await _save_upload(upload, file_path)
+                saved.append((upload_name, file_path))
+        if not saved:
+            raise HTTPException(status_code=400, detail="No supported files found in upload")
+    except Exception:
+        # Whatever went wrong, don't leave the files saved so far behind
+        await run_in_threadpool(shutil.rmtree, batch_dir, ignore_errors=True)
+        raise
+
+    # 2. Create all Document records in one bulk insert, each with its task id
+    task_ids = [str(uuid.uuid4()) for _ in saved]
+    doc_ids = (await db.execute(
+        insert(Document).returning(Document.id, sort_by_parameter_order=True),
+        [
+            {
+                "filename": filename,
+                "file_path": file_path,
+                "batch_id": batch_id,
+                "status": ProcessingStatus.PENDING,
+                "task_id": task_id
+            }
+            for (filename, file_path), task_id in zip(saved, task_ids)
+        ]
+    )).scalars().all()
+    await db.commit()
+
+    # 3. Fan out one Celery task per document
+    enqueued_at = time.time()
+    job = await run_in_threadpool(group(
+        process_invoice_task.s(file_path, doc_id, enqueued_at=enqueued_at).set(task_id=task_id)
+        for (_, file_path), doc_id, task_id in zip(saved, doc_ids, task_ids)
+    ).apply_async)
+
+    return {
+        "status": "processing",
+        "batch_id": batch_id,
+        "group_id": job.id,
+        "documents": [
+            {"document_id": doc_id, "task_id": task_id, "filename": filename}
+            for (filename, _), doc_id, task_id in zip(saved, doc_ids, task_ids)
+        ]
+    }
+
+@router.get("/upload/batch/{batch_id}")
+async def get_batch_progress(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Returns per-status document counts for a batch using a single grouped query.
+    """
+    rows = (await db.execute(
+        select(Document.status, func.count(Document.id)).where(
+            Document.batch_id == batch_id
+        ).group_by(Document.status)
+    )).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    counts = {status.value: 0 for status in ProcessingStatus}
+    for status, count in rows:
+        counts[status.value] = count
+
+    total = sum(counts.values())
+    finished = counts[ProcessingStatus.COMPLETED.value] + counts[ProcessingStatus.FAILED.value]
+
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "counts": counts,
+        "finished": finished == total
     }
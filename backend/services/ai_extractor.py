@@ -1,64 +1,265 @@
 import json
 import os
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
+from core.config import settings
+from services import llm_client
+from services.metrics import record_fallback
 
 load_dotenv()
 
-def extract_invoice_data_ai(text: str) -> dict:
+MODEL_NAME = settings.LLM_MODEL
+
+INLINE_SYSTEM_PROMPT = "You are a world-class Document AI Specialist. Your expertise is in converting unstructured OCR text from invoices into highly accurate, structured JSON data."
+
+TARGET_SCHEMA = """{
+  "vendor_info": {"name": string},
+  "invoice_details": {"number": string, "date": "YYYY-MM-DD"},
+  "financials": {"total_amount": float, "currency": "ISO"},
+  "items": []
+}"""
+
+# General documents are summarized from their first pages only
+SUMMARY_MAX_CHARS = 6000
+
+BATCH_TASK_TEMPLATE = """
+Task: Extract key-value pairs from each of the {count} OCR documents below.
+Each document starts with a line "=== DOCUMENT <id> ===".
+Target Schema (one per document):
+{schema}
+Return ONLY a JSON array with exactly one element per document, in any order:
+[{{"id": "<id>", "result": <object matching the schema>}}]
+If a document is not an invoice or receipt, use {{"error": "<reason>"}} as its result.
+
+{documents}
+"""
+
+def _parse_json_response(response_text: str):
+    # Clean up code blocks if present
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+         response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return json.loads(response_text)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting batches (about four characters per token)."""
+    return len(text or "") // 4 + 1
+
+def extract_invoice_data_ai(text: str, doc_type: str = None) -> dict:
     """
-    Extracts invoice data using Google Gemini 1.5 Flash.
+    Extracts invoice data with the configured LLM provider (Gemini by default), using the task
+    prompt for `doc_type` (classified here when not given).
     Returns a JSON object with extracted fields or document summary.
     """
-    from core.config import settings
-    from services.prompt_loader import PromptManager
-    
-    api_key = settings.GEMINI_API_KEY
-    if not api_key:
+    from services.prompt_loader import get_prompt_manager
+
+    if not llm_client.init_client():
         print("Error: GEMINI_API_KEY not found in environment variables.")
         return {}
 
-    genai.configure(api_key=api_key)
-    
-    manager = PromptManager()
-    system_prompt, full_prompt = manager.get_structured_prompt(text)
-    
+    manager = get_prompt_manager()
+    system_prompt, full_prompt = manager.get_structured_prompt(text, doc_type)
+
     # If PromptManager failed to find files, fallback to inline
     if not system_prompt:
-        system_prompt = "You are a world-class Document AI Specialist. Your expertise is in converting unstructured OCR text from invoices into highly accurate, structured JSON data."
+        system_prompt = INLINE_SYSTEM_PROMPT
         full_prompt = f"""
         Task: Extract key-value pairs from the following OCR text.
         Target Schema:
-        {{
-          "vendor_info": {{"name": string}},
-          "invoice_details": {{"number": string, "date": "YYYY-MM-DD"}},
-          "financials": {{"total_amount": float, "currency": "ISO"}},
-          "items": []
-        }}
+        {TARGET_SCHEMA}
         Text: {text}
         """
 
-    # Using system_instruction as requested by the user
-    model = genai.GenerativeModel(
-        model_name='gemini-1.5-flash',
-        system_instruction=system_prompt
-    )
-
     try:
-        response = model.generate_content(full_prompt)
-        # Clean up code blocks if present
-        response_text = response.text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-             response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-            
-        result = json.loads(response_text)
+        # Using system_instruction as requested by the user; the model object is cached per process
+        response_text = llm_client.generate(MODEL_NAME, full_prompt, system_instruction=system_prompt, purpose="extract")
+        result = _parse_json_response(response_text)
         if "error" in result:
              raise ValueError(result["error"])
         return result
     except Exception as e:
-        print(f"Error calling Gemini: {e}")
+        print(f"Error calling LLM: {e}")
         raise ValueError("No invoice data found or AI processing failed")
+
+def extract_invoice_data_batch(texts: dict, doc_type: str = None) -> dict:
+    """
+    Extracts several documents of one `doc_type` with a single request, so the system prompt is
+    paid once. The schema is the one in that type's task prompt, so results match (and are cached
+    like) single-shot ones. `texts` maps a short id to OCR text. Returns id -> extracted dict, or
+    id -> None for documents that came back missing or malformed (the caller retries those single-shot).
+    """
+    from services.prompt_loader import get_prompt_manager
+
+    manager = get_prompt_manager()
+    system_prompt = manager.get_prompt("system", "parser_v1.txt")
+    schema = manager.get_task_schema(doc_type)
+    # Same fallback as extract_invoice_data_ai when the prompt files are missing
+    if not system_prompt or not schema:
+        system_prompt, schema = INLINE_SYSTEM_PROMPT, TARGET_SCHEMA
+    documents = "\n\n".join(f"=== DOCUMENT {doc_id} ===\n{text}" for doc_id, text in texts.items())
+    prompt = BATCH_TASK_TEMPLATE.format(count=len(texts), schema=schema, documents=documents)
+
+    results = {doc_id: None for doc_id in texts}
+    try:
+        parsed = _parse_json_response(llm_client.generate(MODEL_NAME, prompt, system_instruction=system_prompt, purpose="extract_batch"))
+    except Exception as e:
+        print(f"Error calling LLM for a batch of {len(texts)}: {e}")
+        return results
+
+    for entry in parsed if isinstance(parsed, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        doc_id, result = str(entry.get("id")), entry.get("result")
+        # Leave errors to the single-shot path, which raises for them the usual way
+        if doc_id in results and isinstance(result, dict) and "error" not in result:
+            results[doc_id] = result
+    return results
+
+class ExtractionBatcher:
+    """
+    Collects extraction requests from concurrent tasks in this process and sends them in
+    batches bounded by LLM_BATCH_MAX_DOCS and LLM_BATCH_MAX_TOKENS. A batch holds one doc_type,
+    since each type has its own schema. It goes out once it is full or LLM_BATCH_WINDOW_MS after
+    its first document arrived.
+    """
+    def __init__(self, max_docs: int, max_tokens: int, window_seconds: float):
+        self.max_docs = max(1, max_docs)
+        self.max_tokens = max_tokens
+        self.window_seconds = window_seconds
+        self._pending = [] # (text, tokens, future, doc_type)
+        self._pending_tokens = 0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, settings.LLM_MAX_CONCURRENCY), thread_name_prefix="llm-batch")
+        self._thread = threading.Thread(target=self._collect, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, doc_type: str = None) -> Future:
+        """
+        Queues a document. The future resolves to its extraction, or to None if the batch
+        couldn't answer for it and it needs a single-shot retry.
+        """
+        future = Future()
+        tokens = estimate_tokens(text)
+        with self._cond:
+            self._pending.append((text, tokens, future, doc_type))
+            self._pending_tokens += tokens
+            self._cond.notify()
+        return future
+
+    def _full(self) -> bool:
+        return len(self._pending) >= self.max_docs or self._pending_tokens >= self.max_tokens
+
+    def _take(self) -> list:
+        """The oldest pending document and whatever else of its doc_type fits, in arrival order."""
+        doc_type = self._pending[0][3]
+        batch, rest, tokens = [], [], 0
+        for item in self._pending:
+            if item[3] != doc_type or len(batch) >= self.max_docs or (batch and tokens + item[1] > self.max_tokens):
+                rest.append(item)
+                continue
+            batch.append(item)
+            tokens += item[1]
+        self._pending = rest
+        self._pending_tokens -= tokens
+        return batch
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window_seconds
+                while not self._full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take()
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: list):
+        if len(batch) == 1:
+            # Nothing to share the prompt with; run it as a normal request
+            text, _, future, doc_type = batch[0]
+            try:
+                future.set_result(extract_invoice_data_ai(text, doc_type))
+            except Exception as e:
+                future.set_exception(e)
+            return
+        ids = [f"d{i}" for i in range(len(batch))]
+        try:
+            results = extract_invoice_data_batch({doc_id: item[0] for doc_id, item in zip(ids, batch)}, batch[0][3])
+        except Exception as e:
+            print(f"Batch extraction failed: {e}")
+            results = {}
+        for doc_id, (_, _, future, _) in zip(ids, batch):
+            future.set_result(results.get(doc_id))
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> ExtractionBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = ExtractionBatcher(
+                settings.LLM_BATCH_MAX_DOCS,
+                settings.LLM_BATCH_MAX_TOKENS,
+                settings.LLM_BATCH_WINDOW_MS / 1000.0,
+            )
+        return _batcher
+
+def extract_invoice_data(text: str, doc_type: str = None) -> dict:
+    """
+    Pipeline entry point. With LLM_BATCH_ENABLED, small documents are batched with whatever
+    else this process is extracting at the same time; anything the batch couldn't answer
+    falls back to extract_invoice_data_ai.
+    """
+    if (settings.LLM_BATCH_ENABLED and llm_client.init_client()
+            and estimate_tokens(text) <= settings.LLM_BATCH_DOC_MAX_TOKENS):
+        result = get_batcher().submit(text, doc_type).result()
+        if result is not None:
+            return result
+        record_fallback("extract_single_shot")
+    return extract_invoice_data_ai(text, doc_type)
+
+def summarize_document(text: str) -> dict:
+    """
+    The cheap path for documents classified as general_document: one short summary request on
+    the start of the text, no system prompt, no field extraction and no review.
+    Returns {"summary", "document_kind", "vendor_info", "items": []}.
+    """
+    from services.prompt_loader import get_prompt_manager
+
+    if not llm_client.init_client():
+        print("Error: GEMINI_API_KEY not found in environment variables.")
+        return {"items": []}
+
+    text = text[:SUMMARY_MAX_CHARS]
+    template = get_prompt_manager().get_prompt("tasks", "general_document_v1.txt")
+    if template:
+        prompt = template.replace("{{ocr_text}}", text)
+    else:
+        prompt = f"""
+        Task: Summarize the following OCR text in two or three sentences.
+        Return ONLY JSON: {{"summary": string, "document_kind": string, "vendor_info": {{"name": string or null}}}}
+        Text: {text}
+        """
+
+    try:
+        result = _parse_json_response(llm_client.generate(MODEL_NAME, prompt, purpose="summarize"))
+    except Exception as e:
+        print(f"Error calling LLM for a summary: {e}")
+        raise ValueError("Document summary failed")
+    return {
+        "summary": result.get("summary"),
+        "document_kind": result.get("document_kind"),
+        "vendor_info": result.get("vendor_info") or {},
+        "items": [],
+    }
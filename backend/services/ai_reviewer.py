@@ -1,32 +1,46 @@
+import hashlib
 import json
 import os
-import google.generativeai as genai
 from core.config import settings
+from services import llm_client
+from services.metrics import record_fallback
+from services.validator import validate_invoice_rules, RULES_VERSION
 
-def validate_invoice_data(invoice_json: dict) -> dict:
-    """
-    Validates extracted invoice data using the Financial Auditor persona (Gemini 1.5 Flash).
-    """
-    api_key = settings.GEMINI_API_KEY
-    if not api_key:
-        return {"status": "error", "reasons": ["GEMINI_API_KEY not found"]}
-
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+MODEL_NAME = settings.LLM_MODEL
 
-    system_prompt = """
+SYSTEM_PROMPT = """
     Reviewer Role: You are a Financial Auditor. Your job is to validate the JSON output of the Parser.
     Validation Logic:
     1. Check if subtotal + tax_amount equals total_amount.
     2. Flag any invoice where the date is in the future (Current Date: {today}).
     3. Verify that the vendor_name is not a generic term like "Customer".
     """
-    
+
+# Used to key cached verdicts, so editing the prompt or the local rules invalidates them
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + RULES_VERSION).encode("utf-8")).hexdigest()[:12]
+
+def validate_invoice_data(invoice_json: dict) -> dict:
+    """
+    Validates extracted invoice data.
+    The deterministic checks run locally first (services/validator.py); only documents that
+    fail them or are ambiguous go to the Financial Auditor persona on the configured LLM.
+    """
+    rules_result = validate_invoice_rules(invoice_json)
+    if rules_result["status"] == "valid":
+        return rules_result
+
+    if not llm_client.init_client():
+        return {**rules_result, "llm_error": "GEMINI_API_KEY not found"}
+
+    return _review_with_llm(invoice_json, rules_result)
+
+def _review_with_llm(invoice_json: dict, rules_result: dict) -> dict:
+    """Asks the LLM auditor for a verdict, passing along what the local rules found."""
     from datetime import date
     today = date.today().strftime("%Y-%m-%d")
 
     prompt = f"""
-    {system_prompt.format(today=today)}
+    {SYSTEM_PROMPT.format(today=today)}
     
     Task: Validate the JSON output of the Parser.
     
@@ -34,20 +48,30 @@ def validate_invoice_data(invoice_json: dict) -> dict:
     If valid: {{"status": "valid"}}
     If invalid: {{"status": "invalid", "reasons": [string, ...]}}
 
+    Findings from automated checks (may be caused by OCR errors):
+    {json.dumps(rules_result["reasons"], ensure_ascii=False)}
+
     Input JSON:
     {json.dumps(invoice_json)}
     """
 
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        response_text = llm_client.generate(MODEL_NAME, prompt, purpose="review").strip()
         # Basic cleanup
         if "```json" in response_text:
             response_text = response_text.split("```json")[1].split("```")[0].strip()
         elif "```" in response_text:
             response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(response_text)
+
+        verdict = json.loads(response_text)
+        return {
+            "status": verdict.get("status", rules_result["status"]),
+            "reasons": verdict.get("reasons", []),
+            "checks": rules_result["checks"],
+            "source": "llm",
+        }
     except Exception as e:
-        print(f"Error calling Gemini Reviewer: {e}")
-        return {"status": "valid", "reasons": []} # Fallback to valid to not block, but log error
+        print(f"Error calling LLM Reviewer: {e}")
+        record_fallback("review_rules_verdict")
+        # Keep the local verdict rather than reporting a document we couldn't review as valid
+        return {**rules_result, "llm_error": str(e)}
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+from core.config import settings
+from services.metrics import CACHE_LOOKUPS
+
+# Stages that can be short-circuited, in pipeline order
+STAGES = ("ocr", "extract", "review")
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(stage: str, content_hash: str, *variant) -> str:
+    """
+    Builds the cache key for one pipeline stage.
+    `variant` carries whatever changes that stage's output (prompt version, model name, page cap).
+    """
+    return ":".join(["extraction", stage, content_hash, *[str(v) for v in variant]])
+
+class DiskCacheBackend:
+    """
+    Stores each entry as a JSON file under CACHE_DIR.
+    File mtime doubles as the LRU clock: reads touch it, entries idle for longer
+    than the TTL expire, and eviction removes the oldest above max_entries.
+    """
+    def __init__(self, directory: str, ttl: int, max_entries: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if self.ttl and os.path.getmtime(path) + self.ttl < time.time():
+                self._remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: str):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {"key": key, "value": value}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        # Directory scans are not free, so only check the size limit periodically
+        with self._lock:
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= 50
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if self.ttl and mtime + self.ttl < now:
+                    self._remove(entry.path)
+                else:
+                    entries.append((mtime, entry.path))
+
+        if self.max_entries and len(entries) > self.max_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def incr_stat(self, name: str):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+class RedisCacheBackend:
+    """
+    Stores entries in Redis with a TTL. Size-based eviction is left to Redis itself
+    (maxmemory-policy allkeys-lru / volatile-lru); counters live in a shared hash so
+    they add up across workers.
+    """
+    STATS_KEY = "extraction:stats"
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        if value is None:
+            return None
+        if self.ttl:
+            # Sliding expiry so hot entries stay while cold ones age out
+            self.client.expire(key, self.ttl)
+        return value.decode("utf-8")
+
+    def set(self, key: str, value: str):
+        self.client.set(key, value, ex=self.ttl or None)
+
+    def incr_stat(self, name: str):
+        self.client.hincrby(self.STATS_KEY, name, 1)
+
+    def get_stats(self) -> dict:
+        return {k.decode("utf-8"): int(v) for k, v in self.client.hgetall(self.STATS_KEY).items()}
+
+class ExtractionCache:
+    """Per-stage JSON cache for OCR text, extractor output and reviewer verdicts."""
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, stage: str, content_hash: str, *variant):
+        try:
+            value = self.backend.get(cache_key(stage, content_hash, *variant))
+        except Exception as e:
+            print(f"Cache read failed for stage {stage}: {e}")
+            value = None
+        self._count(stage, "hits" if value is not None else "misses")
+        return json.loads(value) if value is not None else None
+
+    def set(self, stage: str, content_hash: str, value, *variant):
+        try:
+            self.backend.set(cache_key(stage, content_hash, *variant), json.dumps(value))
+        except Exception as e:
+            print(f"Cache write failed for stage {stage}: {e}")
+
+    def _count(self, stage: str, outcome: str):
+        CACHE_LOOKUPS.labels(stage, "hit" if outcome == "hits" else "miss").inc()
+        try:
+            self.backend.incr_stat(f"{stage}:{outcome}")
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Returns {"ocr": {"hits": n, "misses": n}, ...}."""
+        raw = self.backend.get_stats()
+        return {
+            stage: {
+                "hits": raw.get(f"{stage}:hits", 0),
+                "misses": raw.get(f"{stage}:misses", 0),
+            }
+            for stage in STAGES
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[ExtractionCache]:
+    """Returns the process-wide cache configured by CACHE_BACKEND, or None when disabled."""
+    global _cache
+    backend_name = settings.CACHE_BACKEND.lower()
+    if backend_name == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            if backend_name == "redis":
+                backend = RedisCacheBackend(settings.REDIS_URL, settings.CACHE_TTL_SECONDS)
+            else:
+                backend = DiskCacheBackend(settings.CACHE_DIR, settings.CACHE_TTL_SECONDS, settings.CACHE_MAX_ENTRIES)
+            _cache = ExtractionCache(backend)
+    return _cache
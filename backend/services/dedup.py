@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import re
+import zlib
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+import numpy as np
+from sqlalchemy import delete, insert, select, func
+from sqlalchemy.orm import Session
+from models.invoice import Document, DocumentFingerprint, FingerprintBand, Invoice, LineItem
+from services.search import normalize, tokenize
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate detection for re-scanned, re-printed or photographed copies of a document.
+#
+# After OCR, the text gets a MinHash signature over word pairs (2-shingles), tokenized like the search
+# index so diacritics and Arabic spelling variants don't count as differences. LSH splits the 64
+# values into 16 bands of 4: documents with shingle similarity s share a band bucket with
+# probability 1 - (1 - s^4)^16 (about 0.99 at s=0.7, 0.12 at s=0.3), so a lookup reads a few
+# fingerprint_bands index entries instead of scanning the corpus. Candidates are then checked on
+# the full signature and on the numbers in the text: invoices printed from one template share most
+# of their wording and differ in dates, amounts and invoice numbers. The identifiers (dates and
+# reference numbers such as "INV-10231") must match exactly, since two invoices from one vendor in
+# the same month can differ in nothing else; the remaining numbers may differ by a few OCR misreads.
+# Text without any identifier is never flagged, as there's nothing to confirm it's the same invoice.
+#
+# Two copies processed at the same moment can miss each other (neither is registered yet); the
+# (vendor, invoice_number, total) check after extraction catches those, as well as copies whose
+# OCR text differs too much (e.g. a phone photo of a PDF).
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 2
+MIN_SHINGLES = 20 # shorter texts (blank pages, a logo) say too little to compare
+MAX_CANDIDATES = 50
+
+# Hash family ((a * x + b) mod P) with a fixed seed: signatures are stored, so it must never change.
+# a < 2^31 and x < 2^32 keep a * x + b within uint64.
+PRIME = np.uint64(4294967291) # largest prime below 2^32
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+DATE = re.compile(r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}")
+REFERENCE_SEPARATORS = re.compile(r"[-/#_.]")
+
+def shingles(raw_text: str) -> set:
+    """32-bit hashes of the word pairs (2-shingles) of the text."""
+    tokens = tokenize(raw_text)
+    return {zlib.crc32(" ".join(tokens[i:i + SHINGLE]).encode("utf-8")) for i in range(len(tokens) - SHINGLE + 1)}
+
+def signature(raw_text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32 values), or None if the text is too short to fingerprint."""
+    hashed = shingles(raw_text or "")
+    if len(hashed) < MIN_SHINGLES:
+        return None
+    x = np.fromiter(hashed, dtype=np.uint64, count=len(hashed))
+    return ((np.outer(_A, x) + _B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+def band_buckets(sig: np.ndarray) -> list:
+    """One signed 64-bit bucket key per band; the band number is hashed in so bands never collide."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            "big", signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+def numbers(raw_text: str) -> set:
+    """Numbers of two or more digits in the text, separators removed (amounts, dates, references)."""
+    found = (re.sub(r"[.,]", "", n) for n in NUMBER.findall(normalize(raw_text or "")))
+    return {n for n in found if len(n) > 1}
+
+def identifiers(raw_text: str) -> set:
+    """
+    Dates and reference numbers in the text, separators removed: "2024-03-01" -> "20240301",
+    "INV-10231" -> "inv10231". A reference is a word with at least three digits and no decimal
+    amount in it; OCR slips like "pr1nter" have too few digits to count.
+    """
+    found = set()
+    for word in normalize(raw_text or "").split():
+        word = word.strip(".,:;()[]'\"")
+        if DATE.fullmatch(word):
+            found.add(REFERENCE_SEPARATORS.sub("", word))
+        elif sum(c.isdigit() for c in word) >= 3 and not re.search(r"\d[.,]\d{2}$", word):
+            found.add(REFERENCE_SEPARATORS.sub("", word))
+    return found
+
+def numbers_match(new: set, original: set) -> bool:
+    """
+    Whether the numbers of `new` could come from a re-scan of `original`: at most one new number
+    per 50 (OCR misreads) and at least half of all numbers in common. Identifiers are checked
+    separately, with no tolerance.
+    """
+    if not new and not original:
+        return True
+    tolerance = 1 + len(new | original) // 50
+    return len(new - original) <= tolerance and len(new & original) * 2 >= len(new | original)
+
+def find_duplicate(db: Session, document_id: int, raw_text: str) -> Optional[tuple]:
+    """
+    Looks up an earlier document whose OCR text is a near-duplicate of `raw_text`.
+    Returns (document_id, score) of the best match, or None, in which case the document's own
+    fingerprint is registered for later lookups. Doesn't commit.
+    """
+    sig = signature(raw_text)
+    if sig is None:
+        return None
+    text_numbers = numbers(raw_text)
+    text_identifiers = identifiers(raw_text)
+
+    candidate_ids = (
+        select(FingerprintBand.document_id)
+        .where(FingerprintBand.bucket.in_(band_buckets(sig)), FingerprintBand.document_id != document_id)
+        .distinct().limit(MAX_CANDIDATES)
+    )
+    candidates = db.execute(
+        select(
+            DocumentFingerprint.document_id, DocumentFingerprint.signature,
+            DocumentFingerprint.numbers, DocumentFingerprint.identifiers
+        )
+        .where(DocumentFingerprint.document_id.in_(candidate_ids))
+    ).all()
+
+    scored = sorted(
+        ((float(np.mean(np.frombuffer(stored, dtype=np.uint32) == sig)), candidate_id, stored_numbers, stored_identifiers)
+         for candidate_id, stored, stored_numbers, stored_identifiers in candidates),
+        reverse=True
+    )
+    for score, candidate_id, stored_numbers, stored_identifiers in scored:
+        if score < settings.DEDUP_THRESHOLD:
+            break
+        if (text_identifiers and text_identifiers == set((stored_identifiers or "").split())
+                and numbers_match(text_numbers, set(stored_numbers.split()))):
+            return candidate_id, round(score, 4)
+
+    # Not a duplicate: register it. Delete first so a redelivered task can re-register.
+    db.execute(delete(FingerprintBand).where(FingerprintBand.document_id == document_id))
+    db.execute(delete(DocumentFingerprint).where(DocumentFingerprint.document_id == document_id))
+    db.execute(insert(DocumentFingerprint).values(
+        document_id=document_id, signature=sig.tobytes(), numbers=" ".join(sorted(text_numbers)),
+        identifiers=" ".join(sorted(text_identifiers))
+    ))
+    db.execute(insert(FingerprintBand), [
+        {"bucket": bucket, "document_id": document_id} for bucket in set(band_buckets(sig))
+    ])
+    return None
+
+def _total(value) -> Optional[Decimal]:
+    try:
+        total = Decimal(str(value).replace(",", "")) if value is not None else None
+    except (InvalidOperation, ValueError):
+        return None
+    return total if total is not None and total.is_finite() else None
+
+def vendor_key(vendor: str) -> str:
+    return "".join(tokenize(str(vendor or "")))
+
+def find_field_duplicate(db: Session, document_id: int, extracted_data: dict) -> Optional[int]:
+    """
+    After extraction: the earliest other document with the same invoice number, total and
+    (normalized) vendor, resolved to the original if that one is a duplicate too. Read-only.
+    """
+    def section(name):
+        value = extracted_data.get(name)
+        return value if isinstance(value, dict) else {}
+
+    # The extractor may return numbers for any of these
+    number = str(section("invoice_details").get("number") or "").strip()
+    total = _total(section("financials").get("total_amount"))
+    if not number or total is None:
+        return None
+    vendor = vendor_key(str(section("vendor_info").get("name") or ""))
+
+    rows = db.execute(
+        select(func.coalesce(Document.duplicate_of, Document.id), Invoice.vendor)
+        .join(Document, Document.id == Invoice.document_id)
+        .where(Invoice.invoice_number == number, Invoice.total == total, Invoice.document_id != document_id)
+        .order_by(Invoice.document_id).limit(MAX_CANDIDATES)
+    ).all()
+    for original_id, stored_vendor in rows:
+        if vendor_key(stored_vendor) == vendor:
+            return original_id
+    return None
+
+def stored_extraction(db: Session, document_id: int) -> Optional[tuple]:
+    """
+    (doc_type, extracted_data, validation_result) of a finished document, rebuilt in the extractor's
+    JSON shape from its stored invoice (including any reviewer corrections). None if the document
+    has no usable invoice yet. Read-only.
+    """
+    invoice = db.execute(select(Invoice).where(Invoice.document_id == document_id)).scalars().first()
+    if invoice is None or invoice.doc_type == "error_fallback":
+        return None
+    items = db.execute(select(LineItem).where(LineItem.invoice_id == invoice.id).order_by(LineItem.id)).scalars().all()
+
+    def amount(value):
+        return float(value) if value is not None else None
+
+    extracted_data = {
+        "vendor_info": {"name": invoice.vendor},
+        "invoice_details": {"number": invoice.invoice_number, "date": invoice.date.isoformat() if invoice.date else None},
+        "financials": {"total_amount": amount(invoice.total), "tax_amount": amount(invoice.tax), "currency": invoice.currency},
+        "items": [
+            {
+                "description": item.description,
+                "quantity": amount(item.quantity),
+                "unit_price": amount(item.unit_price),
+                "total_price": amount(item.total_price),
+                "discount": amount(item.discount),
+            }
+            for item in items
+        ],
+    }
+    if invoice.summary:
+        extracted_data["summary"] = invoice.summary
+    return invoice.doc_type, extracted_data, invoice.validation or {}
@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import zlib
+from typing import Optional
+import numpy as np
+from core.config import settings
+from services.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Local document-type classifier. It runs once per document after OCR, picks the extraction prompt
+# (prompts/tasks) and keeps clearly non-financial documents away from the extractor.
+#
+# Features are hashed word unigrams and bigrams plus character 3-5 grams of each word, over the
+# search tokenizer's output (services/search.py). English and Arabic OCR text go through the same
+# normalization, and a word damaged by OCR still shares most of its character n-grams. A
+# multinomial logistic regression over those features is trained from stored invoices by
+# train_doc_classifier.py and saved as .npz; scoring a document is one sparse dot product, CPU only.
+# Without a trained model a keyword list stands in, with confidences that never reject anything.
+
+LABELS = ("invoice", "receipt", "general_document")
+N_FEATURES = 1 << 18
+MAX_TOKENS = 2000 # the first pages say enough about what a document is
+CHAR_NGRAMS = (3, 4, 5)
+
+def features(raw_text: str) -> tuple:
+    """
+    (indices, values) of the document's hashed feature vector: signed log-scaled counts, L2-normalized.
+    The top bit of each n-gram's CRC32 picks its sign, which cancels out most hash collisions.
+    """
+    tokens = tokenize(raw_text or "")[:MAX_TOKENS]
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        grams += ["#" + padded[i:i + n] for n in CHAR_NGRAMS for i in range(len(padded) - n + 1)]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    indices, inverse = np.unique((hashes & (N_FEATURES - 1)).astype(np.int64), return_inverse=True)
+    counts = np.zeros(len(indices))
+    np.add.at(counts, inverse, signs)
+    values = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(values)
+    return indices, (values / norm if norm else values).astype(np.float32)
+
+class DocTypeModel:
+    """Softmax regression over hashed features: weights (N_FEATURES, labels) and a bias per label."""
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: tuple = LABELS):
+        self.weights = weights
+        self.bias = bias
+        self.labels = tuple(labels)
+
+    def probabilities(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        logits = values @ self.weights[indices] + self.bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def predict(self, raw_text: str) -> tuple:
+        """(label, probability) of the most likely type."""
+        probabilities = self.probabilities(*features(raw_text))
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # np.savez appends .npz to names without it; write to a temp name and swap it in atomically
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, labels=np.array(self.labels))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DocTypeModel":
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], tuple(str(label) for label in data["labels"]))
+
+def train(texts: list, labels: list, epochs: int = 8, learning_rate: float = 0.5,
+          l2: float = 1e-6, seed: int = 0) -> DocTypeModel:
+    """
+    Fits a DocTypeModel with plain SGD. Classes are weighted by inverse frequency, since stored
+    documents are mostly invoices and the rare types are the ones routing cares about.
+    """
+    label_ids = np.array([LABELS.index(label) for label in labels])
+    counts = np.bincount(label_ids, minlength=len(LABELS))
+    class_weights = np.where(counts > 0, len(label_ids) / (len(LABELS) * np.maximum(counts, 1)), 0.0)
+    rows = [features(text) for text in texts]
+
+    weights = np.zeros((N_FEATURES, len(LABELS)), dtype=np.float32)
+    bias = np.zeros(len(LABELS), dtype=np.float32)
+    model = DocTypeModel(weights, bias)
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        rate = learning_rate / (1 + epoch)
+        for i in rng.permutation(len(rows)):
+            indices, values = rows[i]
+            gradient = model.probabilities(indices, values)
+            gradient[label_ids[i]] -= 1.0
+            gradient *= class_weights[label_ids[i]]
+            weights[indices] -= rate * (np.outer(values, gradient) + l2 * weights[indices])
+            bias -= rate * gradient
+    return model
+
+# Keyword fallback, matched on tokenized text so "الفاتورة" and "فاتورة" are the same keyword
+KEYWORDS = {
+    "receipt": ("receipt", "total cash", "change due", "thank you for your purchase", "ايصال", "نقدا", "الباقي"),
+    "invoice": ("invoice", "bill to", "due date", "tax invoice", "vat number", "فاتورة", "فاتورة ضريبية", "الرقم الضريبي", "تاريخ الاستحقاق"),
+}
+_KEYWORD_TOKENS = {label: [" ".join(tokenize(k)) for k in keywords] for label, keywords in KEYWORDS.items()}
+
+def keyword_doc_type(raw_text: str) -> tuple:
+    """(label, confidence) from keyword hits. Receipts win ties, like the original rule."""
+    text_value = f" {' '.join(tokenize(raw_text or '')[:MAX_TOKENS])} "
+    hits = {label: sum(f" {k} " in text_value for k in keywords) for label, keywords in _KEYWORD_TOKENS.items()}
+    if hits["receipt"] and hits["receipt"] >= hits["invoice"]:
+        return "receipt", min(0.9, 0.5 + 0.1 * hits["receipt"])
+    if hits["invoice"]:
+        return "invoice", min(0.9, 0.5 + 0.1 * hits["invoice"])
+    # No keywords is weak evidence: below any sensible DOC_CLASSIFIER_MIN_CONFIDENCE
+    return "general_document", 0.5
+
+class DocClassifier:
+    """Serves the model at DOC_CLASSIFIER_PATH, reloading it when the file changes; keywords without one."""
+    def __init__(self, path: str):
+        self.path = path
+        self._model = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _current_model(self) -> Optional[DocTypeModel]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._model = DocTypeModel.load(self.path)
+                        logger.info(f"Loaded document classifier from {self.path}")
+                    except Exception as e:
+                        logger.error(f"Could not load document classifier {self.path}: {e}")
+                        self._model = None
+                    self._mtime = mtime
+        return self._model
+
+    def classify(self, raw_text: str) -> tuple:
+        """(doc_type, confidence, source) where source is "model" or "keywords"."""
+        model = self._current_model()
+        if model is not None:
+            return (*model.predict(raw_text), "model")
+        return (*keyword_doc_type(raw_text), "keywords")
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_classifier() -> DocClassifier:
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = DocClassifier(settings.DOC_CLASSIFIER_PATH)
+        return _classifier
+
+def classify(raw_text: str) -> tuple:
+    """(doc_type, confidence, source) for a document's OCR text."""
+    return get_classifier().classify(raw_text)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+import redis
+from core.config import settings
+
+# Status events for documents in the pipeline, published by the workers over Redis pub/sub
+# and streamed to clients by routers/events.py. Each task's latest event is also stored
+# under a key, so a client that subscribes late still sees where the task is.
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+
+def task_channel(task_id: str) -> str:
+    return f"bdf:events:task:{task_id}"
+
+def batch_channel(batch_id: str) -> str:
+    return f"bdf:events:batch:{batch_id}"
+
+def last_event_key(task_id: str) -> str:
+    return f"bdf:events:last:{task_id}"
+
+_client = None
+_client_lock = threading.Lock()
+# After a connection failure, skip publishing for a while instead of paying a timeout per event
+_unavailable_until = 0.0
+
+def _get_client() -> redis.Redis:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=2)
+        return _client
+
+def publish_event(task_id: str, event: dict, batch_id: str = None):
+    """
+    Publishes `event` on the task's channel (and the batch's, if any) and stores it as the task's
+    latest state. Best effort: events are a convenience on top of /result, so failures are only logged.
+    """
+    global _unavailable_until
+    if not settings.EVENTS_ENABLED or not task_id or time.monotonic() < _unavailable_until:
+        return
+    event = {"type": "status", **event, "task_id": task_id, "batch_id": batch_id, "timestamp": time.time()}
+    payload = json.dumps(event, default=str, ensure_ascii=False)
+    try:
+        pipe = _get_client().pipeline(transaction=False)
+        pipe.set(last_event_key(task_id), payload, ex=settings.EVENTS_TTL_SECONDS)
+        pipe.publish(task_channel(task_id), payload)
+        if batch_id:
+            pipe.publish(batch_channel(batch_id), payload)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Event publish failed for task {task_id}: {e}")
+        _unavailable_until = time.monotonic() + 30
+
+class TaskEvents:
+    """Publishes one document's status transitions: PROCESSING (per stage), then COMPLETED or FAILED."""
+    def __init__(self, task_id: str, document_id: int, batch_id: str = None):
+        self.task_id = task_id
+        self.document_id = document_id
+        self.batch_id = batch_id
+
+    def _publish(self, status: str, **fields):
+        publish_event(self.task_id, {"status": status, "document_id": self.document_id, **fields}, self.batch_id)
+
+    def stage(self, stage: str):
+        self._publish("PROCESSING", stage=stage)
+
+    def completed(self, data: dict):
+        self._publish("COMPLETED", data=data)
+
+    def failed(self, error: str):
+        self._publish("FAILED", error=error)
+
+# --- API side -----------------------------------------------------------------
+
+class EventHub:
+    """
+    One pattern subscription per API process, fanned out to in-memory queues, so a few hundred
+    open SSE streams share a single Redis connection instead of holding one each.
+    """
+    PATTERN = "bdf:events:*"
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._queues = {} # channel -> set of asyncio.Queue
+        self._client = None
+        self._pubsub = None
+        self._reader = None
+        self._ready = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio as aioredis
+            self._client = aioredis.Redis.from_url(settings.REDIS_URL)
+        return self._client
+
+    async def _ensure_started(self, timeout: float = 5):
+        """Starts the reader on first use. Raises asyncio.TimeoutError if Redis can't be reached."""
+        if self._ready is None:
+            self._ready = asyncio.Event()
+            self._reader = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def _run(self):
+        while True:
+            try:
+                self._pubsub = self.client.pubsub()
+                await self._pubsub.psubscribe(self.PATTERN)
+                self._ready.set()
+                async for message in self._pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"].decode("utf-8")
+                    for queue in self._queues.get(channel, ()):
+                        if queue.full():
+                            # A stalled client loses its oldest events rather than holding memory
+                            queue.get_nowait()
+                        queue.put_nowait(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Event hub lost its Redis subscription, retrying: {e}")
+                self._ready.clear()
+                await asyncio.sleep(1)
+
+    async def subscribe(self, channel: str):
+        """Registers a queue for `channel`. Call before reading any snapshot, so no event falls in between."""
+        await self._ensure_started()
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._queues.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue):
+        queues = self._queues.get(channel)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[channel]
+
+    async def last_event(self, task_id: str) -> Optional[dict]:
+        raw = await self.client.get(last_event_key(task_id))
+        return json.loads(raw) if raw else None
+
+_hub = None
+
+def get_event_hub() -> EventHub:
+    global _hub
+    if _hub is None:
+        _hub = EventHub()
+    return _hub
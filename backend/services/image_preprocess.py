@@ -0,0 +1,133 @@
+import numpy as np
+from PIL import Image
+from core.config import settings
+
+# Cleans up page images before Tesseract: resample to OCR_DPI, cap the pixel count,
+# binarize (Otsu), crop scanner borders and deskew. Everything after the grayscale
+# conversion works on NumPy arrays; PIL is only used for the resize and the rotation.
+
+# Bump when the steps below change, so cached OCR text from the old pipeline isn't reused
+PREPROCESS_VERSION = "1"
+
+# Edge rows/columns darker than this fraction are scanner borders, not content
+BORDER_INK_FRACTION = 0.5
+CROP_PADDING = 16
+# Deskew estimates the angle on a copy downscaled to at most this many pixels on its longest side
+SKEW_SAMPLE_SIDE = 1000
+MIN_SKEW_DEGREES = 0.2
+
+def preprocess_variant() -> str:
+    """Cache variant for OCR output: changes whenever preprocessing would produce different images."""
+    if not settings.OCR_PREPROCESS:
+        return "raw"
+    return f"pre{PREPROCESS_VERSION}:dpi={settings.OCR_DPI}:max={settings.OCR_MAX_PIXELS}:skew={settings.OCR_MAX_SKEW_DEGREES}"
+
+def scale_for(width: int, height: int, source_dpi: float = None) -> float:
+    """
+    Resize factor that brings an image from `source_dpi` to OCR_DPI (1.0 if the DPI is unknown),
+    reduced if needed so the result stays under OCR_MAX_PIXELS.
+    """
+    scale = settings.OCR_DPI / source_dpi if source_dpi else 1.0
+    if settings.OCR_MAX_PIXELS and width * height * scale * scale > settings.OCR_MAX_PIXELS:
+        scale = (settings.OCR_MAX_PIXELS / (width * height)) ** 0.5
+    return scale
+
+def to_gray(image: Image.Image, source_dpi: float = None) -> np.ndarray:
+    """Grayscale uint8 array at OCR_DPI, within OCR_MAX_PIXELS."""
+    if image.mode != "L":
+        image = image.convert("L")
+    scale = scale_for(image.width, image.height, source_dpi)
+    if abs(scale - 1.0) > 0.01:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+    return np.asarray(image, dtype=np.uint8)
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Otsu's threshold from the 256-bin histogram: the level maximising between-class variance."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    cumulative = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = cumulative / weight_bg
+        mean_fg = (cumulative[-1] - cumulative) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    # A blank page has a single level and no defined split; 0 leaves it without ink
+    return int(np.argmax(np.nan_to_num(between)))
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Boolean ink mask (True = dark pixel)."""
+    return gray <= otsu_threshold(gray)
+
+def _content_span(ink_fraction: np.ndarray) -> tuple:
+    """Start/stop along one axis after dropping border runs at either edge."""
+    keep = np.flatnonzero(ink_fraction < BORDER_INK_FRACTION)
+    if keep.size == 0:
+        return 0, ink_fraction.size
+    return keep[0], keep[-1] + 1
+
+def crop_bounds(ink: np.ndarray) -> tuple:
+    """
+    (top, bottom, left, right) of the page content: solid scanner borders are stripped from the
+    edges, then the box is tightened to the remaining ink plus CROP_PADDING.
+    """
+    height, width = ink.shape
+    top, bottom = _content_span(ink.mean(axis=1))
+    left, right = _content_span(ink.mean(axis=0))
+    inner = ink[top:bottom, left:right]
+    rows = np.flatnonzero(inner.any(axis=1))
+    cols = np.flatnonzero(inner.any(axis=0))
+    if rows.size == 0:
+        return 0, height, 0, width
+    return (
+        max(0, top + rows[0] - CROP_PADDING),
+        min(height, top + rows[-1] + 1 + CROP_PADDING),
+        max(0, left + cols[0] - CROP_PADDING),
+        min(width, left + cols[-1] + 1 + CROP_PADDING),
+    )
+
+def _projection_score(ys: np.ndarray, xs: np.ndarray, angle: float, height: int) -> float:
+    """How sharply text rows line up once the ink is sheared by `angle` degrees."""
+    shifted = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+    shifted -= shifted.min()
+    profile = np.bincount(shifted, minlength=height)
+    return float(np.sum(np.diff(profile).astype(np.float64) ** 2))
+
+def estimate_skew(ink: np.ndarray, max_degrees: float = None) -> float:
+    """
+    Angle in degrees to pass to Image.rotate to level the text, from horizontal projection
+    profiles: a coarse 0.5 degree search within +/- max_degrees, then a 0.1 degree refinement.
+    """
+    if max_degrees is None:
+        max_degrees = settings.OCR_MAX_SKEW_DEGREES
+    step = max(1, int(np.ceil(max(ink.shape) / SKEW_SAMPLE_SIDE)))
+    sample = ink[::step, ::step]
+    ys, xs = np.nonzero(sample)
+    if ys.size < 100 or max_degrees <= 0:
+        return 0.0
+
+    def best(angles):
+        scores = [_projection_score(ys, xs, a, sample.shape[0]) for a in angles]
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best(np.arange(-max_degrees, max_degrees + 1e-9, 0.5))
+    return round(best(np.arange(coarse - 0.5, coarse + 0.5 + 1e-9, 0.1)), 1)
+
+def preprocess_for_ocr(image: Image.Image, source_dpi: float = None) -> Image.Image:
+    """
+    Returns a cropped, deskewed black-on-white bilevel ("L") image at OCR_DPI.
+    `source_dpi` is the image's resolution if known; without it only the pixel cap applies.
+    """
+    gray = to_gray(image, source_dpi)
+    ink = binarize(gray)
+    top, bottom, left, right = crop_bounds(ink)
+    ink = ink[top:bottom, left:right]
+
+    angle = estimate_skew(ink)
+    page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    if abs(angle) >= MIN_SKEW_DEGREES:
+        page = page.rotate(angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+        rotated = np.asarray(page) == 0
+        top, bottom, left, right = crop_bounds(rotated)
+        page = page.crop((left, top, right, bottom))
+    return page
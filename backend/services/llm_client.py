@@ -0,0 +1,233 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from google.api_core import exceptions as google_exceptions
+from core.config import settings
+from services.rate_limiter import TokenBucket
+from services.metrics import LLM_CALLS, LLM_RETRIES
+
+# Long-lived, per-process LLM state. Celery initialises it from worker_process_init;
+# anything else (API process, scripts, solo pool) initialises it lazily on first use.
+_provider = None
+_stats = {}
+_lock = threading.Lock()
+
+# Bounds in-flight calls per process and smooths them to the API quota.
+# The quota is per project, so with several LLM workers divide LLM_REQUESTS_PER_MINUTE between them.
+_concurrency = threading.BoundedSemaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+_rate_limiter = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE / 60.0, settings.LLM_RATE_BURST) if settings.LLM_REQUESTS_PER_MINUTE else None
+
+# Errors worth retrying with backoff: quota exhaustion and transient server-side failures
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+class LLMProvider(ABC):
+    """A text-in, text-out LLM backend. `purpose` says which pipeline step is calling ("extract", "extract_batch", "review")."""
+    name = "base"
+
+    def is_configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    def generate(self, model_name: str, prompt: str, system_instruction: str = None, purpose: str = None) -> str:
+        """Returns the model's text answer for `prompt`."""
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google.generativeai, with one GenerativeModel per (model, system prompt)."""
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._models = {}
+        self._models_lock = threading.Lock()
+        if api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def get_model(self, model_name: str, system_instruction: str = None):
+        import google.generativeai as genai
+        key = (model_name, system_instruction)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+                self._models[key] = model
+            return model
+
+    def generate(self, model_name: str, prompt: str, system_instruction: str = None, purpose: str = None) -> str:
+        return self.get_model(model_name, system_instruction).generate_content(prompt).text
+
+# Canned answers for FakeProvider, one list per purpose. The extractions are chosen so that some
+# pass the local rules and some are ambiguous, which sends them on to the reviewer.
+FAKE_RESPONSES = {
+    "extract": [
+        {
+            "vendor_info": {"name": "Acme Supplies LLC"},
+            "invoice_details": {"number": "INV-1001", "date": "2024-03-14"},
+            "financials": {"subtotal": 100.0, "tax_amount": 15.0, "total_amount": 115.0, "currency": "USD"},
+            "items": [
+                {"description": "Printer paper", "quantity": 4, "unit_price": 12.5, "total_price": 50.0},
+                {"description": "Toner", "quantity": 1, "unit_price": 50.0, "total_price": 50.0},
+            ],
+        },
+        {
+            "vendor_info": {"name": "مؤسسة النور للتجارة"},
+            "invoice_details": {"number": "2024/553", "date": "2024-02-01"},
+            "financials": {"subtotal": 200.0, "tax_amount": 30.0, "total_amount": 230.0, "currency": "SAR"},
+            "items": [{"description": "خدمات صيانة", "quantity": 2, "unit_price": 100.0, "total_price": 200.0}],
+        },
+        {
+            "vendor_info": {"name": "Corner Cafe"},
+            "invoice_details": {"number": None, "date": None},
+            "financials": {"total_amount": 18.4, "currency": "EUR"},
+            "items": [],
+            "summary": "Cafe receipt without a readable date.",
+        },
+    ],
+    "summarize": [
+        {"summary": "Service agreement renewal letter; no amounts due.", "document_kind": "letter", "vendor_info": {"name": None}},
+    ],
+    "review": [
+        {"status": "valid"},
+        {"status": "invalid", "reasons": ["Totals do not reconcile with the line items."]},
+    ],
+}
+
+class FakeProvider(LLMProvider):
+    """
+    Offline stand-in for load tests and benchmarks. Replays canned JSON after a simulated latency,
+    and fails a configurable share of calls with a retryable API error. The answer, latency and
+    failure for a prompt are derived from (seed, prompt, attempt), so runs are reproducible
+    regardless of thread scheduling.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: int, jitter_ms: int, error_rate: float, seed: int, responses_path: str = ""):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.responses = dict(FAKE_RESPONSES)
+        if responses_path:
+            with open(responses_path, "r", encoding="utf-8") as f:
+                self.responses.update(json.load(f))
+        self._attempts = {}
+        self._attempts_lock = threading.Lock()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._attempts_lock:
+            if len(self._attempts) > 100000:
+                self._attempts.clear()
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def _pick(self, purpose: str, rng: random.Random):
+        choices = self.responses.get(purpose) or self.responses["extract"]
+        return choices[rng.randrange(len(choices))]
+
+    def generate(self, model_name: str, prompt: str, system_instruction: str = None, purpose: str = None) -> str:
+        rng = self._rng((system_instruction or "") + prompt)
+        delay = max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+        time.sleep(delay)
+        if rng.random() < self.error_rate:
+            raise google_exceptions.ServiceUnavailable("fake provider: simulated failure")
+
+        if purpose == "extract_batch":
+            ids = re.findall(r"^=== DOCUMENT (\S+) ===$", prompt, flags=re.MULTILINE)
+            return json.dumps([{"id": doc_id, "result": self._pick("extract", rng)} for doc_id in ids], ensure_ascii=False)
+        return json.dumps(self._pick(purpose or "extract", rng), ensure_ascii=False)
+
+def _build_provider() -> LLMProvider:
+    if settings.LLM_PROVIDER == "fake":
+        return FakeProvider(
+            settings.LLM_FAKE_LATENCY_MS,
+            settings.LLM_FAKE_JITTER_MS,
+            settings.LLM_FAKE_ERROR_RATE,
+            settings.LLM_FAKE_SEED,
+            settings.LLM_FAKE_RESPONSES,
+        )
+    if settings.LLM_PROVIDER == "gemini":
+        return GeminiProvider(settings.GEMINI_API_KEY)
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER!r}")
+
+def get_provider() -> LLMProvider:
+    """The process-wide provider selected by LLM_PROVIDER."""
+    global _provider
+    with _lock:
+        if _provider is None:
+            _provider = _build_provider()
+        return _provider
+
+def init_client() -> bool:
+    """Sets up the provider once for this process. Returns False if it lacks credentials (e.g. no GEMINI_API_KEY)."""
+    return get_provider().is_configured()
+
+def reset_client():
+    """Drops the provider and its cached models, e.g. after a fork or a settings change."""
+    global _provider
+    with _lock:
+        _provider = None
+
+def model_tag(model_name: str) -> str:
+    """Provider-qualified model name, for cache keys that must not mix real and fake answers."""
+    return f"{settings.LLM_PROVIDER}:{model_name}"
+
+def _record(model_name: str, seconds: float, failed: bool, retries: int = 0):
+    with _lock:
+        stat = _stats.setdefault(model_name, {"calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stat["calls"] += 1
+        stat["errors"] += int(failed)
+        stat["retries"] += retries
+        stat["total_seconds"] += seconds
+        stat["max_seconds"] = max(stat["max_seconds"], seconds)
+
+def generate(model_name: str, prompt: str, system_instruction: str = None, purpose: str = None) -> str:
+    """
+    Runs the prompt on the configured provider and records the call's latency.
+    Safe to call from many threads: calls wait for a concurrency slot and a rate-limit token,
+    and quota/transient errors are retried with exponential backoff.
+    """
+    provider = get_provider()
+    start = time.perf_counter()
+    failed = True
+    attempt = 0
+    try:
+        with _concurrency:
+            while True:
+                if _rate_limiter:
+                    _rate_limiter.acquire()
+                try:
+                    text = provider.generate(model_name, prompt, system_instruction, purpose)
+                    break
+                except RETRYABLE_ERRORS:
+                    if attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    LLM_RETRIES.labels(model_name, purpose or "").inc()
+                    time.sleep(min(30, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+                    attempt += 1
+        failed = False
+        return text
+    finally:
+        LLM_CALLS.labels(model_name, purpose or "", "error" if failed else "ok").inc()
+        _record(model_name, time.perf_counter() - start, failed, attempt)
+
+def call_stats() -> dict:
+    """Per-model call counts, error counts and latency totals for this process."""
+    with _lock:
+        return {
+            name: {**stat, "avg_seconds": stat["total_seconds"] / stat["calls"] if stat["calls"] else 0.0}
+            for name, stat in _stats.items()
+        }
@@ -0,0 +1,80 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, start_http_server
+from prometheus_client import multiprocess
+
+# Prometheus metrics shared by the API and the workers.
+# With several processes (Celery prefork, the OCR pool, uvicorn workers) set PROMETHEUS_MULTIPROC_DIR
+# to a shared, empty directory so every process writes there and the exporters aggregate it.
+
+# Seconds buckets from a few ms (classify, cache) up to multi-minute scanned PDFs
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "bdf_stage_seconds", "Time spent per pipeline stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+TASKS = Counter("bdf_tasks_total", "Pipeline tasks by outcome", ["task", "outcome"])
+CACHE_LOOKUPS = Counter("bdf_cache_lookups_total", "Extraction cache lookups", ["stage", "result"])
+LLM_CALLS = Counter("bdf_llm_calls_total", "LLM requests by outcome", ["model", "purpose", "outcome"])
+LLM_RETRIES = Counter("bdf_llm_retries_total", "LLM requests retried after a quota or transient error", ["model", "purpose"])
+DOC_TYPES = Counter("bdf_doc_types_total", "Documents by classified type and route", ["doc_type", "source", "route"])
+DUPLICATES = Counter("bdf_duplicates_total", "Near-duplicate documents detected", ["key", "action"])
+FALLBACKS = Counter("bdf_fallbacks_total", "Degraded paths taken", ["kind"])
+HTTP_SECONDS = Histogram(
+    "bdf_http_request_seconds", "API request latency",
+    ["method", "route", "status"], buckets=STAGE_BUCKETS,
+)
+
+class StageSpans:
+    """
+    Collects named timing spans for one document. Each span is observed in STAGE_SECONDS
+    and accumulated in `seconds`, which goes on the task result as stage_timings_ms.
+    """
+    def __init__(self, seconds: dict = None):
+        self.seconds = dict(seconds or {})
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float, observe: bool = True):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        if observe:
+            STAGE_SECONDS.labels(stage).observe(seconds)
+
+    def as_ms(self) -> dict:
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.seconds.items()}
+
+def record_queue_wait(spans: StageSpans, stage: str, enqueued_at: float):
+    """Time between the producer's enqueue timestamp and the task starting (clocks are assumed in sync)."""
+    if enqueued_at:
+        spans.record(stage, max(0.0, time.time() - enqueued_at))
+
+def record_fallback(kind: str):
+    FALLBACKS.labels(kind).inc()
+
+def registry():
+    """The registry to export: aggregated over processes in multiprocess mode, else this process's."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return REGISTRY
+
+def render_latest() -> bytes:
+    return generate_latest(registry())
+
+def start_exporter(port: int):
+    """Serves /metrics over HTTP from a background thread (used by the Celery workers)."""
+    start_http_server(port, registry=registry())
+
+def mark_process_dead(pid: int):
+    """Drops a finished process's live gauges in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
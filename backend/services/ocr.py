@@ -1,22 +1,119 @@
+import os
+import threading
 import pytesseract
 from PIL import Image
 from core.config import settings
+from services.image_preprocess import preprocess_for_ocr, scale_for
+from services.metrics import record_fallback
 
 # Tesseract Configuration
 pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_PATH
 
+# OCR backends. "tesserocr" keeps a Tesseract engine loaded per thread through the C API, so the
+# traineddata is read once per process and pages are handed over in memory. "pytesseract" runs the
+# tesseract binary per image (temp file in, stdout out). "auto" prefers tesserocr and falls back.
+
+class _EngineUnavailable(Exception):
+    pass
+
+_engines = threading.local()
+_engine_lock = threading.Lock()
+_engine_failed = False
+
+def _new_engine(lang: str):
+    import tesserocr
+    kwargs = {"lang": lang, "psm": tesserocr.PSM.AUTO}
+    if settings.TESSDATA_PATH:
+        kwargs["path"] = settings.TESSDATA_PATH
+    return tesserocr.PyTessBaseAPI(**kwargs)
+
+def _get_engine(lang: str):
+    """
+    This thread's engine for `lang`, created on first use. Engines aren't thread-safe and must
+    not survive a fork, so they're keyed by thread and pid. Raises _EngineUnavailable if
+    tesserocr is missing or can't load the traineddata; after that the process stops trying.
+    """
+    global _engine_failed
+    if _engine_failed:
+        raise _EngineUnavailable()
+    engines = getattr(_engines, "by_lang", None)
+    if engines is None or _engines.pid != os.getpid():
+        engines = _engines.by_lang = {}
+        _engines.pid = os.getpid()
+    engine = engines.get(lang)
+    if engine is None:
+        try:
+            engine = engines[lang] = _new_engine(lang)
+        except (ImportError, RuntimeError) as e:
+            with _engine_lock:
+                if not _engine_failed:
+                    print(f"Tesseract engine unavailable: {e}")
+                    record_fallback("ocr_pytesseract")
+                _engine_failed = True
+            raise _EngineUnavailable() from e
+    return engine
+
+def _tesserocr_to_string(image: Image.Image, lang: str, dpi: int = None) -> str:
+    engine = _get_engine(lang)
+    try:
+        engine.SetImage(image)
+        if dpi:
+            engine.SetSourceResolution(dpi)
+        return engine.GetUTF8Text()
+    finally:
+        engine.Clear()
+
+def _image_to_string(image: Image.Image, lang: str, dpi: int = None) -> str:
+    """Runs the configured OCR_ENGINE on an in-memory image."""
+    if settings.OCR_ENGINE in ("auto", "tesserocr"):
+        try:
+            return _tesserocr_to_string(image, lang, dpi)
+        except _EngineUnavailable:
+            if settings.OCR_ENGINE == "tesserocr":
+                raise RuntimeError("OCR_ENGINE=tesserocr but the Tesseract engine could not be loaded")
+    config = f"--dpi {dpi}" if dpi else ""
+    return pytesseract.image_to_string(image, lang=lang, config=config)
+
+def _image_dpi(image: Image.Image):
+    """The resolution stored in the file (PNG pHYs, JPEG JFIF, TIFF), if any."""
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and float(dpi[0]) > 1:
+        return float(dpi[0])
+    return None
+
+def _prepare(image: Image.Image, source_dpi: float = None):
+    """Returns (image, dpi for Tesseract): preprocessed at OCR_DPI when OCR_PREPROCESS is on."""
+    if not settings.OCR_PREPROCESS:
+        return image, None
+    # Without a known resolution the image keeps its size, so there's no DPI to tell Tesseract
+    dpi = round(source_dpi * scale_for(image.width, image.height, source_dpi)) if source_dpi else None
+    return preprocess_for_ocr(image, source_dpi), dpi
+
 def extract_text_from_image(image_path: str, lang: str = 'eng+ara') -> str:
     """Extracts text from an image file using Tesseract OCR."""
     try:
-        return pytesseract.image_to_string(Image.open(image_path), lang=lang)
+        with Image.open(image_path) as image:
+            image, dpi = _prepare(image, _image_dpi(image))
+            return _image_to_string(image, lang, dpi)
     except Exception as e:
         print(f"Error extracting text from image {image_path}: {e}")
         return ""
 
-def extract_text_from_image_object(image: Image.Image, lang: str = 'eng+ara') -> str:
-    """Extracts text from a PIL Image object."""
+def extract_text_from_image_object(image: Image.Image, lang: str = 'eng+ara', dpi: float = None) -> str:
+    """Extracts text from a PIL Image object. `dpi` is its resolution, if known."""
     try:
-        return pytesseract.image_to_string(image, lang=lang)
+        image, dpi = _prepare(image, dpi)
+        return _image_to_string(image, lang, dpi)
     except Exception as e:
         print(f"Error extracting text from PIL Image: {e}")
         return ""
+
+def engine_name(lang: str = 'eng+ara') -> str:
+    """The backend pages are actually OCRed with in this process: "tesserocr" or "pytesseract"."""
+    if settings.OCR_ENGINE == "pytesseract":
+        return "pytesseract"
+    try:
+        _get_engine(lang)
+        return "tesserocr"
+    except _EngineUnavailable:
+        return "pytesseract"
@@ -1,34 +1,157 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import fitz  # PyMuPDF
 from PIL import Image
+from core.config import settings
 from services.ocr import extract_text_from_image_object
+from services.image_preprocess import scale_for
+from services.metrics import record_fallback
 
-def extract_text_from_pdf(file_path: str) -> str:
+# One pool per worker process, created on first use so forked Celery workers
+# never inherit a pool from their parent. The lock keeps concurrent tasks on a
+# thread-pool worker from each creating (and leaking) one.
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                workers = settings.OCR_WORKERS or os.cpu_count() or 1
+                _ocr_pool = ProcessPoolExecutor(max_workers=workers)
+    return _ocr_pool
+
+def _shutdown_ocr_pool(pool: ProcessPoolExecutor = None):
+    """Shuts the pool down; with `pool`, only if it's still the current one (another thread may have replaced it)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None or (pool is not None and _ocr_pool is not pool):
+            return
+        pool, _ocr_pool = _ocr_pool, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _render_dpi(page) -> float:
+    """OCR_DPI, lowered for oversized pages so the render stays under OCR_MAX_PIXELS."""
+    # Page sizes are in points, i.e. pixels at 72 DPI
+    return 72 * scale_for(page.rect.width, page.rect.height, 72)
+
+def _render_page(page, dpi: float = None) -> Image.Image:
+    """Renders a PyMuPDF page to a PIL Image, at PyMuPDF's default 72 DPI unless `dpi` is given."""
+    if dpi is None:
+        pix = page.get_pixmap()
+        # pix.samples contains the raw RGB image data
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    # Preprocessing works in grayscale, so skip rendering the colour channels
+    pix = page.get_pixmap(dpi=round(dpi), colorspace=fitz.csGRAY)
+    return Image.frombytes("L", [pix.width, pix.height], pix.samples)
+
+def _render_and_ocr(page) -> dict:
+    """Renders and OCRs a page, timing both steps: {"text", "render_seconds", "ocr_seconds"}."""
+    start = time.perf_counter()
+    dpi = _render_dpi(page) if settings.OCR_PREPROCESS else None
+    img = _render_page(page, dpi)
+    rendered = time.perf_counter()
+    text = extract_text_from_image_object(img, dpi=round(dpi) if dpi else None)
+    return {
+        "text": text,
+        "render_seconds": rendered - start,
+        "ocr_seconds": time.perf_counter() - rendered,
+    }
+
+def _ocr_page(file_path: str, page_index: int) -> dict:
     """
-    Extracts text from a PDF file by converting pages to images using PyMuPDF (fitz).
-    This avoids external dependencies like Poppler.
+    Renders and OCRs a single page. Runs inside the pool workers, so each worker
+    opens the PDF itself instead of receiving pixel data over IPC.
+    """
+    with fitz.open(file_path) as doc:
+        return _render_and_ocr(doc[page_index])
+
+def _native_page_text(page) -> str:
+    """
+    Returns the page's embedded text layer if it is usable, otherwise "".
+    Scanned pages have no text layer, and broken font encodings show up as
+    replacement characters, so both fall back to OCR.
+    """
+    page_text = page.get_text("text")
+    meaningful = sum(1 for c in page_text if c.isalnum())
+    if meaningful < settings.PDF_TEXT_MIN_CHARS:
+        return ""
+    if page_text.count("\ufffd") > meaningful * 0.1:
+        return ""
+    return page_text
+
+def extract_pdf_pages(file_path: str, max_pages: int = None, parallel: bool = None) -> list:
+    """
+    Extracts text per page, using the PDF's own text layer when it has usable text
+    and falling back to render + OCR otherwise.
+
+    Returns a list of {"page": int, "method": "text" | "ocr", "text": str} in page order;
+    OCR pages also carry "render_seconds" and "ocr_seconds".
+    Pages needing OCR are processed in a process pool when `parallel` is enabled
+    (settings.OCR_PARALLEL by default). `max_pages` defaults to settings.OCR_MAX_PAGES.
     """
-    text = ""
+    if max_pages is None:
+        max_pages = settings.OCR_MAX_PAGES
+    if parallel is None:
+        parallel = settings.OCR_PARALLEL
+
+    pages = []
     try:
         # Open the PDF
         doc = fitz.open(file_path)
-        
-        for i, page in enumerate(doc):
-            if i >= 2:
-                break
-            # Render page to a pixmap (image)
-            pix = page.get_pixmap()
-            
-            # Convert pixmap to PIL Image
-            # pix.samples contains the raw RGB image data
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            # Extract text from the page image
-            page_text = extract_text_from_image_object(img)
-            text += f"--- Page {i+1} ---\n{page_text}\n"
-            
+        page_count = doc.page_count
+        if max_pages:
+            page_count = min(page_count, max_pages)
+
+        # Fast path: digitally generated PDFs already carry their text
+        for i in range(page_count):
+            native_text = _native_page_text(doc[i])
+            pages.append({
+                "page": i + 1,
+                "method": "text" if native_text else "ocr",
+                "text": native_text
+            })
+
+        ocr_indexes = [p["page"] - 1 for p in pages if p["method"] == "ocr"]
+        ocr_results = None
+        if parallel and len(ocr_indexes) > 1:
+            pool = None
+            try:
+                pool = _get_ocr_pool()
+                ocr_results = list(pool.map(_ocr_page, [file_path] * len(ocr_indexes), ocr_indexes))
+            except (BrokenProcessPool, OSError, AssertionError) as e:
+                # e.g. daemonic Celery prefork children cannot start a pool
+                print(f"Parallel OCR unavailable, falling back to sequential: {e}")
+                record_fallback("ocr_sequential")
+                if pool is not None:
+                    _shutdown_ocr_pool(pool)
+                ocr_results = None
+
+        if ocr_results is None:
+            ocr_results = [_render_and_ocr(doc[i]) for i in ocr_indexes]
+
+        for i, ocr_result in zip(ocr_indexes, ocr_results):
+            pages[i].update(ocr_result)
+
         doc.close()
-            
+
     except Exception as e:
         print(f"Error reading PDF via PyMuPDF {file_path}: {e}")
-    
-    return text
+
+    return pages
+
+def format_pages(pages: list) -> str:
+    """Joins extracted pages into the '--- Page N ---' text the extractor expects."""
+    return "".join(f"--- Page {p['page']} ---\n{p['text']}\n" for p in pages)
+
+def extract_text_from_pdf(file_path: str, max_pages: int = None, parallel: bool = None) -> str:
+    """
+    Extracts text from a PDF file, using the embedded text layer where possible and
+    converting the remaining pages to images for OCR using PyMuPDF (fitz).
+    This avoids external dependencies like Poppler.
+    """
+    return format_pages(extract_pdf_pages(file_path, max_pages=max_pages, parallel=parallel))
@@ -0,0 +1,189 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import delete, insert, select, update, func
+from sqlalchemy.orm import Session
+from models.invoice import Document, Invoice, LineItem
+from models.task_status import ProcessingStatus
+from core.config import settings
+from core.database import on_conflict_upsert
+from services import search
+
+logger = logging.getLogger(__name__)
+
+# Worker-side writes for the pipeline. Every write is a plain INSERT/UPDATE statement rather than
+# ORM objects, so a document costs the same number of round-trips however many line items it has:
+# one upsert ... RETURNING for the invoice, one DELETE plus one executemany for the items (batched
+# into multi-row INSERTs by the driver) and one UPDATE for the document, all in a single transaction.
+# Writes are idempotent on invoices.document_id, so a redelivered task just rewrites its result.
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def parse_invoice_date(date_str):
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        logger.warning(f"Could not parse date string: {date_str}")
+        return None
+
+def invoice_values(document_id: int, file_path: str, doc_type: str, raw_text: str,
+                   extracted_data: dict, validation_result: dict) -> dict:
+    """Column values for an Invoice row from the extractor's JSON."""
+    vendor_info = extracted_data.get("vendor_info", {})
+    invoice_details = extracted_data.get("invoice_details", {})
+    financials = extracted_data.get("financials", {})
+    return {
+        "document_id": document_id,
+        "invoice_number": invoice_details.get("number"),
+        "date": parse_invoice_date(invoice_details.get("date")),
+        "vendor": vendor_info.get("name"),
+        "total": financials.get("total_amount"),
+        "tax": financials.get("tax_amount"),
+        "currency": financials.get("currency"),
+        "file_path": file_path,
+        "doc_type": doc_type,
+        "summary": extracted_data.get("summary"),
+        "raw_content": raw_text,
+        "validation": validation_result,
+    }
+
+def line_item_values(invoice_id: int, items: list) -> list:
+    return [
+        {
+            "invoice_id": invoice_id,
+            "description": item.get("description"),
+            "quantity": item.get("quantity"),
+            "unit_price": item.get("unit_price"),
+            "total_price": item.get("total_price"),
+            "discount": item.get("discount"),
+        }
+        for item in items
+    ]
+
+def mark_document(db: Session, document_id: int, status: ProcessingStatus = None, **values) -> Optional[str]:
+    """
+    UPDATE documents SET status/values WHERE id = document_id, without loading the row.
+    Returns the document's batch_id (None for single uploads and for unknown documents).
+    Doesn't commit.
+    """
+    if status is not None:
+        values["status"] = status
+    return db.execute(
+        update(Document).where(Document.id == document_id).values(**values).returning(Document.batch_id)
+    ).scalar()
+
+def start_document(db: Session, document_id: int, task_id: str = None) -> Optional[str]:
+    """Marks a document PROCESSING and commits. Returns its batch_id."""
+    values = {"started_at": now()}
+    if task_id:
+        # Documents uploaded before task ids were stored get theirs on first run
+        values["task_id"] = func.coalesce(Document.task_id, task_id)
+    batch_id = mark_document(db, document_id, ProcessingStatus.PROCESSING, **values)
+    db.commit()
+    return batch_id
+
+def upsert_invoices(db: Session, rows: list) -> dict:
+    """
+    Inserts invoices from `rows` (invoice_values() dicts) as one multi-row statement, overwriting
+    any unapproved invoice already stored for the same document (a redelivered task, or an earlier
+    error_fallback). Approved invoices belong to the reviewer and are left as they are.
+    Returns {document_id: invoice_id} of the invoices written. Doesn't commit.
+    """
+    stmt = on_conflict_upsert(
+        db.get_bind().dialect.name, Invoice, rows, [Invoice.document_id],
+        lambda excluded: {column: excluded[column] for column in rows[0] if column != "document_id"},
+        where=Invoice.verified.is_not(True)
+    )
+    if stmt is not None:
+        return dict(db.execute(stmt.returning(Invoice.document_id, Invoice.id)).all())
+
+    # Generic fallback for databases without ON CONFLICT
+    document_ids = [row["document_id"] for row in rows]
+    existing = {
+        document_id: (invoice_id, verified) for document_id, invoice_id, verified in db.execute(
+            select(Invoice.document_id, Invoice.id, Invoice.verified).where(Invoice.document_id.in_(document_ids))
+        ).all()
+    }
+    written = {}
+    for row in rows:
+        invoice_id, verified = existing.get(row["document_id"], (None, False))
+        if verified:
+            continue
+        if invoice_id is not None:
+            db.execute(update(Invoice).where(Invoice.id == invoice_id).values(**row))
+            written[row["document_id"]] = invoice_id
+        else:
+            written[row["document_id"]] = db.execute(insert(Invoice).values(**row).returning(Invoice.id)).scalar_one()
+    return written
+
+def replace_line_items(db: Session, items_by_invoice: dict):
+    """Replaces the line items of each invoice in {invoice_id: items}. Doesn't commit."""
+    db.execute(delete(LineItem).where(LineItem.invoice_id.in_(list(items_by_invoice))))
+    rows = [row for invoice_id, items in items_by_invoice.items() for row in line_item_values(invoice_id, items)]
+    if rows:
+        db.execute(insert(LineItem), rows)
+
+def save_invoices(db: Session, results: list) -> dict:
+    """
+    Writes several documents' results in one transaction: [(invoice_values, items)] becomes one
+    invoice upsert, one line-item delete, one line-item executemany, one search-index upsert
+    and one document UPDATE. Approved invoices are not overwritten.
+    Returns {document_id: invoice_id}.
+    """
+    # One row per document: a statement can't upsert the same key twice
+    latest = {values["document_id"]: (values, items) for values, items in results}
+    written = upsert_invoices(db, [values for values, _ in latest.values()])
+    replace_line_items(db, {written[document_id]: items for document_id, (_, items) in latest.items() if document_id in written})
+    if settings.SEARCH_INDEX_ENABLED:
+        search.index_invoices(db, [
+            search.index_row(written[document_id], values, items)
+            for document_id, (values, items) in latest.items() if document_id in written
+        ])
+    # Documents whose invoice was already approved (e.g. a redelivered task) keep it untouched
+    kept = [document_id for document_id in latest if document_id not in written]
+    invoice_ids = dict(written)
+    if kept:
+        invoice_ids.update(db.execute(
+            select(Invoice.document_id, Invoice.id).where(Invoice.document_id.in_(kept))
+        ).all())
+    db.execute(
+        update(Document).where(Document.id.in_(list(invoice_ids)))
+        .values(status=ProcessingStatus.COMPLETED, completed_at=now(), error=None)
+    )
+    db.commit()
+    return invoice_ids
+
+def save_invoice(db: Session, values: dict, items: list) -> int:
+    """
+    Writes the invoice, its line items and the document's COMPLETED status in one transaction.
+    Returns the invoice id.
+    """
+    return save_invoices(db, [(values, items)])[values["document_id"]]
+
+def save_failure(db: Session, document_id: int, file_path: str, raw_text: str, error: str) -> bool:
+    """
+    Marks the document FAILED and, if OCR got that far, keeps the raw text as an "error_fallback"
+    invoice so it isn't lost. One transaction; the fallback insert sits in a savepoint so a
+    conflict there (e.g. the invoice was already written) doesn't block the status update.
+    Returns whether the fallback invoice was written.
+    """
+    db.rollback()
+    saved_fallback = False
+    if raw_text and document_id:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Invoice).values(
+                    document_id=document_id,
+                    file_path=file_path,
+                    raw_content=raw_text,
+                    doc_type="error_fallback"
+                ))
+            saved_fallback = True
+        except Exception as e:
+            logger.error(f"Failed to save fallback raw content: {e}")
+    mark_document(db, document_id, ProcessingStatus.FAILED, completed_at=now(), error=error)
+    db.commit()
+    return saved_fallback
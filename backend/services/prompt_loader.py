@@ -1,6 +1,12 @@
+import hashlib
 import os
+import threading
 
 class PromptManager:
+    # Shared by all instances: path -> (mtime, content). Files are re-read only when they change.
+    _file_cache = {}
+    _file_cache_lock = threading.Lock()
+
     def __init__(self, base_path="prompts"):
         # Use absolute path if possible or ensure it works relative to the root
         # Determining absolute path for robustness
@@ -9,33 +15,60 @@ class PromptManager:
 
     def get_prompt(self, category, filename):
         path = os.path.join(self.base_path, category, filename)
-        if not os.path.exists(path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
             # Fallback if specific file doesn't exist
             return ""
+
+        cached = self._file_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
         with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+            content = f.read()
+        with self._file_cache_lock:
+            self._file_cache[path] = (mtime, content)
+        return content
 
     def determine_doc_type(self, ocr_text):
         """
-        مرحلة سريعة جداً لتصنيف المستند قبل البدء بالاستخراج العميق
+        "invoice", "receipt" or "general_document", from the local classifier (services/doc_classifier.py).
+        The pipeline calls doc_classifier.classify itself, to also get the confidence.
         """
-        # كلمات مفتاحية بسيطة لتوفير استهلاك الـ AI
-        ocr_lower = ocr_text.lower()
-        if "receipt" in ocr_lower or "total cash" in ocr_lower:
-            return "receipt"
-        elif "invoice" in ocr_lower or "bill to" in ocr_lower:
-            return "invoice"
-        else:
-            return "generic"
-
-    def get_structured_prompt(self, ocr_text):
-        doc_type = self.determine_doc_type(ocr_text)
-        
+        from services.doc_classifier import classify
+        return classify(ocr_text)[0]
+
+    def get_task_file(self, doc_type):
         # اختيار الـ Prompt بناءً على النوع
         if doc_type == "receipt":
-            task_file = "receipt_v1.txt" # تأكد من إنشاء هذا الملف
-        else:
-            task_file = "invoice_extraction_v1.txt"
+            return "receipt_v1.txt"
+        if doc_type == "general_document":
+            return "general_document_v1.txt"
+        return "invoice_extraction_v1.txt"
+
+    def get_task_schema(self, doc_type):
+        """The "Target Schema:" block of the task prompt for this doc type, or "" if it has none."""
+        task_template = self.get_prompt("tasks", self.get_task_file(doc_type))
+        if "Target Schema:" not in task_template:
+            return ""
+        return task_template.split("Target Schema:", 1)[1].split("OCR Input:", 1)[0].strip()
+
+    def prompt_version(self, doc_type):
+        """
+        Short digest of the system + task prompt used for this doc type.
+        Changes whenever a prompt file is edited, so cached extractions keyed on it go stale.
+        """
+        system_prompt = self.get_prompt("system", "parser_v1.txt")
+        task_template = self.get_prompt("tasks", self.get_task_file(doc_type))
+        if not system_prompt or not task_template:
+            return "inline"
+        return hashlib.sha256((system_prompt + task_template).encode("utf-8")).hexdigest()[:12]
+
+    def get_structured_prompt(self, ocr_text, doc_type=None):
+        # Callers that already classified the document pass its type, so it isn't classified twice
+        doc_type = doc_type or self.determine_doc_type(ocr_text)
+        task_file = self.get_task_file(doc_type)
             
         system_prompt = self.get_prompt("system", "parser_v1.txt")
         task_template = self.get_prompt("tasks", task_file)
@@ -45,3 +78,12 @@ class PromptManager:
             return "", ocr_text
 
         return system_prompt, task_template.replace("{{ocr_text}}", ocr_text)
+
+_manager = None
+
+def get_prompt_manager() -> PromptManager:
+    """Process-wide PromptManager, so callers don't rebuild it per document."""
+    global _manager
+    if _manager is None:
+        _manager = PromptManager()
+    return _manager
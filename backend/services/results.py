@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from core.config import settings
+from core.database import SessionLocal
+from models.invoice import Document, Invoice
+from models.task_status import ProcessingStatus
+
+# Task results are served from the documents/invoices tables; the Celery result backend
+# only has to hold them for CELERY_RESULT_EXPIRES_SECONDS. Every path that hands a result to the
+# frontend (/result, the SSE "COMPLETED" event, the Celery fallbacks) builds it with invoice_payload.
+
+class ResultLRU:
+    """Small per-process LRU of finished task payloads, with a TTL so other processes' edits show up."""
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # task_id -> (stored_at, document_id, payload)
+        self._lock = threading.Lock()
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[task_id]
+                return None
+            self._entries.move_to_end(task_id)
+            return entry[2]
+
+    def set(self, task_id: str, document_id: int, payload: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[task_id] = (time.monotonic(), document_id, payload)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_document(self, document_id: int):
+        with self._lock:
+            for task_id in [k for k, v in self._entries.items() if v[1] == document_id]:
+                del self._entries[task_id]
+
+result_cache = ResultLRU(settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL_SECONDS)
+
+def _amount(value):
+    return float(value) if value is not None else None
+
+def invoice_payload(document: Document, invoice: Optional[Invoice]) -> dict:
+    """The stored result of a document, in the flat invoice shape the review page reads."""
+    payload = {"document_id": document.id, "filename": document.filename, "duplicate_of": document.duplicate_of}
+    if invoice is None:
+        return payload
+    payload.update({
+        "invoice_id": invoice.id,
+        "invoice_number": invoice.invoice_number,
+        "date": invoice.date.isoformat() if invoice.date else None,
+        "vendor": invoice.vendor,
+        "total": _amount(invoice.total),
+        "tax": _amount(invoice.tax),
+        "currency": invoice.currency,
+        "doc_type": invoice.doc_type,
+        "summary": invoice.summary,
+        "verified": bool(invoice.verified),
+        "validation_result": invoice.validation,
+        "line_items": [
+            {
+                "id": item.id,
+                "description": item.description,
+                "quantity": _amount(item.quantity),
+                "unit_price": _amount(item.unit_price),
+                "amount": _amount(item.total_price),
+                "discount": _amount(item.discount),
+            }
+            for item in invoice.line_items
+        ],
+    })
+    return payload
+
+def stored_payload(db: Session, document_id: int) -> Optional[dict]:
+    """invoice_payload of a document, read with a sync session (workers, Celery fallbacks). None if it's gone."""
+    document = db.get(Document, document_id)
+    if document is None:
+        return None
+    invoice = db.execute(
+        select(Invoice).options(selectinload(Invoice.line_items)).where(Invoice.document_id == document_id)
+    ).scalars().first()
+    return invoice_payload(document, invoice)
+
+def celery_payload(result) -> dict:
+    """
+    A finished task's Celery result in invoice_payload shape. Tasks from before the results were
+    built that way returned the extractor JSON; their document is read back instead.
+    """
+    document_id = result.get("document_id") if isinstance(result, dict) else None
+    if document_id is None:
+        return result
+    db = SessionLocal()
+    try:
+        return stored_payload(db, document_id) or result
+    finally:
+        db.close()
+
+async def load_task_result(db: AsyncSession, task_id: str) -> Optional[dict]:
+    """
+    Returns {"status": "processing" | "completed" | "failed", ...} for a task from the database,
+    or None if no document has this task_id. Finished results are kept in the LRU.
+    """
+    cached = result_cache.get(task_id)
+    if cached is not None:
+        return cached
+
+    document = (await db.execute(select(Document).where(Document.task_id == task_id))).scalars().first()
+    if document is None:
+        return None
+
+    if document.status == ProcessingStatus.COMPLETED:
+        invoice = (await db.execute(
+            select(Invoice).options(selectinload(Invoice.line_items)).where(Invoice.document_id == document.id)
+        )).scalars().first()
+        result = {"status": "completed", "data": invoice_payload(document, invoice)}
+    elif document.status == ProcessingStatus.FAILED:
+        result = {"status": "failed", "error": document.error or "Processing failed"}
+    else:
+        return {"status": "processing"}
+
+    result_cache.set(task_id, document.id, result)
+    return result
@@ -0,0 +1,81 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import select, update, delete, insert, func, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import on_conflict_upsert
+from models.invoice import Invoice, MonthlySpend
+
+# Bucket for verified invoices without a date, so they still count towards total spend
+UNDATED = (0, 0)
+
+def month_key(invoice_date: Optional[date]) -> tuple:
+    return (invoice_date.year, invoice_date.month) if invoice_date else UNDATED
+
+def period_index(year: int, month: int) -> int:
+    """Months since year 0, so (year, month) ranges compare as plain integers."""
+    return year * 12 + month
+
+def _to_decimal(amount) -> Decimal:
+    if amount is None or amount == "":
+        return Decimal("0")
+    return Decimal(str(amount))
+
+async def apply_spend_delta(db: AsyncSession, invoice_date: Optional[date], amount, count_delta: int):
+    """
+    Adds `amount` and `count_delta` to the rollup row for the invoice's month, creating it if needed.
+    Runs in the caller's transaction so the rollup commits together with the invoice change.
+    """
+    year, month = month_key(invoice_date)
+    amount = _to_decimal(amount)
+    stmt = on_conflict_upsert(
+        db.get_bind().dialect.name, MonthlySpend,
+        {"year": year, "month": month, "total": amount, "invoice_count": count_delta},
+        [MonthlySpend.year, MonthlySpend.month],
+        lambda excluded: {
+            "total": MonthlySpend.total + excluded.total,
+            "invoice_count": MonthlySpend.invoice_count + excluded.invoice_count,
+        }
+    )
+    if stmt is not None:
+        await db.execute(stmt)
+        return
+
+    # Generic fallback for databases without ON CONFLICT
+    result = await db.execute(
+        update(MonthlySpend)
+        .where(MonthlySpend.year == year, MonthlySpend.month == month)
+        .values(total=MonthlySpend.total + amount, invoice_count=MonthlySpend.invoice_count + count_delta)
+    )
+    if result.rowcount == 0:
+        await db.execute(insert(MonthlySpend).values(year=year, month=month, total=amount, invoice_count=count_delta))
+
+async def record_invoice_change(db: AsyncSession, was_verified: bool, old_date, old_total, invoice: Invoice):
+    """
+    Moves an invoice's contribution in the rollup from its previous state to its current one.
+    Call after mutating `invoice` and before committing.
+    """
+    if was_verified:
+        await apply_spend_delta(db, old_date, -_to_decimal(old_total), -1)
+    if invoice.verified:
+        await apply_spend_delta(db, invoice.date, invoice.total, 1)
+
+def rebuild_monthly_spend(connection):
+    """Recomputes the whole rollup from the invoices table (sync connection, used by maintenance scripts)."""
+    year = func.coalesce(extract("year", Invoice.date), UNDATED[0])
+    month = func.coalesce(extract("month", Invoice.date), UNDATED[1])
+    rows = connection.execute(
+        select(year.label("year"), month.label("month"),
+               func.coalesce(func.sum(Invoice.total), 0).label("total"),
+               func.count(Invoice.id).label("invoice_count"))
+        .where(Invoice.verified == True)
+        .group_by(year, month)
+    ).all()
+
+    connection.execute(delete(MonthlySpend))
+    if rows:
+        connection.execute(insert(MonthlySpend), [
+            {"year": int(r.year), "month": int(r.month), "total": r.total, "invoice_count": r.invoice_count}
+            for r in rows
+        ])
+    return len(rows)
@@ -0,0 +1,208 @@
+import re
+import unicodedata
+from typing import Iterable
+from sqlalchemy import delete, insert, select, func, literal_column, text
+from core.database import on_conflict_upsert
+from models.invoice import Invoice, LineItem, SearchDocument
+
+# Full-text search over invoices. Text is tokenized here, the same way for indexing and for
+# queries, so the database only ever sees normalized, space-separated tokens: Postgres indexes
+# them with to_tsvector('simple') + GIN, SQLite with FTS5 (see SearchDocument).
+#
+# Normalization is aimed at the eng+ara OCR output: NFKC folds Arabic presentation forms
+# (common in PDF text layers) to base letters, diacritics and tatweel are dropped, alef/yeh/teh
+# marbuta variants are unified, Arabic-Indic digits become ASCII, and the definite article
+# prefix is stripped. English is only case-folded.
+
+ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]") # harakat, Quranic marks, tatweel
+ARABIC_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06f0 + d): str(d) for d in range(10)},
+})
+ARABIC_LETTER = re.compile("[\u0621-\u064a]")
+# Longest first; only stripped when at least three letters remain
+ARABIC_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+WORD = re.compile(r"\w+")
+# "INV-2024/001" is also indexed as "inv2024001", so numbers match with or without separators
+COMPOUND = re.compile(r"\w+(?:[-/.]\w+)+")
+MAX_TOKEN_LENGTH = 64
+
+def normalize(text_value: str) -> str:
+    text_value = unicodedata.normalize("NFKC", text_value).casefold()
+    return ARABIC_MARKS.sub("", text_value).translate(ARABIC_FOLD)
+
+def _stem(token: str) -> str:
+    if ARABIC_LETTER.match(token):
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 3:
+                return token[len(prefix):]
+    return token
+
+def tokenize(text_value: str) -> list:
+    """Normalized search tokens of `text_value`, in order (duplicates kept)."""
+    if not text_value:
+        return []
+    text_value = normalize(text_value)
+    tokens = [_stem(t) for t in WORD.findall(text_value) if len(t) > 1 or t.isdigit()]
+    tokens += [re.sub(r"[-/.]", "", c) for c in COMPOUND.findall(text_value)]
+    return [t[:MAX_TOKEN_LENGTH] for t in tokens]
+
+def query_terms(query: str) -> list:
+    """Distinct tokens of a search query, in order."""
+    return list(dict.fromkeys(tokenize(query)))
+
+def search_text(vendor: str, invoice_number: str, raw_content: str, descriptions: Iterable[str]) -> str:
+    parts = [vendor, invoice_number, raw_content, *descriptions]
+    return " ".join(token for part in parts if part for token in tokenize(part))
+
+# --- Indexing -----------------------------------------------------------------
+
+def index_row(invoice_id: int, values: dict, items: list) -> dict:
+    """The search_documents row for an invoice from persistence.invoice_values() and its extracted items."""
+    return {
+        "invoice_id": invoice_id,
+        "content": search_text(
+            values.get("vendor"), values.get("invoice_number"), values.get("raw_content"),
+            (item.get("description") for item in items)
+        ),
+    }
+
+def upsert_statements(dialect: str, rows: list) -> list:
+    """Statements that write `rows` into search_documents, replacing existing entries."""
+    stmt = on_conflict_upsert(
+        dialect, SearchDocument, rows, [SearchDocument.invoice_id],
+        lambda excluded: {"content": excluded.content, "updated_at": func.now()}
+    )
+    if stmt is not None:
+        return [stmt]
+
+    # Generic fallback for databases without ON CONFLICT
+    invoice_ids = [row["invoice_id"] for row in rows]
+    return [
+        delete(SearchDocument).where(SearchDocument.invoice_id.in_(invoice_ids)),
+        insert(SearchDocument).values(rows),
+    ]
+
+def index_invoices(db, rows: list):
+    """Upserts search rows in the caller's (sync) transaction."""
+    if rows:
+        for stmt in upsert_statements(db.get_bind().dialect.name, rows):
+            db.execute(stmt)
+
+def stored_rows_query(dialect: str, invoice_ids: list):
+    """Invoices plus their line-item text, for rebuilding search rows from the database."""
+    concat = func.string_agg if dialect == "postgresql" else func.group_concat
+    descriptions = (
+        select(LineItem.invoice_id, concat(LineItem.description, " ").label("descriptions"))
+        .group_by(LineItem.invoice_id).subquery()
+    )
+    return select(
+        Invoice.id, Invoice.vendor, Invoice.invoice_number, Invoice.raw_content, descriptions.c.descriptions
+    ).outerjoin(descriptions, descriptions.c.invoice_id == Invoice.id).where(Invoice.id.in_(invoice_ids))
+
+def stored_rows(result_rows) -> list:
+    return [
+        {"invoice_id": row.id, "content": search_text(row.vendor, row.invoice_number, row.raw_content, [row.descriptions])}
+        for row in result_rows
+    ]
+
+async def reindex_invoices(db, invoice_ids: list):
+    """Rebuilds the search rows of already stored invoices (async session, e.g. after a review edit)."""
+    dialect = db.get_bind().dialect.name
+    rows = stored_rows((await db.execute(stored_rows_query(dialect, invoice_ids))).all())
+    if rows:
+        for stmt in upsert_statements(dialect, rows):
+            await db.execute(stmt)
+
+# --- Queries ------------------------------------------------------------------
+
+def tsquery_text(terms: list) -> str:
+    """to_tsquery('simple') input: all terms required, the last one as a prefix for type-ahead."""
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+def fts5_query_text(terms: list) -> str:
+    """FTS5 MATCH input with the same semantics as tsquery_text."""
+    return " AND ".join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+def ranked_ids_query(dialect: str, terms: list, limit: int, offset: int, max_candidates: int):
+    """
+    Statement returning (invoice_id, score) for the terms, best first. Only the first
+    `max_candidates` matches are ranked (GIN order on Postgres, newest first on SQLite), which
+    bounds the cost of very common terms.
+    """
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery("simple", tsquery_text(terms))
+        tsv = literal_column("search_documents.tsv")
+        candidates = (
+            select(SearchDocument.invoice_id, tsv.label("tsv"))
+            .where(tsv.op("@@")(tsquery)).limit(max_candidates).subquery()
+        )
+        score = func.ts_rank_cd(candidates.c.tsv, tsquery)
+        return (
+            select(candidates.c.invoice_id, score.label("score"))
+            .order_by(score.desc(), candidates.c.invoice_id.desc())
+            .limit(limit).offset(offset)
+        )
+    if dialect == "sqlite":
+        # FTS5 yields matches in rowid order, so the candidates are the newest invoices.
+        # bm25() is lower-is-better.
+        return text(
+            "SELECT invoice_id, score FROM ("
+            "SELECT rowid AS invoice_id, -bm25(search_fts) AS score FROM search_fts "
+            "WHERE search_fts MATCH :match ORDER BY rowid DESC LIMIT :max_candidates"
+            ") ORDER BY score DESC, invoice_id DESC LIMIT :limit OFFSET :offset"
+        ).bindparams(match=fts5_query_text(terms), max_candidates=max_candidates, limit=limit, offset=offset)
+
+    # Generic fallback: every term as a substring, newest first
+    query = select(SearchDocument.invoice_id, literal_column("0").label("score"))
+    for term in terms:
+        query = query.where(SearchDocument.content.contains(term))
+    return query.order_by(SearchDocument.invoice_id.desc()).limit(limit).offset(offset)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+async def corrected_terms(db, terms: list) -> list:
+    """
+    SQLite only: each term replaced by the most common indexed term within one edit (two for
+    terms of 8+ characters) that shares its first letter. Terms without a close match are kept.
+    """
+    corrected = []
+    for term in terms:
+        limit = 2 if len(term) >= 8 else 1
+        candidates = (await db.execute(
+            text(
+                "SELECT term, doc FROM search_vocab WHERE term >= :low AND term < :high "
+                "AND length(term) BETWEEN :shortest AND :longest"
+            ).bindparams(low=term[0], high=chr(ord(term[0]) + 1), shortest=len(term) - limit, longest=len(term) + limit)
+        )).all()
+        matches = [(doc, t) for t, doc in candidates if edit_distance(term, t, limit) <= limit]
+        corrected.append(max(matches)[1] if matches else term)
+    return corrected
+
+def fuzzy_vendor_query(dialect: str, query: str, limit: int):
+    """Typo-tolerant vendor match for when full-text finds nothing: pg_trgm similarity on Postgres."""
+    if dialect == "postgresql":
+        score = func.similarity(Invoice.vendor, query)
+        # `%` is the trigram operator the vendor GIN index serves
+        return (
+            select(Invoice.id.label("invoice_id"), score.label("score"))
+            .where(Invoice.vendor.op("%")(query)).order_by(score.desc()).limit(limit)
+        )
+    return (
+        select(Invoice.id.label("invoice_id"), literal_column("0").label("score"))
+        .where(Invoice.vendor.ilike(f"%{query}%")).order_by(Invoice.id.desc()).limit(limit)
+    )
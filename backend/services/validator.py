@@ -0,0 +1,175 @@
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+# Bump when the rules change, so cached review verdicts are recomputed
+RULES_VERSION = "1"
+
+# Absolute tolerance for money comparisons, to absorb rounding on printed invoices
+AMOUNT_TOLERANCE = Decimal("0.05")
+
+GENERIC_VENDOR_NAMES = {
+    "customer", "client", "vendor", "supplier", "seller", "buyer", "company", "merchant",
+    "store", "shop", "unknown", "n/a", "na", "none", "null", "test", "invoice", "receipt",
+    "عميل", "العميل", "مورد", "المورد", "شركة", "غير معروف", "بائع",
+}
+
+# Checks whose "unknown" result makes a document ambiguous (and sends it to the LLM reviewer)
+CRITICAL_CHECKS = {"total_present", "date_not_future", "vendor_not_generic"}
+
+# ISO 4217 active currency codes
+ISO_4217_CODES = frozenset("""
+AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL BSD BTN BWP BYN BZD
+CAD CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD
+GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT
+LAK LBP LKR LRD LSL LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR
+NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SOS SRD SSP
+STN SVC SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH UGX USD UYU UZS VES VND VUV WST XAF XCD XOF
+XPF YER ZAR ZMW ZWL
+""".split())
+
+def _amount(value):
+    """Parses a money value from the extractor output; returns None when missing, unparseable or not finite."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+        if not value:
+            return None
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    # "NaN" and "Infinity" parse, but can't be compared or summed
+    return amount if amount.is_finite() else None
+
+def _text(value) -> str:
+    """A scalar field as stripped text; "" for missing values and for lists or objects."""
+    if value is None or isinstance(value, (bool, dict, list)):
+        return ""
+    return str(value).strip()
+
+def _section(data: dict, name: str) -> dict:
+    """A nested object of the extractor output, or {} when it's missing or not an object."""
+    value = data.get(name)
+    return value if isinstance(value, dict) else {}
+
+def _close(a: Decimal, b: Decimal) -> bool:
+    return abs(a - b) <= AMOUNT_TOLERANCE
+
+def validate_invoice_rules(invoice_json: dict, today: date = None) -> dict:
+    """
+    Runs the deterministic audit checks locally.
+
+    Returns {"status": "valid" | "invalid" | "ambiguous", "reasons": [...], "checks": [...], "source": "rules"}.
+    Each check is {"name", "result": "pass" | "fail" | "unknown", "detail"}. "ambiguous" means nothing
+    failed but a key field was missing or unreadable, so the rules alone can't vouch for the document.
+    """
+    today = today or date.today()
+    # LLM output can have any shape; a malformed field makes its check "unknown", never an error
+    invoice_json = invoice_json if isinstance(invoice_json, dict) else {}
+    vendor_info = _section(invoice_json, "vendor_info")
+    invoice_details = _section(invoice_json, "invoice_details")
+    financials = _section(invoice_json, "financials")
+    items = invoice_json.get("items")
+    items = items if isinstance(items, list) else []
+
+    checks = []
+
+    def check(name, result, detail=""):
+        checks.append({"name": name, "result": result, "detail": detail})
+
+    subtotal = _amount(financials.get("subtotal"))
+    tax = _amount(financials.get("tax_amount"))
+    total = _amount(financials.get("total_amount"))
+
+    # 1. Total present and sane
+    if total is None:
+        check("total_present", "unknown", "total_amount is missing or not a number")
+    elif total < 0:
+        check("total_present", "fail", f"total_amount is negative ({total})")
+    else:
+        check("total_present", "pass")
+
+    # 2. subtotal + tax == total
+    if subtotal is not None and tax is not None and total is not None:
+        if _close(subtotal + tax, total):
+            check("subtotal_plus_tax", "pass")
+        else:
+            check("subtotal_plus_tax", "fail", f"subtotal {subtotal} + tax {tax} != total {total}")
+
+    # 3. Date not in the future
+    date_str = _text(invoice_details.get("date"))
+    if not date_str:
+        check("date_not_future", "unknown", "invoice date is missing")
+    else:
+        try:
+            invoice_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            if invoice_date > today:
+                check("date_not_future", "fail", f"invoice date {invoice_date} is in the future")
+            else:
+                check("date_not_future", "pass")
+        except ValueError:
+            check("date_not_future", "unknown", f"invoice date {date_str!r} is not YYYY-MM-DD")
+
+    # 4. Vendor name is specific
+    vendor_name = _text(vendor_info.get("name"))
+    if not vendor_name:
+        check("vendor_not_generic", "unknown", "vendor name is missing")
+    elif vendor_name.lower() in GENERIC_VENDOR_NAMES:
+        check("vendor_not_generic", "fail", f"vendor name {vendor_name!r} is a generic term")
+    else:
+        check("vendor_not_generic", "pass")
+
+    # 5. Currency is a real ISO 4217 code
+    currency = _text(financials.get("currency"))
+    if not currency:
+        check("currency_code", "unknown", "currency is missing")
+    elif currency.upper() not in ISO_4217_CODES:
+        check("currency_code", "fail", f"currency {currency!r} is not an ISO 4217 code")
+    else:
+        check("currency_code", "pass")
+
+    # 6. quantity * unit_price (- discount) == line amount
+    line_totals = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        quantity = _amount(item.get("quantity"))
+        unit_price = _amount(item.get("unit_price"))
+        line_total = _amount(item.get("total_price"))
+        discount = _amount(item.get("discount")) or Decimal("0")
+        if line_total is not None:
+            line_totals.append(line_total)
+        if quantity is None or unit_price is None or line_total is None:
+            continue
+        expected = quantity * unit_price - discount
+        if not _close(expected, line_total):
+            check("line_item_amount", "fail",
+                  f"item {index + 1}: {quantity} x {unit_price} - {discount} != {line_total}")
+    if line_totals and not any(c["name"] == "line_item_amount" for c in checks):
+        check("line_item_amount", "pass")
+
+    # 7. Line items add up to the subtotal (or to the total when there is no subtotal)
+    targets = [t for t in (subtotal, total) if t is not None]
+    if line_totals and targets:
+        items_sum = sum(line_totals, Decimal("0"))
+        if any(_close(items_sum, t) for t in targets):
+            check("line_items_sum", "pass")
+        else:
+            check("line_items_sum", "fail", f"line items sum to {items_sum}, expected {targets[0]}")
+
+    failed = [c for c in checks if c["result"] == "fail"]
+    unknown = [c for c in checks if c["result"] == "unknown"]
+    if failed:
+        status = "invalid"
+    elif any(c["name"] in CRITICAL_CHECKS for c in unknown):
+        status = "ambiguous"
+    else:
+        status = "valid"
+
+    return {
+        "status": status,
+        "reasons": [c["detail"] for c in failed + unknown],
+        "checks": checks,
+        "source": "rules",
+    }
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from core.config import settings
+from core.database import SessionLocal
+from services import persistence
+from services.metrics import STAGE_SECONDS, record_fallback
+
+logger = logging.getLogger(__name__)
+
+# Optional write-behind for finished documents (DB_WRITE_BEHIND). Tasks in one worker process hand
+# their results to a single writer thread, which commits them in micro-batches: one transaction and
+# a handful of statements per batch instead of per document. It pays off on thread-pool workers
+# (the LLM queue), where many tasks finish at once; a solo/prefork process only has one at a time.
+#
+# Delivery is at-least-once: a task waits for its batch to commit before returning, so with
+# task_acks_late its message is only acknowledged once the result is in the database, and a
+# redelivery after a crash just rewrites the same rows (persistence is idempotent on document_id).
+# A task that gives up waiting (DB_WRITE_TIMEOUT_SECONDS) cancels its queued result, so a document
+# can't be marked FAILED by the task and COMPLETED by a late write.
+
+class WriteBehindSink:
+    """
+    Queues (invoice_values, items) results and flushes them once DB_WRITE_BATCH_SIZE are waiting
+    or DB_WRITE_FLUSH_MS after the first arrived. A failed batch is retried one document at a
+    time, so a single bad row only fails its own task.
+    """
+    def __init__(self, max_batch: int, window_seconds: float):
+        self.max_batch = max(1, max_batch)
+        self.window_seconds = window_seconds
+        self._pending = [] # (values, items, future)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._collect, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, values: dict, items: list) -> Future:
+        """Queues a document's result. The future resolves to its invoice id once committed."""
+        future = Future()
+        with self._cond:
+            self._pending.append((values, items, future))
+            self._cond.notify()
+        return future
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window_seconds
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            # Claim the results; those whose task already timed out were cancelled and are dropped
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # Keep the writer alive for the next batch; this one's tasks get the error
+                logger.error(f"Write-behind flush of {len(batch)} failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush(self, batch: list):
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                invoice_ids = persistence.save_invoices(db, [(values, items) for values, items, _ in batch])
+            except Exception as e:
+                db.rollback()
+                if len(batch) == 1:
+                    batch[0][2].set_exception(e)
+                    return
+                logger.error(f"Write-behind batch of {len(batch)} failed, retrying one by one: {e}")
+                record_fallback("write_behind_single")
+                for values, items, future in batch:
+                    try:
+                        future.set_result(persistence.save_invoice(db, values, items))
+                    except Exception as single_e:
+                        db.rollback()
+                        future.set_exception(single_e)
+                return
+            for values, _, future in batch:
+                future.set_result(invoice_ids[values["document_id"]])
+        finally:
+            db.close()
+            STAGE_SECONDS.labels("write_behind_flush").observe(time.perf_counter() - start)
+
+_sink = None
+_sink_lock = threading.Lock()
+
+def get_sink() -> WriteBehindSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = WriteBehindSink(settings.DB_WRITE_BATCH_SIZE, settings.DB_WRITE_FLUSH_MS / 1000.0)
+        return _sink
+
+def save_invoice(db, values: dict, items: list) -> int:
+    """
+    Pipeline entry point: persistence.save_invoice, through the write-behind sink when DB_WRITE_BEHIND
+    is on. Blocks until the result is committed either way. Raises like save_invoice on failure, or
+    TimeoutError if the result was still queued after DB_WRITE_TIMEOUT_SECONDS (it is then never written).
+    """
+    if not settings.DB_WRITE_BEHIND:
+        return persistence.save_invoice(db, values, items)
+    future = get_sink().submit(values, items)
+    try:
+        return future.result(timeout=settings.DB_WRITE_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise
+        # The writer already took it: its outcome is the task's, however late
+        return future.result()
@@ -1,158 +1,299 @@
 from celery_app import celery_app
-from services.pdf_reader import extract_text_from_pdf
-from services.ai_extractor import extract_invoice_data_ai
+from services.pdf_reader import extract_pdf_pages, format_pages
+from services.ai_extractor import extract_invoice_data, summarize_document
+from services.cache import get_cache, file_sha256
+from services.image_preprocess import preprocess_variant
+from services import dedup, llm_client, persistence, write_behind
+from services.results import stored_payload
+from services.doc_classifier import classify
+from services.metrics import DOC_TYPES, DUPLICATES, StageSpans, TASKS, record_fallback, record_queue_wait
+from services.events import TaskEvents
+from core.config import settings
 from core.database import SessionLocal
-from models.invoice import Document, Invoice, LineItem
-from models.task_status import ProcessingStatus
 from sqlalchemy.orm import Session
-from datetime import datetime
 import logging
 import traceback
+import time
 import os
 
 logger = logging.getLogger(__name__)
 
+def _run_ocr(file_path: str, document_id: int, cache, content_hash: str, spans: StageSpans):
+    """CPU-bound stage: returns (raw_text, page_methods), going through the OCR cache."""
+    # Every setting that changes the text: page cap, text-layer threshold, OCR backend and preprocessing
+    ocr_variant = (
+        f"pages={settings.OCR_MAX_PAGES}", f"text_min={settings.PDF_TEXT_MIN_CHARS}",
+        f"engine={settings.OCR_ENGINE}", preprocess_variant()
+    )
+    cached_ocr = cache.get("ocr", content_hash, *ocr_variant) if cache else None
+    if cached_ocr:
+        return cached_ocr["raw_text"], cached_ocr["page_methods"]
+
+    ext = os.path.splitext(file_path)[1].lower()
+    page_methods = []
+    if ext == '.pdf':
+        with spans.span("text_extraction"):
+            pages = extract_pdf_pages(file_path)
+        # Per-page spans; with parallel OCR they add up to more than the wall time above
+        for page in pages:
+            if page["method"] == "ocr":
+                spans.record("render", page.get("render_seconds", 0.0))
+                spans.record("ocr_page", page.get("ocr_seconds", 0.0))
+        page_methods = [{"page": p["page"], "method": p["method"]} for p in pages]
+        logger.info(f"Page extraction methods for Doc ID {document_id}: {page_methods}")
+        raw_text = format_pages(pages)
+    else:
+        from services.ocr import extract_text_from_image
+        with spans.span("ocr_page"):
+            raw_text = extract_text_from_image(file_path)
+
+    if cache and raw_text:
+        cache.set("ocr", content_hash, {"raw_text": raw_text, "page_methods": page_methods}, *ocr_variant)
+    return raw_text, page_methods
+
+def _find_duplicate(db: Session, document_id: int, raw_text: str, spans: StageSpans) -> dict:
+    """Fingerprints the OCR text; returns the document's duplicate_of/duplicate_score values. Doesn't commit."""
+    duplicate = None
+    if settings.DEDUP_ENABLED:
+        try:
+            with spans.span("fingerprint"):
+                duplicate = dedup.find_duplicate(db, document_id, raw_text)
+        except Exception as e:
+            # Deduplication is an optimisation; never fail the document over it
+            logger.error(f"Duplicate check failed for Doc ID {document_id}: {e}")
+            record_fallback("dedup_error")
+            db.rollback()
+    if duplicate:
+        logger.info(f"Doc ID {document_id} is a near-duplicate of Doc ID {duplicate[0]} (score {duplicate[1]})")
+        return {"duplicate_of": duplicate[0], "duplicate_score": duplicate[1]}
+    return {"duplicate_of": None, "duplicate_score": None}
+
+def _general_document(raw_text: str, confidence: float, extract_variant: tuple, content_hash: str,
+                      spans: StageSpans, events: TaskEvents) -> tuple:
+    """Summary (or nothing, with GENERAL_DOCUMENT_ACTION=reject) instead of extraction and review."""
+    reason = f"Classified as a general document (confidence {confidence:.2f}); no invoice fields extracted."
+    if settings.GENERAL_DOCUMENT_ACTION == "reject":
+        return {"items": []}, {"status": "rejected", "reasons": [reason], "checks": [], "source": "classifier"}
+
+    cache = get_cache()
+    extracted_data = cache.get("extract", content_hash, *extract_variant) if cache and content_hash else None
+    if extracted_data is None:
+        events.stage("summarize")
+        with spans.span("summarize"):
+            extracted_data = summarize_document(raw_text)
+        if cache and content_hash and extracted_data.get("summary"):
+            cache.set("extract", content_hash, extracted_data, *extract_variant)
+    return extracted_data, {"status": "not_applicable", "reasons": [reason], "checks": [], "source": "classifier"}
+
+def _extract_and_review(raw_text: str, content_hash: str, spans: StageSpans, events: TaskEvents) -> tuple:
+    """
+    Classification, then LLM extraction and review through the extraction cache.
+    Returns (doc_type, confidence, extracted_data, validation_result).
+    """
+    cache = get_cache()
+
+    # 3. AI Analysis, with the prompt picked by the local classifier
+    from services.prompt_loader import get_prompt_manager
+    from services.ai_extractor import MODEL_NAME as EXTRACTOR_MODEL
+    manager = get_prompt_manager()
+    with spans.span("classify"):
+        doc_type, confidence, source = classify(raw_text)
+    if doc_type == "general_document" and confidence < settings.DOC_CLASSIFIER_MIN_CONFIDENCE:
+        # Not sure enough to skip extraction; the invoice prompt is the safe default
+        doc_type, route = "invoice", "low_confidence"
+    elif doc_type == "general_document":
+        route = "reject" if settings.GENERAL_DOCUMENT_ACTION == "reject" else "summary"
+    else:
+        route = "extract"
+    DOC_TYPES.labels(doc_type, source, route).inc()
+
+    extract_variant = (manager.prompt_version(doc_type), llm_client.model_tag(EXTRACTOR_MODEL))
+    if doc_type == "general_document":
+        return (doc_type, confidence, *_general_document(raw_text, confidence, extract_variant, content_hash, spans, events))
+
+    extracted_data = cache.get("extract", content_hash, *extract_variant) if cache and content_hash else None
+    if extracted_data is None:
+        events.stage("extract")
+        with spans.span("extract"):
+            extracted_data = extract_invoice_data(raw_text, doc_type)
+        if cache and content_hash and extracted_data:
+            cache.set("extract", content_hash, extracted_data, *extract_variant)
+
+    # 4. AI Validation (Auditor Role)
+    from services.ai_reviewer import validate_invoice_data, MODEL_NAME as REVIEWER_MODEL, PROMPT_VERSION as REVIEWER_PROMPT_VERSION
+    # The verdict depends on the extraction it reviewed, so its key includes the extract variant too
+    review_variant = (*extract_variant, REVIEWER_PROMPT_VERSION, llm_client.model_tag(REVIEWER_MODEL))
+    validation_result = cache.get("review", content_hash, *review_variant) if cache and content_hash else None
+    if validation_result is None:
+        events.stage("review")
+        with spans.span("review"):
+            validation_result = validate_invoice_data(extracted_data)
+        # Don't pin a verdict the LLM couldn't confirm
+        if cache and content_hash and "llm_error" not in validation_result:
+            cache.set("review", content_hash, validation_result, *review_variant)
+
+    return doc_type, confidence, extracted_data, validation_result
+
+def _analyse_and_save(db: Session, file_path: str, document_id: int, raw_text: str, page_methods: list,
+                      content_hash: str, spans: StageSpans, events: TaskEvents, duplicate_of: int = None):
+    """
+    I/O-bound stage: LLM extraction and review, then persistence. Returns the task result:
+    services.results.invoice_payload of the saved document.
+    """
+    # A near-duplicate of a finished document reuses its (possibly reviewer-corrected) fields
+    reused, confidence = None, None
+    if duplicate_of and settings.DEDUP_SKIP_EXTRACTION:
+        with spans.span("dedup_reuse"):
+            reused = dedup.stored_extraction(db, duplicate_of)
+        # Don't hold a read transaction open while the writer commits
+        db.commit()
+    if reused:
+        DUPLICATES.labels("text", "reused").inc()
+        doc_type, extracted_data, validation_result = reused
+    else:
+        doc_type, confidence, extracted_data, validation_result = _extract_and_review(raw_text, content_hash, spans, events)
+        if duplicate_of:
+            DUPLICATES.labels("text", "linked").inc()
+        elif settings.DEDUP_ENABLED:
+            try:
+                duplicate_of = dedup.find_field_duplicate(db, document_id, extracted_data)
+                if duplicate_of:
+                    DUPLICATES.labels("fields", "linked").inc()
+                    persistence.mark_document(db, document_id, duplicate_of=duplicate_of)
+                db.commit()
+            except Exception as e:
+                # Like the fingerprint check: never fail the document over it
+                logger.error(f"Field duplicate check failed for Doc ID {document_id}: {e}")
+                record_fallback("dedup_error")
+                db.rollback()
+                duplicate_of = None
+
+    # 5. Save to DB: invoice, line items and COMPLETED status in one transaction,
+    # possibly shared with other documents through the write-behind sink
+    events.stage("persist")
+    with spans.span("persist"):
+        write_behind.save_invoice(
+            db,
+            persistence.invoice_values(document_id, file_path, doc_type, raw_text, extracted_data, validation_result),
+            extracted_data.get("items", [])
+        )
+
+    # The same payload /result serves, plus how this run went
+    result = stored_payload(db, document_id)
+    result['doc_type_confidence'] = round(confidence, 4) if confidence is not None else None
+    result['page_methods'] = page_methods
+    result['stage_timings_ms'] = spans.as_ms()
+    return result
+
+def _handle_failure(db: Session, e: Exception, file_path: str, document_id: int, raw_text: str):
+    """Rolls back, keeps whatever raw text we have as a fallback invoice and marks the document FAILED."""
+    logger.error(f"Error processing invoice: {str(e)}")
+    logger.error(traceback.format_exc())
+
+    try:
+        if persistence.save_failure(db, document_id, file_path, raw_text, str(e)):
+            record_fallback("error_fallback_invoice")
+            logger.info("Saved fallback raw content for failed document.")
+    except Exception as inner_e:
+        logger.error(f"Failed to update document status to FAILED: {inner_e}")
+
 @celery_app.task(name="process_invoice_task", bind=True)
-def process_invoice_task(self, file_path: str, document_id: int):
+def process_invoice_task(self, file_path: str, document_id: int, enqueued_at: float = None):
     """
     Celery task to process an uploaded invoice file.
+
+    Runs the CPU-bound OCR stage. With PIPELINE_SPLIT_STAGES it then replaces itself with
+    extract_invoice_task on the LLM queue, which keeps the same task id, so /result polling is unchanged.
+    `enqueued_at` is the producer's time.time(), used to measure queue wait.
     """
+    task_start = time.perf_counter()
+    spans = StageSpans()
+    record_queue_wait(spans, "queue_wait", enqueued_at)
+    events = TaskEvents(self.request.id, document_id)
     db: Session = SessionLocal()
-    doc = None
+    raw_text = None
     try:
         logger.info(f"Processing invoice file: {file_path} (Doc ID: {document_id})")
-        
+
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
         # 1. Update status to PROCESSING
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if doc:
-            doc.status = ProcessingStatus.PROCESSING
-            db.commit()
+        events.batch_id = persistence.start_document(db, document_id, self.request.id)
+        events.stage("ocr")
+
+        # Duplicate uploads short-circuit each stage through the content-hash cache
+        cache = get_cache()
+        with spans.span("file_read"):
+            content_hash = file_sha256(file_path) if cache else None
 
         # 2. Extract Text
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == '.pdf':
-            raw_text = extract_text_from_pdf(file_path)
-        else:
-            from services.ocr import extract_text_from_image
-            raw_text = extract_text_from_image(file_path)
-        
+        raw_text, page_methods = _run_ocr(file_path, document_id, cache, content_hash, spans)
         if not raw_text:
             logger.warning("No text extracted.")
             raw_text = ""
+        # Near-duplicate check, before any LLM spend
+        duplicate = _find_duplicate(db, document_id, raw_text, spans)
+        persistence.mark_document(db, document_id, ocr_completed_at=persistence.now(), **duplicate)
+        db.commit()
 
-        # 3. AI Analysis
-        from services.prompt_loader import PromptManager
-        manager = PromptManager()
-        doc_type = manager.determine_doc_type(raw_text)
-        
-        extracted_data = extract_invoice_data_ai(raw_text)
-        
-        # 4. AI Validation (Auditor Role)
-        from services.ai_reviewer import validate_invoice_data
-        validation_result = validate_invoice_data(extracted_data)
-        
-        # 5. Save to DB
-        vendor_info = extracted_data.get("vendor_info", {})
-        invoice_details = extracted_data.get("invoice_details", {})
-        financials = extracted_data.get("financials", {})
-        items = extracted_data.get("items", [])
-
-        invoice_date = None
-        date_str = invoice_details.get("date")
-        if date_str:
-            try:
-                invoice_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except (ValueError, TypeError):
-                logger.warning(f"Could not parse date string: {date_str}")
-        
-        # Create Invoice record
-        new_invoice = Invoice(
-            document_id=document_id,
-            invoice_number=invoice_details.get("number"),
-            date=invoice_date,
-            vendor=vendor_info.get("name"),
-            total=financials.get("total_amount"),
-            tax=financials.get("tax_amount"),
-            currency=financials.get("currency"),
-            file_path=file_path,
-            doc_type=doc_type,
-            summary=extracted_data.get("summary"),
-            raw_content=raw_text
-        )
-        
-        db.add(new_invoice)
-        db.flush() # Get invoice ID for line items
-
-        # Create LineItem records
-        for item in items:
-            line_item = LineItem(
-                invoice_id=new_invoice.id,
-                description=item.get("description"),
-                quantity=item.get("quantity"),
-                unit_price=item.get("unit_price"),
-                total_price=item.get("total_price"),
-                discount=item.get("discount")
+        if not (settings.PIPELINE_SPLIT_STAGES and self.request.id and not self.request.is_eager):
+            result = _analyse_and_save(
+                db, file_path, document_id, raw_text, page_methods, content_hash, spans, events, duplicate["duplicate_of"]
             )
-            db.add(line_item)
-        
-        # 6. Update Document status to COMPLETED
-        if doc:
-            doc.status = ProcessingStatus.COMPLETED
-        
-        db.commit()
-        
-        # Add IDs and validation result to the result so frontend can use them
-        extracted_data['document_id'] = document_id
-        extracted_data['invoice_id'] = new_invoice.id
-        extracted_data['validation_result'] = validation_result
-        
-        return extracted_data
+            spans.record("total", time.perf_counter() - task_start)
+            result['stage_timings_ms'] = spans.as_ms()
+            TASKS.labels("process_invoice_task", "success").inc()
+            events.completed(result)
+            return result
 
     except Exception as e:
-        logger.error(f"Error processing invoice: {str(e)}")
-        logger.error(traceback.format_exc())
-        
-        # Rollback the transaction to avoid PendingRollbackError
-        db.rollback()
-        
-        # fallback: Save raw text if available so we don't lose data
-        # We need a new transaction
-        try:
-            if 'raw_text' in locals() and raw_text and document_id:
-                 # Check if invoice already exists to avoid unique constraint error?
-                 # Actually, if we rolled back, the invoice insert is gone.
-                 # So we can insert a partial invoice with raw_content.
-                 db_fallback = SessionLocal()
-                 try:
-                     fallback_invoice = Invoice(
-                         document_id=document_id,
-                         file_path=file_path,
-                         raw_content=raw_text,
-                         doc_type="error_fallback"
-                     )
-                     db_fallback.add(fallback_invoice)
-                     db_fallback.commit()
-                     logger.info("Saved fallback raw content for failed document.")
-                 except Exception as fallback_e:
-                     logger.error(f"Failed to save fallback raw content: {fallback_e}")
-                 finally:
-                     db_fallback.close()
-
-        except Exception as outer_e:
-             logger.error(f"Error in fallback logic: {outer_e}")
-
-        # Update Document status to FAILED
-        try:
-            doc = db.query(Document).filter(Document.id == document_id).first()
-            if doc:
-                doc.status = ProcessingStatus.FAILED
-                db.commit()
-        except Exception as inner_e:
-            logger.error(f"Failed to update document status to FAILED: {inner_e}")
-            
+        TASKS.labels("process_invoice_task", "failure").inc()
+        _handle_failure(db, e, file_path, document_id, raw_text)
+        events.failed(str(e))
+        raise e
+    finally:
+        db.close()
+
+    spans.record("ocr_stage_total", time.perf_counter() - task_start)
+    TASKS.labels("process_invoice_task", "handed_off").inc()
+    # Outside the try: replace() raises Ignore to hand the task id over, which must not count as a failure
+    raise self.replace(
+        extract_invoice_task.s(
+            file_path, document_id, raw_text, page_methods, content_hash,
+            timings=spans.seconds, enqueued_at=time.time(), batch_id=events.batch_id,
+            duplicate_of=duplicate["duplicate_of"],
+        ).set(queue=settings.LLM_QUEUE)
+    )
+
+@celery_app.task(name="extract_invoice_task", bind=True)
+def extract_invoice_task(self, file_path: str, document_id: int, raw_text: str, page_methods: list,
+                         content_hash: str = None, timings: dict = None, enqueued_at: float = None,
+                         batch_id: str = None, duplicate_of: int = None):
+    """
+    LLM stage of the pipeline: extraction, review and persistence for already-OCR'd text.
+    Meant for a thread-pool worker on LLM_QUEUE, where many of these wait on the API at once.
+    `timings` carries the OCR stage's spans so the result reports the whole pipeline.
+    """
+    task_start = time.perf_counter()
+    # The OCR stage's spans were already observed by its own worker
+    spans = StageSpans(timings)
+    record_queue_wait(spans, "llm_queue_wait", enqueued_at)
+    events = TaskEvents(self.request.id, document_id, batch_id)
+    db: Session = SessionLocal()
+    try:
+        result = _analyse_and_save(
+            db, file_path, document_id, raw_text, page_methods, content_hash, spans, events, duplicate_of
+        )
+        spans.record("llm_stage_total", time.perf_counter() - task_start)
+        result['stage_timings_ms'] = spans.as_ms()
+        TASKS.labels("extract_invoice_task", "success").inc()
+        events.completed(result)
+        return result
+    except Exception as e:
+        TASKS.labels("extract_invoice_task", "failure").inc()
+        _handle_failure(db, e, file_path, document_id, raw_text)
+        events.failed(str(e))
         raise e
     finally:
         db.close()
@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock
+from services.dedup import find_field_duplicate, identifiers, numbers, numbers_match
+
+INVOICE = """Acme Trading
+Invoice INV-10231
+Date 2024-03-01
+Printer paper 4 x 25.00
+Toner 2 x 310.50
+Total 721.00 SAR"""
+
+def test_identifiers_keep_dates_and_references():
+    assert identifiers(INVOICE) == {"inv10231", "20240301"}
+
+def test_identifiers_skip_amounts_and_short_numbers():
+    assert identifiers("Total 1,250.00 qty 12 x 310.50") == set()
+
+def test_identifiers_ignore_separators():
+    assert identifiers("INV/10231 01.03.2024") == identifiers("inv-10231 01-03-2024")
+
+def test_same_template_same_month_is_not_a_match():
+    other = INVOICE.replace("INV-10231", "INV-10388").replace("2024-03-01", "2024-03-15")
+    assert identifiers(other) != identifiers(INVOICE)
+
+def test_rescan_keeps_identifiers():
+    rescan = INVOICE.replace("Printer paper", "Pr1nter paper").replace("Toner", "T0ner")
+    assert identifiers(rescan) == identifiers(INVOICE)
+
+def test_numbers_match_identical():
+    assert numbers_match(numbers(INVOICE), numbers(INVOICE))
+
+def test_numbers_match_empty():
+    assert numbers_match(set(), set())
+
+def test_numbers_match_allows_one_misread():
+    original = {"10231", "20240301", "2500", "31050", "72100"}
+    assert numbers_match({"10231", "20240301", "2500", "31850", "72100"}, original)
+
+def test_numbers_match_rejects_two_misreads_in_a_short_text():
+    original = {"10231", "20240301", "2500", "31050", "72100"}
+    assert not numbers_match({"10231", "20240301", "2900", "31850", "72100"}, original)
+
+def test_numbers_match_needs_half_in_common():
+    assert not numbers_match({"10231"}, {"10231", "2500", "31050", "72100"})
+
+def test_field_duplicate_accepts_numeric_and_malformed_fields():
+    db = MagicMock()
+    db.execute.return_value.all.return_value = [(7, 10231)]
+    extracted = {"vendor_info": {"name": 10231}, "invoice_details": {"number": 10231}, "financials": {"total_amount": 99}}
+    assert find_field_duplicate(db, 1, extracted) == 7
+    assert find_field_duplicate(db, 1, {"invoice_details": [10231], "financials": "99"}) is None
+    assert find_field_duplicate(db, 1, {"invoice_details": {"number": "1"}, "financials": {"total_amount": "NaN"}}) is None
@@ -0,0 +1,48 @@
+from services.search import MAX_TOKEN_LENGTH, query_terms, search_text, tokenize
+
+def test_tokenize_empty():
+    assert tokenize("") == []
+    assert tokenize(None) == []
+
+def test_tokenize_case_folds_english():
+    assert tokenize("ACME Toner") == ["acme", "toner"]
+
+def test_tokenize_indexes_compound_numbers_without_separators():
+    assert tokenize("Invoice INV-2024/001") == ["invoice", "inv", "2024", "001", "inv2024001"]
+
+def test_tokenize_drops_single_letters_but_keeps_digits():
+    assert tokenize("a b 7") == ["7"]
+
+def test_tokenize_strips_arabic_diacritics_and_tatweel():
+    assert tokenize("فاتورةٌ") == tokenize("فاتورة")
+    assert tokenize("ـمجموع") == ["مجموع"]
+
+def test_tokenize_folds_arabic_presentation_forms():
+    assert tokenize("ﻓﺎﺗﻮﺭﺓ") == tokenize("فاتورة")
+
+def test_tokenize_unifies_alef_yeh_and_teh_marbuta():
+    assert tokenize("إيصال أحمد") == ["ايصال", "احمد"]
+    assert tokenize("مستشفى") == tokenize("مستشفي")
+    assert tokenize("فاتورة") == ["فاتوره"]
+
+def test_tokenize_converts_arabic_indic_digits():
+    assert tokenize("رقم ١٢٣") == ["رقم", "123"]
+    assert tokenize("۴۵") == ["45"]
+
+def test_tokenize_strips_definite_article_prefixes():
+    assert tokenize("الفاتورة الضريبية") == ["فاتوره", "ضريبيه"]
+    assert tokenize("والخدمات للطباعة") == ["خدمات", "طباعه"]
+
+def test_tokenize_keeps_article_on_short_words():
+    # Only stripped when at least three letters remain
+    assert tokenize("الماء") == ["ماء"]
+    assert tokenize("الى") == ["الي"]
+
+def test_tokenize_truncates_long_tokens():
+    assert tokenize("x" * 100) == ["x" * MAX_TOKEN_LENGTH]
+
+def test_query_terms_are_distinct_in_order():
+    assert query_terms("acme ACME toner Acme") == ["acme", "toner"]
+
+def test_search_text_joins_all_parts():
+    assert search_text("Acme", "INV-7", None, ["Toner", ""]) == "acme inv 7 inv7 toner"
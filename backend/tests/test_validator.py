@@ -0,0 +1,136 @@
+from datetime import date
+from decimal import Decimal
+from services.validator import _amount, validate_invoice_rules
+
+TODAY = date(2024, 6, 1)
+
+def invoice(**overrides):
+    data = {
+        "vendor_info": {"name": "Acme Trading"},
+        "invoice_details": {"number": "INV-1", "date": "2024-05-20"},
+        "financials": {"subtotal": 100.0, "tax_amount": 15.0, "total_amount": 115.0, "currency": "SAR"},
+        "items": [
+            {"description": "Toner", "quantity": 2, "unit_price": 30.0, "total_price": 60.0},
+            {"description": "Paper", "quantity": 4, "unit_price": 10.0, "total_price": 40.0},
+        ],
+    }
+    for section, fields in overrides.items():
+        if isinstance(fields, dict):
+            data[section] = {**data[section], **fields}
+        else:
+            data[section] = fields
+    return data
+
+def results(report):
+    return {c["name"]: c["result"] for c in report["checks"]}
+
+def test_amount_parses_numbers_and_strings():
+    assert _amount(12.5) == Decimal("12.5")
+    assert _amount(" 1,250.00 ") == Decimal("1250.00")
+
+def test_amount_rejects_missing_and_unparseable():
+    for value in (None, True, "", "abc"):
+        assert _amount(value) is None
+
+def test_amount_rejects_non_finite():
+    for value in ("NaN", "nan", "Infinity", "-inf", float("nan"), float("inf")):
+        assert _amount(value) is None
+
+def test_nan_total_is_unknown_not_an_error():
+    report = validate_invoice_rules(invoice(financials={"total_amount": "NaN"}), today=TODAY)
+    assert results(report)["total_present"] == "unknown"
+    assert report["status"] == "ambiguous"
+
+def test_valid_invoice():
+    report = validate_invoice_rules(invoice(), today=TODAY)
+    assert report["status"] == "valid"
+    assert report["source"] == "rules"
+    assert set(results(report).values()) == {"pass"}
+    assert report["reasons"] == []
+
+def test_total_present():
+    assert results(validate_invoice_rules(invoice(financials={"total_amount": None}), today=TODAY))["total_present"] == "unknown"
+    assert results(validate_invoice_rules(invoice(financials={"total_amount": -5}), today=TODAY))["total_present"] == "fail"
+
+def test_subtotal_plus_tax():
+    assert results(validate_invoice_rules(invoice(financials={"total_amount": 115.04}), today=TODAY))["subtotal_plus_tax"] == "pass"
+    assert results(validate_invoice_rules(invoice(financials={"total_amount": 120}), today=TODAY))["subtotal_plus_tax"] == "fail"
+    assert "subtotal_plus_tax" not in results(validate_invoice_rules(invoice(financials={"subtotal": None}), today=TODAY))
+
+def test_date_not_future():
+    assert results(validate_invoice_rules(invoice(invoice_details={"date": "2024-07-01"}), today=TODAY))["date_not_future"] == "fail"
+    assert results(validate_invoice_rules(invoice(invoice_details={"date": "20/05/2024"}), today=TODAY))["date_not_future"] == "unknown"
+    assert results(validate_invoice_rules(invoice(invoice_details={"date": None}), today=TODAY))["date_not_future"] == "unknown"
+
+def test_vendor_not_generic():
+    assert results(validate_invoice_rules(invoice(vendor_info={"name": "Customer"}), today=TODAY))["vendor_not_generic"] == "fail"
+    assert results(validate_invoice_rules(invoice(vendor_info={"name": "المورد"}), today=TODAY))["vendor_not_generic"] == "fail"
+    assert results(validate_invoice_rules(invoice(vendor_info={"name": " "}), today=TODAY))["vendor_not_generic"] == "unknown"
+
+def test_currency_code():
+    assert results(validate_invoice_rules(invoice(financials={"currency": "sar"}), today=TODAY))["currency_code"] == "pass"
+    assert results(validate_invoice_rules(invoice(financials={"currency": "$"}), today=TODAY))["currency_code"] == "fail"
+    assert results(validate_invoice_rules(invoice(financials={"currency": None}), today=TODAY))["currency_code"] == "unknown"
+
+def test_line_item_amount():
+    items = [
+        {"quantity": 2, "unit_price": 30.0, "discount": 5.0, "total_price": 55.0},
+        {"quantity": 1, "unit_price": 45.0, "total_price": 45.0},
+    ]
+    assert results(validate_invoice_rules(invoice(items=items), today=TODAY))["line_item_amount"] == "pass"
+    items[1]["total_price"] = 50.0
+    report = validate_invoice_rules(invoice(items=items), today=TODAY)
+    assert results(report)["line_item_amount"] == "fail"
+    assert any("item 2" in reason for reason in report["reasons"])
+
+def test_line_items_sum():
+    assert results(validate_invoice_rules(invoice(financials={"subtotal": None}, items=[
+        {"quantity": 1, "unit_price": 115.0, "total_price": 115.0},
+    ]), today=TODAY))["line_items_sum"] == "pass"
+    assert results(validate_invoice_rules(invoice(items=[
+        {"quantity": 1, "unit_price": 70.0, "total_price": 70.0},
+    ]), today=TODAY))["line_items_sum"] == "fail"
+    assert "line_items_sum" not in results(validate_invoice_rules(invoice(items=[]), today=TODAY))
+
+def test_any_failure_is_invalid():
+    report = validate_invoice_rules(invoice(financials={"currency": "XXX"}, vendor_info={"name": ""}), today=TODAY)
+    assert report["status"] == "invalid"
+
+def test_unknown_critical_check_is_ambiguous():
+    report = validate_invoice_rules(invoice(invoice_details={"date": None}), today=TODAY)
+    assert report["status"] == "ambiguous"
+    assert report["reasons"] == ["invoice date is missing"]
+
+def test_unknown_non_critical_check_stays_valid():
+    report = validate_invoice_rules(invoice(financials={"currency": None}), today=TODAY)
+    assert report["status"] == "valid"
+
+def test_empty_input_is_ambiguous():
+    assert validate_invoice_rules(None, today=TODAY)["status"] == "ambiguous"
+
+def test_malformed_sections_are_unknown_not_errors():
+    report = validate_invoice_rules(
+        {"vendor_info": "Acme", "invoice_details": None, "financials": [1], "items": {"a": 1}}, today=TODAY
+    )
+    checks = results(report)
+    assert checks["total_present"] == "unknown"
+    assert checks["date_not_future"] == "unknown"
+    assert checks["vendor_not_generic"] == "unknown"
+    assert report["status"] == "ambiguous"
+
+def test_non_string_scalars_are_coerced():
+    report = validate_invoice_rules(invoice(vendor_info={"name": 123}, financials={"currency": 682}), today=TODAY)
+    checks = results(report)
+    assert checks["vendor_not_generic"] == "pass"
+    assert checks["currency_code"] == "fail"
+
+def test_nested_values_in_scalar_fields_are_unknown():
+    report = validate_invoice_rules(
+        invoice(vendor_info={"name": {"en": "Acme"}}, invoice_details={"date": ["2024-05-20"]}), today=TODAY
+    )
+    checks = results(report)
+    assert checks["vendor_not_generic"] == "unknown"
+    assert checks["date_not_future"] == "unknown"
+
+def test_non_object_input_is_ambiguous():
+    assert validate_invoice_rules(["not", "an", "invoice"], today=TODAY)["status"] == "ambiguous"
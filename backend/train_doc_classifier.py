@@ -0,0 +1,87 @@
+import argparse
+import random
+from collections import Counter
+from sqlalchemy import select
+from core.config import settings
+from core.database import SessionLocal
+from models.invoice import Invoice
+from services import doc_classifier
+
+# doc_type values stored before the classifier existed
+LEGACY_LABELS = {"generic": "general_document"}
+
+def load_examples(verified_only: bool, limit: int) -> list:
+    """(raw_content, label) of stored documents, newest first. error_fallback rows are skipped."""
+    query = (
+        select(Invoice.raw_content, Invoice.doc_type)
+        .where(Invoice.raw_content.isnot(None), Invoice.doc_type.isnot(None))
+        .order_by(Invoice.id.desc())
+    )
+    if verified_only:
+        query = query.where(Invoice.verified == True)
+    if limit:
+        query = query.limit(limit)
+
+    examples = []
+    db = SessionLocal()
+    try:
+        for raw_content, doc_type in db.execute(query.execution_options(yield_per=1000)):
+            label = LEGACY_LABELS.get(doc_type, doc_type)
+            if label in doc_classifier.LABELS and raw_content.strip():
+                examples.append((raw_content, label))
+    finally:
+        db.close()
+    return examples
+
+def evaluate(model: doc_classifier.DocTypeModel, examples: list, min_confidence: float) -> dict:
+    predictions = [model.predict(text) for text, _ in examples]
+    report = {"accuracy": round(sum(p[0] == label for p, (_, label) in zip(predictions, examples)) / len(examples), 4)}
+    for label in doc_classifier.LABELS:
+        predicted = [p[0] == label for p in predictions]
+        actual = [l == label for _, l in examples]
+        hits = sum(p and a for p, a in zip(predicted, actual))
+        report[label] = {
+            "precision": round(hits / sum(predicted), 4) if sum(predicted) else None,
+            "recall": round(hits / sum(actual), 4) if sum(actual) else None,
+        }
+    # What routing would do: only confident general_document predictions skip extraction
+    skipped = [label for (p, confidence), (_, label) in zip(predictions, examples)
+               if p == "general_document" and confidence >= min_confidence]
+    report["skipped_extraction"] = len(skipped)
+    report["skipped_but_financial"] = sum(label != "general_document" for label in skipped)
+    return report
+
+def train_doc_classifier(args):
+    """
+    Trains the document-type classifier from stored invoices (raw_content, doc_type), reports
+    accuracy on a held-out share, then refits on everything and writes the model that the
+    workers pick up from DOC_CLASSIFIER_PATH. Reviewed documents make the best labels
+    (--verified-only); older rows were labelled by the keyword rule.
+    """
+    examples = load_examples(args.verified_only, args.limit)
+    counts = Counter(label for _, label in examples)
+    print(f"Loaded {len(examples)} labelled document(s): {dict(counts)}")
+    if len(counts) < 2:
+        print("Need at least two document types to train; leaving the current model in place.")
+        return
+
+    random.Random(args.seed).shuffle(examples)
+    holdout = int(len(examples) * args.holdout)
+    if holdout:
+        test, train = examples[:holdout], examples[holdout:]
+        model = doc_classifier.train([t for t, _ in train], [l for _, l in train], epochs=args.epochs, seed=args.seed)
+        print(f"Held-out evaluation on {len(test)} document(s): {evaluate(model, test, settings.DOC_CLASSIFIER_MIN_CONFIDENCE)}")
+
+    model = doc_classifier.train([t for t, _ in examples], [l for _, l in examples], epochs=args.epochs, seed=args.seed)
+    model.save(args.output)
+    print(f"Saved document classifier to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local document-type classifier from stored documents.")
+    parser.add_argument("--output", default=settings.DOC_CLASSIFIER_PATH)
+    parser.add_argument("--verified-only", action="store_true", help="Only documents approved in review")
+    parser.add_argument("--limit", type=int, default=0, help="Newest N documents (0 for all)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share held out for evaluation (0 to skip)")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    train_doc_classifier(parser.parse_args())
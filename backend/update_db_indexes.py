@@ -0,0 +1,28 @@
+from sqlalchemy import text
+from core.database import engine, Base
+import models.invoice  # noqa: F401 - registers the tables on Base.metadata
+
+def upgrade_db_indexes():
+    """
+    Creates indexes declared on the models that are missing from an existing database.
+    create_all() only adds indexes together with new tables, so older databases need this.
+    """
+    print("Creating missing indexes...")
+    with engine.connect() as connection:
+        with connection.begin():
+            if engine.dialect.name == "postgresql":
+                # Needed by the trigram index on invoices.vendor
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    # One savepoint per index, so a failure (e.g. duplicates under a new unique
+                    # index) doesn't abort the transaction for the indexes after it
+                    try:
+                        with connection.begin_nested():
+                            index.create(connection, checkfirst=True)
+                        print(f"Ensured index {index.name} on {table.name}.")
+                    except Exception as e:
+                        print(f"Skipping {index.name}: {e}")
+
+if __name__ == "__main__":
+    upgrade_db_indexes()
@@ -0,0 +1,14 @@
+from core.database import engine, Base
+from models.invoice import MonthlySpend
+from services.rollups import rebuild_monthly_spend
+
+def upgrade_db_rollups():
+    print("Rebuilding monthly spend rollup...")
+    Base.metadata.create_all(bind=engine, tables=[MonthlySpend.__table__])
+    with engine.connect() as connection:
+        with connection.begin():
+            months = rebuild_monthly_spend(connection)
+            print(f"Rollup rebuilt with {months} month(s).")
+
+if __name__ == "__main__":
+    upgrade_db_rollups()
@@ -9,15 +9,46 @@ def upgrade_db():
                 ("doc_type", "VARCHAR"),
                 ("summary", "TEXT"),
                 ("verified", "BOOLEAN DEFAULT 0"),
-                ("audit_log", "JSON")
+                ("audit_log", "JSON"),
+                ("validation", "JSON")
             ]
             
             for col_name, col_type in cols:
                 try:
-                    connection.execute(text(f"ALTER TABLE invoices ADD COLUMN {col_name} {col_type}"))
+                    # Savepoint per column: on Postgres a failed ALTER would abort the whole transaction
+                    with connection.begin_nested():
+                        connection.execute(text(f"ALTER TABLE invoices ADD COLUMN {col_name} {col_type}"))
                     print(f"Added {col_name} column.")
                 except Exception as e:
                     print(f"Skipping {col_name} (might exist): {e}")
 
+            document_cols = [
+                ("task_id", "VARCHAR"),
+                ("started_at", "TIMESTAMP WITH TIME ZONE"),
+                ("ocr_completed_at", "TIMESTAMP WITH TIME ZONE"),
+                ("completed_at", "TIMESTAMP WITH TIME ZONE"),
+                ("error", "TEXT"),
+                ("duplicate_of", "INTEGER REFERENCES documents(id)"),
+                ("duplicate_score", "FLOAT")
+            ]
+
+            for col_name, col_type in document_cols:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(text(f"ALTER TABLE documents ADD COLUMN {col_name} {col_type}"))
+                    print(f"Added documents.{col_name} column.")
+                except Exception as e:
+                    print(f"Skipping documents.{col_name} (might exist): {e}")
+
+            # Tables created by create_all() already have it; this is for ones from before
+            try:
+                with connection.begin_nested():
+                    connection.execute(text("ALTER TABLE document_fingerprints ADD COLUMN identifiers TEXT"))
+                print("Added document_fingerprints.identifiers column.")
+            except Exception as e:
+                print(f"Skipping document_fingerprints.identifiers (might exist): {e}")
+
+    # The unique index on documents.task_id and the duplicate_of index are created by update_db_indexes.py
+
 if __name__ == "__main__":
     upgrade_db()
@@ -0,0 +1,34 @@
+from sqlalchemy import select
+from core.database import engine, Base
+from models.invoice import Invoice, SearchDocument
+from services import search
+
+BATCH_SIZE = 1000
+
+def upgrade_db_search():
+    """
+    Creates the search index tables (tsvector + GIN on Postgres, FTS5 on SQLite) and
+    (re)indexes every stored invoice in batches. New invoices are indexed as they complete.
+    """
+    print("Building invoice search index...")
+    Base.metadata.create_all(bind=engine, tables=[SearchDocument.__table__])
+    dialect = engine.dialect.name
+    indexed, last_id = 0, 0
+    while True:
+        with engine.connect() as connection:
+            with connection.begin():
+                ids = connection.execute(
+                    select(Invoice.id).where(Invoice.id > last_id).order_by(Invoice.id).limit(BATCH_SIZE)
+                ).scalars().all()
+                if not ids:
+                    break
+                rows = search.stored_rows(connection.execute(search.stored_rows_query(dialect, ids)).all())
+                for stmt in search.upsert_statements(dialect, rows):
+                    connection.execute(stmt)
+        indexed += len(ids)
+        last_id = ids[-1]
+        print(f"Indexed {indexed} invoice(s).")
+    print(f"Search index built with {indexed} invoice(s).")
+
+if __name__ == "__main__":
+    upgrade_db_search()
@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import LayoutGrid from "lucide-react/dist/esm/icons/layout-grid";
 import ArrowRight from "lucide-react/dist/esm/icons/arrow-right";
 import { StatsCards } from "./StatsCards";
@@ -11,12 +11,18 @@ import {
     DashboardService,
     type DashboardStats,
     type DashboardInvoice,
+    type InvoiceFilters,
     type ChartData
 } from "../../services";
 
 export const InsightsDashboard = () => {
     const [stats, setStats] = useState<DashboardStats | null>(null);
     const [invoices, setInvoices] = useState<DashboardInvoice[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    // Filters of the loaded list; a response for older filters is dropped by comparing request numbers
+    const filtersRef = useRef<InvoiceFilters>({});
+    const requestRef = useRef(0);
     const [chartData, setChartData] = useState<ChartData[]>([]);
     const [statusData, setStatusData] = useState<{ name: string; value: number; color: string }[]>([]);
     const [loading, setLoading] = useState(true);
@@ -31,7 +37,8 @@ export const InsightsDashboard = () => {
                     DashboardService.getStatusDistribution()
                 ]);
                 setStats(s);
-                setInvoices(inv);
+                setInvoices(inv.invoices);
+                setNextCursor(inv.nextCursor);
                 setChartData(c);
                 setStatusData(sd);
             } catch (err) {
@@ -45,6 +52,44 @@ export const InsightsDashboard = () => {
         loadDashboard();
     }, []);
 
+    const applyFilters = useCallback(async (next: InvoiceFilters) => {
+        const filters = Object.fromEntries(Object.entries(next).filter(([, value]) => value)) as InvoiceFilters;
+        if (JSON.stringify(filters) === JSON.stringify(filtersRef.current)) return;
+        filtersRef.current = filters;
+        const request = ++requestRef.current;
+
+        // New filters start over from the first page
+        setInvoices([]);
+        setNextCursor(null);
+        setLoadingMore(true);
+        try {
+            const page = await DashboardService.getInvoices(filters);
+            if (request !== requestRef.current) return;
+            setInvoices(page.invoices);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            console.error("Failed to filter invoices:", err);
+        } finally {
+            if (request === requestRef.current) setLoadingMore(false);
+        }
+    }, []);
+
+    const loadMoreInvoices = async () => {
+        if (!nextCursor) return;
+        const request = requestRef.current;
+        setLoadingMore(true);
+        try {
+            const page = await DashboardService.getInvoices({ ...filtersRef.current, cursor: nextCursor });
+            if (request !== requestRef.current) return;
+            setInvoices(prev => [...prev, ...page.invoices]);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            console.error("Failed to load more invoices:", err);
+        } finally {
+            if (request === requestRef.current) setLoadingMore(false);
+        }
+    };
+
     if (loading) {
         return (
             <div className="flex flex-col items-center justify-center py-40 gap-4">
@@ -96,7 +141,13 @@ export const InsightsDashboard = () => {
                     <h3 className="text-[10px] font-bold text-slate-500 uppercase tracking-widest">Full Transaction History</h3>
                     <div className="h-px bg-slate-800 flex-1" />
                 </div>
-                <InvoicesTable invoices={invoices} />
+                <InvoicesTable
+                    invoices={invoices}
+                    hasMore={nextCursor !== null}
+                    onLoadMore={loadMoreInvoices}
+                    isLoadingMore={loadingMore}
+                    onFiltersChange={applyFilters}
+                />
             </div>
         </div>
     );
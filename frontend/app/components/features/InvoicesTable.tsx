@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import Search from "lucide-react/dist/esm/icons/search";
 import Download from "lucide-react/dist/esm/icons/download";
 import Eye from "lucide-react/dist/esm/icons/eye";
@@ -8,24 +8,34 @@ import Trash2 from "lucide-react/dist/esm/icons/trash-2";
 import Filter from "lucide-react/dist/esm/icons/filter";
 import { Badge } from "../ui/Badge";
 import { Button } from "../ui/Button";
-import { type DashboardInvoice, DashboardService } from "../../services";
+import { type DashboardInvoice, type InvoiceFilters, DashboardService } from "../../services";
 import { cn } from "../../utils";
 
+// Wait for typing to pause before asking the server for a filtered list
+const FILTER_DEBOUNCE_MS = 300;
+
 interface InvoicesTableProps {
     invoices: DashboardInvoice[];
+    hasMore?: boolean;
+    onLoadMore?: () => void;
+    isLoadingMore?: boolean;
+    onFiltersChange?: (filters: InvoiceFilters) => void;
 }
 
-export const InvoicesTable = ({ invoices }: InvoicesTableProps) => {
+export const InvoicesTable = ({ invoices, hasMore = false, onLoadMore, isLoadingMore = false, onFiltersChange }: InvoicesTableProps) => {
     const [searchTerm, setSearchTerm] = useState("");
     const [startDate, setStartDate] = useState("");
     const [endDate, setEndDate] = useState("");
     const [isExporting, setIsExporting] = useState(false);
 
-    const filteredInvoices = invoices.filter(inv =>
-        inv.vendor.toLowerCase().includes(searchTerm.toLowerCase()) &&
-        (startDate === "" || inv.date >= startDate) &&
-        (endDate === "" || inv.date <= endDate)
-    );
+    // Filtering happens on the server, so it covers every invoice and not only the loaded pages
+    useEffect(() => {
+        if (!onFiltersChange) return;
+        const timer = setTimeout(() => {
+            onFiltersChange({ vendor: searchTerm.trim(), start_date: startDate, end_date: endDate });
+        }, FILTER_DEBOUNCE_MS);
+        return () => clearTimeout(timer);
+    }, [searchTerm, startDate, endDate, onFiltersChange]);
 
     const handleExport = async () => {
         setIsExporting(true);
@@ -101,7 +111,7 @@ export const InvoicesTable = ({ invoices }: InvoicesTableProps) => {
                             </tr>
                         </thead>
                         <tbody className="divide-y divide-slate-800/50">
-                            {filteredInvoices.map((inv) => (
+                            {invoices.map((inv) => (
                                 <tr key={inv.id} className="group hover:bg-slate-800/20 transition-colors">
                                     <td className="px-6 py-4">
                                         <div className="flex items-center gap-3">
@@ -138,7 +148,7 @@ export const InvoicesTable = ({ invoices }: InvoicesTableProps) => {
                     </table>
                 </div>
 
-                {filteredInvoices.length === 0 && (
+                {invoices.length === 0 && !isLoadingMore && (
                     <div className="py-20 text-center flex flex-col items-center justify-center gap-4">
                         <div className="p-4 bg-slate-900 rounded-full border border-slate-800">
                             <Filter className="w-8 h-8 text-slate-700" />
@@ -146,6 +156,20 @@ export const InvoicesTable = ({ invoices }: InvoicesTableProps) => {
                         <p className="text-slate-500 font-medium">No invoices found matching your filters</p>
                     </div>
                 )}
+
+                {hasMore && onLoadMore && (
+                    <div className="py-4 flex justify-center border-t border-slate-800/50">
+                        <Button
+                            variant="ghost"
+                            size="sm"
+                            onClick={onLoadMore}
+                            isLoading={isLoadingMore}
+                            className="border border-slate-800 bg-slate-900/50 hover:bg-slate-800"
+                        >
+                            Load more
+                        </Button>
+                    </div>
+                )}
             </div>
         </div>
     );
@@ -33,7 +33,7 @@ const InsightsDashboard = dynamic(() => import("./components/features/InsightsDa
   loading: () => <div className="p-12 text-center text-slate-500">Aggregating Fiscal Data...</div>,
   ssr: false
 });
-import { ReviewService, type ReviewInvoiceData, type ProcessingStatus } from "./services";
+import { ReviewService, type ReviewInvoiceData, type ProcessingStatus, type TaskEvent } from "./services";
 import { cn } from "./utils";
 
 export default function InvoiceReviewApp() {
@@ -49,6 +49,7 @@ export default function InvoiceReviewApp() {
   const [lastFile, setLastFile] = useState<File | null>(null);
   const [verifiedFields, setVerifiedFields] = useState<Set<string>>(new Set());
   const timerRef = useRef<NodeJS.Timeout | null>(null);
+  const unsubscribeRef = useRef<(() => void) | null>(null);
 
 
   useEffect(() => {
@@ -56,6 +57,7 @@ export default function InvoiceReviewApp() {
       if (timerRef.current) {
         clearTimeout(timerRef.current);
       }
+      unsubscribeRef.current?.();
     };
   }, []);
 
@@ -95,30 +97,30 @@ export default function InvoiceReviewApp() {
       setStatus("processing");
       setLoadingMessage("Analyzing document structure...");
 
-      let step = 0;
-      const interval = setInterval(async () => {
-        try {
-          step++;
-          if (step === 3) setLoadingMessage("Extracting financial data...");
-          if (step === 6) setLoadingMessage("Running auditor validation...");
-          if (step === 9) setLoadingMessage("Finalizing results...");
+      const stageMessages: Record<string, string> = {
+        ocr: "Analyzing document structure...",
+        extract: "Extracting financial data...",
+        review: "Running auditor validation...",
+        persist: "Finalizing results...",
+      };
 
-          const res = await ReviewService.getTaskStatus(taskId);
-          if (res.status === "completed") {
-            if (timerRef.current) clearInterval(timerRef.current);
-            setData(mapBackendDataToFrontend(res.data));
+      // Results are pushed over SSE; polling is only the fallback if the stream is unavailable
+      unsubscribeRef.current?.();
+      unsubscribeRef.current = ReviewService.subscribeToTask(
+        taskId,
+        (event: TaskEvent) => {
+          if (event.status === "PROCESSING" && event.stage) {
+            setLoadingMessage(stageMessages[event.stage] || "Processing...");
+          } else if (event.status === "COMPLETED") {
+            setData(mapBackendDataToFrontend(event.data));
             setStatus("completed");
-          } else if (res.status === "failed") {
-            if (timerRef.current) clearInterval(timerRef.current);
+          } else if (event.status === "FAILED") {
             setStatus("error");
-            setErrorMessage(res.error || "No invoice data found");
+            setErrorMessage(event.error || "No invoice data found");
           }
-        } catch (err) {
-          console.error(err);
-        }
-      }, 1000);
-
-      timerRef.current = interval;
+        },
+        () => pollTaskStatus(taskId),
+      );
 
     } catch (err) {
       setStatus("error");
@@ -126,6 +128,33 @@ export default function InvoiceReviewApp() {
     }
   };
 
+  const pollTaskStatus = (taskId: string) => {
+    let step = 0;
+    const interval = setInterval(async () => {
+      try {
+        step++;
+        if (step === 3) setLoadingMessage("Extracting financial data...");
+        if (step === 6) setLoadingMessage("Running auditor validation...");
+        if (step === 9) setLoadingMessage("Finalizing results...");
+
+        const res = await ReviewService.getTaskStatus(taskId);
+        if (res.status === "completed") {
+          if (timerRef.current) clearInterval(timerRef.current);
+          setData(mapBackendDataToFrontend(res.data));
+          setStatus("completed");
+        } else if (res.status === "failed") {
+          if (timerRef.current) clearInterval(timerRef.current);
+          setStatus("error");
+          setErrorMessage(res.error || "No invoice data found");
+        }
+      } catch (err) {
+        console.error(err);
+      }
+    }, 1000);
+
+    timerRef.current = interval;
+  };
+
   const handleApprove = async () => {
     if (!data) return;
     setStatus("processing");
@@ -50,6 +50,16 @@ export interface ReviewInvoiceData {
 
 export type ProcessingStatus = "idle" | "uploading" | "processing" | "completed" | "error";
 
+export interface TaskEvent {
+    type: "status";
+    task_id: string;
+    document_id?: number;
+    status: "PENDING" | "PROCESSING" | "COMPLETED" | "FAILED";
+    stage?: "ocr" | "extract" | "review" | "persist";
+    data?: any;
+    error?: string;
+}
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
 export class ReviewService {
@@ -81,6 +91,28 @@ export class ReviewService {
         return res.json();
     }
 
+    /**
+     * Streams status events for a task over Server-Sent Events instead of polling getTaskStatus.
+     * Calls onError if the stream can't be opened or drops before a final event; returns a function that closes it.
+     */
+    static subscribeToTask(taskId: string, onEvent: (event: TaskEvent) => void, onError: () => void): () => void {
+        const source = new EventSource(`${API_BASE_URL}/events/task/${taskId}`);
+        let finished = false;
+        source.onmessage = (message) => {
+            const event: TaskEvent = JSON.parse(message.data);
+            if (event.status === "COMPLETED" || event.status === "FAILED") {
+                finished = true;
+                source.close();
+            }
+            onEvent(event);
+        };
+        source.onerror = () => {
+            source.close();
+            if (!finished) onError();
+        };
+        return () => source.close();
+    }
+
     private static extractChanges(data: ReviewInvoiceData) {
         const changes: any[] = [];
         const check = (key: string, field: ExtractedField<any>) => {
@@ -113,6 +145,17 @@ export interface DashboardInvoice {
     status: "Approved" | "Pending Review";
 }
 
+export interface InvoiceFilters {
+    vendor?: string;
+    start_date?: string;
+    end_date?: string;
+}
+
+export interface InvoicePage {
+    invoices: DashboardInvoice[];
+    nextCursor: string | null;
+}
+
 export interface ChartData {
     name: string;
     spend: number;
@@ -125,15 +168,19 @@ export class DashboardService {
         return res.json();
     }
 
-    static async getInvoices(params?: {
-        vendor?: string;
-        start_date?: string;
-        end_date?: string;
-    }): Promise<DashboardInvoice[]> {
-        const query = new URLSearchParams(params as any).toString();
+    // One page, newest first. Pass nextCursor back as `cursor` for the next one; null means no more.
+    static async getInvoices(params?: InvoiceFilters & {
+        cursor?: string;
+        limit?: number;
+    }): Promise<InvoicePage> {
+        const query = new URLSearchParams(
+            Object.entries(params || {})
+                .filter(([, value]) => value !== undefined && value !== "")
+                .map(([key, value]) => [key, String(value)])
+        ).toString();
         const res = await fetch(`${API_BASE_URL}/dashboard/invoices?${query}`);
         if (!res.ok) throw new Error("Failed to fetch invoices");
-        return res.json();
+        return { invoices: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
     }
 
     static async getChartData(): Promise<ChartData[]> {